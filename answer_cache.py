@@ -0,0 +1,95 @@
+"""
+Answer Cache
+LRU+TTL Cache für Gemini-Antworten mit normalisierten Fragen als Schlüssel
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+UMLAUTS = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]', re.UNICODE)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_question(question: str) -> str:
+    """Case-Folding, Umlaut-Normalisierung, Satzzeichen und Leerraum entfernen"""
+    text = question.casefold().translate(UMLAUTS)
+    text = PUNCTUATION_PATTERN.sub(' ', text)
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+def content_digest(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    """Thread-sicherer LRU-Cache mit TTL und Größenlimit"""
+
+    def __init__(self, max_size: int = 256, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version: Optional[str] = None
+        self._entries: 'OrderedDict[Tuple, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def bind_version(self, version: str) -> None:
+        """Leert den Cache, sobald sich das zugrundeliegende Dokument ändert"""
+        with self._lock:
+            if self.version is not None and version != self.version:
+                self._entries.clear()
+                self.invalidations += 1
+            self.version = version
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Tuple, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'version': self.version
+            }
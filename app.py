@@ -1,14 +1,47 @@
 from openai import OpenAI
 import os
+import hashlib
+import math
+import time
+import requests
 import google.generativeai as genai
-import json
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, g, render_template, request, jsonify, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from dotenv import load_dotenv
+import fast_json
+from retrieval import get_policy_index
+from answer_cache import AnswerCache, normalize_question, content_digest
+from lead_queue import LeadQueue
+from lead_store import LeadStore
+from todo_store import TodoStore
+from lead_batcher import LeadBatcher
+from upstream import ProviderGate, UpstreamBusy
+from rate_limit import ClientLimiter, RateLimitStore, UpstreamLimiter
+from upload_jobs import UploadJobs
+from bulk_upload import collect_files, upload_batch, wait_for_indexing
+from store_catalog import StoreCatalog
+from prompt_templates import DEFAULT_PROMPTS_PATH, get_prompt_library
+from context_cache import PolicyContextCache
+from schema import compile_schema
+from structured_output import MarkerSplitter, StructuredOutput, split_answer
+from workflow_engine import WorkflowEngine, check_http_target, render_text, route_lead, template_values
 
 # Load environment variables
 load_dotenv()
 
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify/request.get_json über fast_json (orjson falls installiert), Flask-Defaults für Sondertypen"""
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        return fast_json.dumps(obj, indent=bool(kwargs.get('indent')), default=self.default,
+                               sort_keys=kwargs.get('sort_keys', self.sort_keys))
+
+    def loads(self, s, **kwargs):
+        return fast_json.loads(s)
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # Initialize OpenAI client
 client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
@@ -17,6 +50,224 @@ client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
 gemini_model = genai.GenerativeModel('gemini-1.5-flash')
 
+# Rate-Limits in einer gemeinsamen SQLite-Datei: gelten für alle gunicorn-Worker auf diesem Host
+RATE_LIMIT_PATH = os.getenv('RATE_LIMIT_PATH', 'rate_limits.db')
+rate_limits = RateLimitStore(RATE_LIMIT_PATH)
+
+# Requests pro Minute an die Provider (0 = unbegrenzt); bei 429 Backoff mit Jitter, Retry-After wird eingehalten
+UPSTREAM_RATE_MAX_WAIT = float(os.getenv('UPSTREAM_RATE_MAX_WAIT', 10))
+UPSTREAM_RETRIES = int(os.getenv('UPSTREAM_RETRIES', 3))
+UPSTREAM_BACKOFF_BASE = float(os.getenv('UPSTREAM_BACKOFF_BASE', 0.5))
+UPSTREAM_BACKOFF_MAX = float(os.getenv('UPSTREAM_BACKOFF_MAX', 20))
+
+def upstream_limiter(name, per_minute, burst):
+    return UpstreamLimiter(name, rate_limits, per_minute, burst, UPSTREAM_RATE_MAX_WAIT, UPSTREAM_RETRIES,
+                           UPSTREAM_BACKOFF_BASE, UPSTREAM_BACKOFF_MAX)
+
+# Gleichzeitige Upstream-Aufrufe pro Prozess begrenzen (gthread/gevent-Worker bedienen viele Requests parallel)
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv('UPSTREAM_QUEUE_TIMEOUT', 30))
+gemini_gate = ProviderGate('Gemini', int(os.getenv('GEMINI_MAX_CONCURRENCY', 8)), UPSTREAM_QUEUE_TIMEOUT,
+                           upstream_limiter('Gemini', float(os.getenv('GEMINI_RPM', 600)),
+                                            float(os.getenv('GEMINI_BURST', 20))))
+openai_gate = ProviderGate('OpenAI', int(os.getenv('OPENAI_MAX_CONCURRENCY', 8)), UPSTREAM_QUEUE_TIMEOUT,
+                           upstream_limiter('OpenAI', float(os.getenv('OPENAI_RPM', 500)),
+                                            float(os.getenv('OPENAI_BURST', 20))))
+
+def gemini_generate(prompt, model=None, **kwargs):
+    """Gemini-Aufruf über das Concurrency-Gate mit Rate-Limit und 429-Wiederholung
+    (model: z.B. an einen Context Cache gebundenes Modell)"""
+    return gemini_gate.call(lambda: (model or gemini_model).generate_content(prompt, **kwargs))
+
+def error_status(e):
+    """503 wenn ein Upstream ausgelastet ist (mit Retry-After, falls bekannt), sonst 500"""
+    if isinstance(e, UpstreamBusy):
+        g.retry_after = e.retry_after
+        return 503
+    return 500
+
+# Requests pro Client und Minute auf die öffentlichen Endpoints, die Upstream-Aufrufe oder Jobs auslösen.
+# Die Lead-Webhooks sind ausgenommen: n8n sendet alle Leads von einer IP, Duplikate fängt die Idempotenz ab
+# und die Queue samt Micro-Batching glättet Bursts
+CLIENT_RATE_LIMIT = float(os.getenv('CLIENT_RATE_LIMIT', 30))
+CLIENT_RATE_BURST = float(os.getenv('CLIENT_RATE_BURST', 10))
+# Nur hinter Proxys, die X-Forwarded-For selbst ergänzen (Render, nginx); PROXY_HOPS = Anzahl dieser Proxys.
+# Maßgeblich ist der Eintrag des äußersten vertrauenswürdigen Proxys, davor stehende Einträge sind fälschbar
+RATE_LIMIT_TRUST_PROXY = os.getenv('RATE_LIMIT_TRUST_PROXY', 'false').lower() == 'true'
+RATE_LIMIT_PROXY_HOPS = max(1, int(os.getenv('RATE_LIMIT_PROXY_HOPS', 1)))
+client_limiter = ClientLimiter(rate_limits, CLIENT_RATE_LIMIT, CLIENT_RATE_BURST)
+CLIENT_LIMITED_ENDPOINTS = {
+    'ask', 'ask_question', 'ai_suggestions', 'generate_todos', 'generate_followups',
+    'create_workflow', 'run_workflow', 'create_vector_store', 'upload_file', 'upload_files',
+    'list_vector_stores'
+}
+
+def client_address():
+    if RATE_LIMIT_TRUST_PROXY and request.headers.get('X-Forwarded-For'):
+        route = request.access_route
+        return route[max(0, len(route) - RATE_LIMIT_PROXY_HOPS)]
+    return request.remote_addr or 'unknown'
+
+@app.before_request
+def limit_clients():
+    if request.endpoint not in CLIENT_LIMITED_ENDPOINTS:
+        return None
+    wait = client_limiter.check(client_address())
+    if wait is None:
+        return None
+    response = jsonify({
+        'success': False,
+        'error': 'Zu viele Anfragen, bitte später erneut versuchen',
+        'retry_after': math.ceil(wait)
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(math.ceil(wait))
+    return response
+
+@app.after_request
+def add_retry_after(response):
+    retry_after = g.pop('retry_after', None)
+    if response.status_code == 503 and retry_after is not None:
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+# Kundenrichtlinien einmal beim Start indexieren; passt das Dokument nicht ins Token-Budget,
+# gehen pro Frage nur die relevanten Abschnitte (ohne Treffer das ganze Dokument) in den Prompt
+POLICIES_PATH = os.getenv('POLICIES_PATH', 'customer_policies.txt')
+POLICY_TOP_K = int(os.getenv('POLICY_TOP_K', 3))
+POLICY_CONTEXT_TOKENS = int(os.getenv('POLICY_CONTEXT_TOKENS', 2000))
+get_policy_index(POLICIES_PATH)
+
+# Prompt-Vorlagen einmal laden; Eingaben werden pro Variable und insgesamt auf ein Token-Budget gekürzt
+PROMPTS_PATH = os.getenv('PROMPTS_PATH', DEFAULT_PROMPTS_PATH)
+PROMPT_MAX_TOKENS = int(os.getenv('PROMPT_MAX_TOKENS', 4000))
+prompts = get_prompt_library(PROMPTS_PATH, PROMPT_MAX_TOKENS)
+
+# System-Instruktion + Richtlinien einmal als Gemini Context Cache, pro Frage nur die Frage senden
+GEMINI_CONTEXT_CACHE = os.getenv('GEMINI_CONTEXT_CACHE', 'true').lower() == 'true'
+GEMINI_CACHE_MODEL = os.getenv('GEMINI_CACHE_MODEL', 'models/gemini-1.5-flash-001')
+GEMINI_CACHE_TTL = float(os.getenv('GEMINI_CACHE_TTL', 3600))
+policy_context = PolicyContextCache(
+    GEMINI_CACHE_MODEL,
+    prompts.render('policy_system').text,
+    ttl=GEMINI_CACHE_TTL,
+    enabled=GEMINI_CONTEXT_CACHE
+)
+
+# JSON-Antworten nach Schema: JSON-Modus anfordern, validieren, höchstens ein Reparatur-Aufruf
+TODOS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'todos': {
+            'type': 'array',
+            'minItems': 1,
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'title': {'type': 'string', 'minLength': 1},
+                    'description': {'type': 'string'},
+                    'priority': {'type': 'string', 'enum': ['hoch', 'mittel', 'niedrig']},
+                    'category': {'type': 'string',
+                                 'enum': ['Entwicklung', 'Testing', 'Dokumentation', 'Deployment', 'Wartung']}
+                },
+                'required': ['title', 'description', 'priority', 'category']
+            }
+        }
+    },
+    'required': ['todos']
+}
+FOLLOWUPS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'followups': {'type': 'array', 'minItems': 1, 'items': {'type': 'string', 'minLength': 1}}
+    },
+    'required': ['followups']
+}
+todos_output = StructuredOutput('generate_todos', TODOS_SCHEMA, prompts)
+followups_output = StructuredOutput('generate_followups', FOLLOWUPS_SCHEMA, prompts)
+
+FALLBACK_TODOS = [
+    {
+        'title': 'Projekt Setup',
+        'description': 'Grundlegende Projektstruktur einrichten',
+        'priority': 'hoch',
+        'category': 'Entwicklung'
+    },
+    {
+        'title': 'Testing implementieren',
+        'description': 'Automatisierte Tests für das Projekt erstellen',
+        'priority': 'mittel',
+        'category': 'Testing'
+    }
+]
+# /ask: Antwort und Folgefragen in einem Aufruf, getrennt durch diesen Marker
+FOLLOWUPS_MARKER = 'FOLGEFRAGEN:'
+
+FALLBACK_FOLLOWUPS = [
+    "Was sind die nächsten Schritte?",
+    "Gibt es Beispiele dazu?",
+    "Wie kann ich das anpassen?"
+]
+
+# Antwort-Caches für wiederkehrende Fragen aus dem Support-Widget
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', 512))
+ANSWER_CACHE_TTL = float(os.getenv('ANSWER_CACHE_TTL', 3600))
+answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL)
+followup_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL)
+
+def bind_policy_version():
+    """Invalidiert die Caches, wenn sich customer_policies.txt geändert hat"""
+    policy_index = get_policy_index(POLICIES_PATH)
+    answer_cache.bind_version(policy_index.content_hash)
+    followup_cache.bind_version(policy_index.content_hash)
+    return policy_index
+
+def wants_stream(data):
+    """Streaming-Modus per {"stream": true} oder Accept: text/event-stream"""
+    return bool(data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
+
+def sse_event(payload, event=None):
+    message = f'event: {event}\n' if event else ''
+    return message + f'data: {fast_json.dumps(payload)}\n\n'
+
+def sse_response(events):
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def stream_generation(prompt, build_result, model=None, splitter=None):
+    """Streamt Gemini-Tokens als Server-Sent Events, zum Schluss das vollständige Ergebnis
+    (splitter: nur der Text vor dessen Marker wird als delta gestreamt)"""
+    def events():
+        parts = []
+        attempt = 0
+        try:
+            while True:
+                try:
+                    with gemini_gate.slot():
+                        for chunk in (model or gemini_model).generate_content(prompt, stream=True):
+                            if chunk.text:
+                                parts.append(chunk.text)
+                                delta = splitter.feed(chunk.text) if splitter else chunk.text
+                                if delta:
+                                    yield sse_event({'delta': delta})
+                    break
+                except Exception as e:
+                    # Ein 429 vor dem ersten Token lässt sich noch unbemerkt wiederholen
+                    delay = None if parts else gemini_gate.retry_delay(e, attempt)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+                    attempt += 1
+            if splitter and not splitter.found:
+                delta = splitter.flush()
+                if delta:
+                    yield sse_event({'delta': delta})
+            yield sse_event(build_result(''.join(parts)), event='done')
+        except Exception as e:
+            yield sse_event({'success': False, 'error': str(e)}, event='error')
+    return sse_response(events())
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -33,37 +284,142 @@ def todo():
 def freelancer():
     return render_template('freelancer.html')
 
+def analyze_lead(data):
+    """Hintergrund-Job für /process-lead"""
+    lead_name = data.get('name')
+    lead_email = data.get('email')
+    lead_source = data.get('source')
+    lead_budget = data.get('budget')
+    
+    # Hier würde die echte n8n/make.com Integration stehen
+    # Für jetzt simulieren wir es
+    
+    # Simuliere Verarbeitung
+    time.sleep(LEAD_PROCESSING_DELAY)  # Simuliere API-Call
+    
+    lead_data = {
+        'name': lead_name,
+        'email': lead_email,
+        'source': lead_source,
+        'budget': lead_budget,
+        'timestamp': time.time(),
+        'status': 'processed'
+    }
+    lead_store.add(lead_data)
+    
+    return {
+        'message': f'Lead {lead_name} erfolgreich verarbeitet!',
+        'lead_data': lead_data
+    }
+
+def analyze_lead_n8n(data):
+    """Hintergrund-Job für /process-lead-n8n mit Gemini-Analyse"""
+    # Extract lead data
+    lead_name = data.get('name', 'Unknown')
+    lead_email = data.get('email', 'No email')
+    lead_source = data.get('source', 'n8n')
+    lead_budget = data.get('budget', 'Not specified')
+    lead_message = data.get('message', '')
+    
+    # Process with AI (gleichzeitige Leads werden zu einem Gemini-Aufruf gebündelt)
+    if lead_message:
+        try:
+            ai_analysis = lead_batcher.analyze({
+                'name': lead_name,
+                'email': lead_email,
+                'message': lead_message,
+                'budget': lead_budget
+            })
+        except Exception as ai_error:
+            print(f"AI processing error: {ai_error}")
+            ai_analysis = "AI-Verarbeitung fehlgeschlagen"
+    else:
+        ai_analysis = "Keine Nachricht zur Verarbeitung"
+    
+    # Create lead data
+    lead_data = {
+        'name': lead_name,
+        'email': lead_email,
+        'source': lead_source,
+        'budget': lead_budget,
+        'message': lead_message,
+        'ai_analysis': ai_analysis,
+        'timestamp': time.time(),
+        'status': 'processed_by_n8n',
+        'workflow_id': 'n8n-lead-processing'
+    }
+    
+    # Processed lead speichern (Write-Behind, abfragbar über /leads)
+    lead_store.add(lead_data)
+    
+    return {
+        'message': f'Lead {lead_name} erfolgreich von n8n verarbeitet!',
+        'lead_data': lead_data,
+        'ai_analysis': ai_analysis,
+        'workflow_status': 'completed'
+    }
+
+# Verarbeitete Leads dauerhaft speichern, gesammelt geschrieben vom Hintergrund-Thread
+LEAD_STORE_PATH = os.getenv('LEAD_STORE_PATH', 'leads.db')
+LEAD_STORE_FLUSH_INTERVAL = float(os.getenv('LEAD_STORE_FLUSH_INTERVAL', 0.2))
+LEAD_STORE_BATCH_SIZE = int(os.getenv('LEAD_STORE_BATCH_SIZE', 500))
+lead_store = LeadStore(LEAD_STORE_PATH, LEAD_STORE_FLUSH_INTERVAL, LEAD_STORE_BATCH_SIZE)
+
+# Micro-Batching: Leads innerhalb von LEAD_BATCH_WINDOW Sekunden teilen sich einen Modell-Aufruf
+LEAD_BATCH_WINDOW = float(os.getenv('LEAD_BATCH_WINDOW', 0.05))
+LEAD_BATCH_SIZE = int(os.getenv('LEAD_BATCH_SIZE', 8))
+lead_batcher = LeadBatcher(
+    lambda prompt: gemini_generate(prompt).text,
+    window=LEAD_BATCH_WINDOW,
+    max_batch=LEAD_BATCH_SIZE,
+    prompts=prompts
+)
+
+# Leads werden dauerhaft in SQLite eingereiht und von Hintergrund-Workern verarbeitet,
+# damit Webhook-Bursts die gunicorn-Worker nicht blockieren
+LEAD_QUEUE_PATH = os.getenv('LEAD_QUEUE_PATH', 'lead_queue.db')
+LEAD_QUEUE_WORKERS = int(os.getenv('LEAD_QUEUE_WORKERS', LEAD_BATCH_SIZE))
+LEAD_PROCESSING_DELAY = float(os.getenv('LEAD_PROCESSING_DELAY', 1))
+lead_queue = LeadQueue(LEAD_QUEUE_PATH, {
+    'lead': analyze_lead,
+    'lead_n8n': analyze_lead_n8n
+}, workers=LEAD_QUEUE_WORKERS)
+
+# n8n wiederholt Webhooks bei Timeout: Duplikate bekommen den bestehenden Job statt eines neuen Modellaufrufs
+LEAD_IDEMPOTENCY_TTL = float(os.getenv('LEAD_IDEMPOTENCY_TTL', 86400))
+
+def lead_idempotency_key(data):
+    """Idempotency-Key Header, sonst Hash des normalisierten Payloads; None bei leerem Payload"""
+    key = request.headers.get('Idempotency-Key', '').strip()
+    if key:
+        return f'header:{key[:200]}'
+    # Alle Felder zählen: gleiche E-Mail mit anderem Budget o.ä. ist ein neuer Lead, kein Retry
+    lead = {}
+    for field, value in data.items():
+        if isinstance(value, str):
+            value = value.strip().lower() if field == 'email' else value.strip()
+        if value not in ('', None):
+            lead[field] = value
+    if not lead:
+        return None
+    return 'lead:' + hashlib.sha256(fast_json.dumps(lead, sort_keys=True).encode('utf-8')).hexdigest()
+
+def lead_accepted_response(job_id, lead_name, **extra):
+    return jsonify({
+        'success': True,
+        'message': f'Lead {lead_name} angenommen, Verarbeitung läuft',
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/leads/{job_id}',
+        **extra
+    }), 202
+
 @app.route('/process-lead', methods=['POST'])
 def process_lead():
     try:
         data = request.get_json()
-        lead_name = data.get('name')
-        lead_email = data.get('email')
-        lead_source = data.get('source')
-        lead_budget = data.get('budget')
-        
-        # Hier würde die echte n8n/make.com Integration stehen
-        # Für jetzt simulieren wir es
-        
-        # Simuliere Verarbeitung
-        import time
-        time.sleep(1)  # Simuliere API-Call
-        
-        # Log Lead (könnte in Datenbank gespeichert werden)
-        lead_data = {
-            'name': lead_name,
-            'email': lead_email,
-            'source': lead_source,
-            'budget': lead_budget,
-            'timestamp': time.time(),
-            'status': 'processed'
-        }
-        
-        return jsonify({
-            'success': True,
-            'message': f'Lead {lead_name} erfolgreich verarbeitet!',
-            'lead_data': lead_data
-        })
+        job_id = lead_queue.enqueue('lead', data)
+        return lead_accepted_response(job_id, data.get('name'))
         
     except Exception as e:
         return jsonify({
@@ -80,59 +436,23 @@ def process_lead_n8n():
         # Log incoming n8n data
         print(f"n8n Webhook received: {data}")
         
-        # Extract lead data
-        lead_name = data.get('name', 'Unknown')
-        lead_email = data.get('email', 'No email')
-        lead_source = data.get('source', 'n8n')
-        lead_budget = data.get('budget', 'Not specified')
-        lead_message = data.get('message', '')
-        
-        # Process with AI (using existing Gemini integration)
-        if lead_message:
-            try:
-                # Use Gemini to process the message
-                prompt = f"""
-                Verarbeite diese Lead-Nachricht für Klick2Automade:
-                
-                NAME: {lead_name}
-                EMAIL: {lead_email}
-                NACHRICHT: {lead_message}
-                BUDGET: {lead_budget}
-                
-                Erstelle eine professionelle Antwort und Bewertung des Leads.
-                """
-                
-                ai_response = gemini_model.generate_content(prompt)
-                ai_analysis = ai_response.text
-            except Exception as ai_error:
-                print(f"AI processing error: {ai_error}")
-                ai_analysis = "AI-Verarbeitung fehlgeschlagen"
+        key = lead_idempotency_key(data)
+        if key is None:
+            job_id, duplicate = lead_queue.enqueue('lead_n8n', data), False
         else:
-            ai_analysis = "Keine Nachricht zur Verarbeitung"
-        
-        # Create lead data
-        lead_data = {
-            'name': lead_name,
-            'email': lead_email,
-            'source': lead_source,
-            'budget': lead_budget,
-            'message': lead_message,
-            'ai_analysis': ai_analysis,
-            'timestamp': time.time(),
-            'status': 'processed_by_n8n',
-            'workflow_id': 'n8n-lead-processing'
-        }
+            job_id, duplicate = lead_queue.enqueue_once('lead_n8n', data, key, LEAD_IDEMPOTENCY_TTL)
         
-        # Log the processed lead
-        print(f"Processed lead: {lead_data}")
-        
-        return jsonify({
-            'success': True,
-            'message': f'Lead {lead_name} erfolgreich von n8n verarbeitet!',
-            'lead_data': lead_data,
-            'ai_analysis': ai_analysis,
-            'workflow_status': 'completed'
-        })
+        if duplicate:
+            # Wiederholter Webhook: gleicher Job, Ergebnis über dieselbe status_url
+            job = lead_queue.get(job_id)
+            return lead_accepted_response(
+                job_id, data.get('name', 'Unknown'),
+                status=job['status'],
+                workflow_status=job['status'],
+                duplicate=True,
+                result=job['result']
+            )
+        return lead_accepted_response(job_id, data.get('name', 'Unknown'), workflow_status='queued')
         
     except Exception as e:
         print(f"n8n webhook error: {e}")
@@ -142,37 +462,262 @@ def process_lead_n8n():
             'workflow_status': 'failed'
         }), 500
 
+def lead_filters():
+    """Filter aus den Query-Parametern von /leads und /leads/stats"""
+    since = request.args.get('since')
+    until = request.args.get('until')
+    return {
+        'email': request.args.get('email') or None,
+        'source': request.args.get('source') or None,
+        'status': request.args.get('status') or None,
+        'since': float(since) if since else None,
+        'until': float(until) if until else None
+    }
+
+@app.route('/leads', methods=['GET'])
+def list_leads():
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+        page = lead_store.query(limit=limit, cursor=request.args.get('cursor') or None, **lead_filters())
+        return jsonify({
+            'success': True,
+            **page
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/leads/stats', methods=['GET'])
+def lead_stats():
+    try:
+        group_by = request.args.get('group_by', 'source')
+        return jsonify({
+            'success': True,
+            'group_by': group_by,
+            'counts': lead_store.aggregate(group_by, **lead_filters()),
+            'store': lead_store.stats()
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/leads/<job_id>', methods=['GET'])
+def lead_status(job_id):
+    job = lead_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job nicht gefunden'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        **job
+    })
+
+# Workflow-Engine: DAGs aus HTTP-, Gemini- und Lead-Routing-Schritten auf einem begrenzten Thread-Pool
+WORKFLOW_DB_PATH = os.getenv('WORKFLOW_DB_PATH', 'workflows.db')
+WORKFLOW_WORKERS = int(os.getenv('WORKFLOW_WORKERS', 8))
+# Kommagetrennte Hosts für HTTP-Schritte; leer = HTTP-Schritte gesperrt
+WORKFLOW_HTTP_ALLOWED_HOSTS = {
+    host.strip().lower() for host in os.getenv('WORKFLOW_HTTP_ALLOWED_HOSTS', '').split(',') if host.strip()
+}
+
+def workflow_http_step(step, context):
+    """HTTP-Aufruf; $platzhalter in URL und String-Werten des JSON-Bodys werden ersetzt"""
+    url = render_text(step['url'], context)
+    check_http_target(url, WORKFLOW_HTTP_ALLOWED_HOSTS)
+    body = step.get('json')
+    if isinstance(body, dict):
+        body = {key: render_text(value, context) if isinstance(value, str) else value for key, value in body.items()}
+    response = requests.request(step.get('method', 'GET'), url, json=body, headers=step.get('headers'),
+                                timeout=step.get('timeout', 10), allow_redirects=False)
+    response.raise_for_status()
+    try:
+        result = response.json()
+    except ValueError:
+        result = response.text[:10000]
+    return {'status': response.status_code, 'body': result}
+
+def workflow_gemini_step(step, context):
+    """Gemini-Prompt aus einer Vorlage in prompts/ (template) oder direkt als Text (prompt)"""
+    values = {'input': fast_json.dumps(context['input']), **template_values(context), **step.get('values', {})}
+    if 'template' in step:
+        template = prompts.templates.get(step['template'])
+        if template is None:
+            raise ValueError(f"Unbekannte Prompt-Vorlage: {step['template']}")
+        prompt = prompts.render(step['template'], **{name: values.get(name, '') for name in template.variables}).text
+    else:
+        prompt = render_text(step['prompt'], context)
+    return {'text': gemini_generate(prompt).text}
+
+def default_workflow_steps(workflow_type, name, description):
+    """Schritte für Workflows, die ohne eigene steps angelegt werden"""
+    if workflow_type == 'lead':
+        # Routing und Analyse laufen parallel, die Zusammenfassung wartet auf beide
+        return [
+            {'id': 'route', 'type': 'lead_route', 'default': 'standard', 'rules': [
+                {'field': 'budget', 'min': 5000, 'route': 'premium'},
+                {'field': 'source', 'equals': 'linkedin', 'route': 'sales'}
+            ]},
+            {'id': 'analyse', 'type': 'gemini', 'template': 'lead'},
+            {'id': 'summary', 'type': 'gemini', 'template': 'workflow_lead_summary',
+             'depends_on': ['route', 'analyse']}
+        ]
+    return [{'id': 'entwurf', 'type': 'gemini', 'template': 'workflow_task',
+             'values': {'workflow': name, 'description': description}}]
+
+workflow_engine = WorkflowEngine(WORKFLOW_DB_PATH, {
+    'http': workflow_http_step,
+    'gemini': workflow_gemini_step,
+    'lead_route': route_lead
+}, workers=WORKFLOW_WORKERS)
+
+# Die vordefinierten Workflows der Freelancer-Seite
+BUILTIN_WORKFLOWS = {
+    'lead-router': ('Lead Router', 'lead', 'Eingehende Leads werden automatisch kategorisiert und weitergeleitet.'),
+    'invoice-generator': ('Invoice Generator', 'invoice', 'Rechnung zu einem Projekt erstellen und an den Kunden senden.'),
+    'email-followup': ('E-Mail Follow-Up', 'email', 'Follow-Up E-Mail nach Projektabschluss oder Lead-Kontakt.'),
+    'project-status': ('Projekt Status Updates', 'project', 'Status-Update für Kunden über den Projektfortschritt.')
+}
+for workflow_id, (name, workflow_type, description) in BUILTIN_WORKFLOWS.items():
+    workflow_engine.create({
+        'name': name,
+        'type': workflow_type,
+        'config': {'description': description, 'builtin': True},
+        'steps': default_workflow_steps(workflow_type, name, description)
+    }, workflow_id=workflow_id)
+
+# Request-Body von /create-workflow; die Schritte prüft die Engine (WORKFLOW_SCHEMA, check_dag)
+validate_create_workflow = compile_schema({
+    'type': 'object',
+    'properties': {
+        'name': {'type': 'string'},
+        'type': {'type': ['string', 'null']},
+        'config': {'type': 'object', 'properties': {'description': {'type': 'string'}}},
+        'steps': {'type': ['array', 'null']}
+    },
+    'required': ['name']
+})
+
+def workflow_not_found():
+    return jsonify({
+        'success': False,
+        'error': 'Workflow nicht gefunden'
+    }), 404
+
 @app.route('/create-workflow', methods=['POST'])
 def create_workflow():
     try:
         data = request.get_json()
+        validate_create_workflow(data)
         workflow_name = data.get('name')
         workflow_type = data.get('type')
         workflow_config = data.get('config', {})
         
-        # Hier würde die echte Workflow-Erstellung stehen
-        # Für jetzt simulieren wir es
-        
-        workflow_data = {
-            'id': f'wf_{int(time.time())}',
+        steps = data.get('steps') or default_workflow_steps(
+            workflow_type, workflow_name, workflow_config.get('description', ''))
+        workflow_data = workflow_engine.create({
             'name': workflow_name,
             'type': workflow_type,
             'config': workflow_config,
-            'status': 'active',
-            'created_at': time.time()
-        }
+            'steps': steps
+        })
         
         return jsonify({
             'success': True,
             'workflow': workflow_data
         })
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/workflows', methods=['GET'])
+def list_workflows():
+    return jsonify({
+        'success': True,
+        'workflows': workflow_engine.list(),
+        'stats': workflow_engine.stats()
+    })
+
+@app.route('/workflows/<workflow_id>', methods=['GET'])
+def get_workflow(workflow_id):
+    workflow = workflow_engine.get(workflow_id)
+    if workflow is None:
+        return workflow_not_found()
+    return jsonify({
+        'success': True,
+        'workflow': workflow,
+        'runs': workflow_engine.runs(workflow_id, limit=10)
+    })
+
+@app.route('/workflows/<workflow_id>/run', methods=['POST'])
+def run_workflow(workflow_id):
+    try:
+        data = request.get_json(silent=True) or {}
+        run = workflow_engine.start(workflow_id, data.get('input', {}))
+        if run is None:
+            return workflow_not_found()
+        return jsonify({
+            'success': True,
+            **run,
+            'status_url': f"/workflow-runs/{run['run_id']}"
+        }), 202
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/workflows/<workflow_id>/runs', methods=['GET'])
+def workflow_runs(workflow_id):
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 200))
+        return jsonify({
+            'success': True,
+            'runs': workflow_engine.runs(workflow_id, limit=limit)
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+@app.route('/workflow-runs/<run_id>', methods=['GET'])
+def workflow_run_status(run_id):
+    run = workflow_engine.run(run_id)
+    if run is None:
+        return jsonify({
+            'success': False,
+            'error': 'Run nicht gefunden'
+        }), 404
+    return jsonify({
+        'success': True,
+        **run
+    })
+
 @app.route('/create-vector-store', methods=['POST'])
 def create_vector_store():
     try:
@@ -180,9 +725,11 @@ def create_vector_store():
         store_name = data.get('name', 'Support FAQ')
         
         # Create vector store
-        vector_store = client.vector_stores.create(
-            name=store_name
-        )
+        with openai_gate.slot():
+            vector_store = client.vector_stores.create(
+                name=store_name
+            )
+        store_catalog.invalidate()
         
         return jsonify({
             'success': True,
@@ -194,7 +741,50 @@ def create_vector_store():
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
+        }), error_status(e)
+
+def index_file(progress, vector_store_id, file_name, file_content):
+    """Hintergrund-Job: Datei direkt aus dem Speicher hochladen und Indexierung abwarten"""
+    progress('uploading')
+    with openai_gate.slot():
+        uploaded = client.files.create(
+            file=(file_name, file_content.encode('utf-8')),
+            purpose='assistants'
+        )
+    
+    progress('indexing', file_id=uploaded.id)
+    with openai_gate.slot():
+        created = client.vector_stores.files.create(
+            vector_store_id,
+            file_id=uploaded.id
+        )
+    # Während der Indexierung keinen OpenAI-Slot blockieren, nur die einzelnen Statusabfragen laufen durchs Gate
+    result = wait_for_indexing(
+        created,
+        lambda: client.vector_stores.files.retrieve(uploaded.id, vector_store_id=vector_store_id),
+        openai_gate.slot,
+        UPLOAD_POLL_INTERVAL
+    )
+    store_catalog.invalidate()
+    
+    return {
+        'file_id': result.id,
+        'vector_store_id': vector_store_id,
+        'file_status': result.status
+    }
+
+def index_files(progress, vector_store_id, files):
+    """Hintergrund-Job: viele Dateien parallel hochladen und als ein File-Batch anhängen"""
+    result = upload_batch(client, vector_store_id, files, UPLOAD_BATCH_CONCURRENCY, openai_gate, progress,
+                          UPLOAD_POLL_INTERVAL)
+    store_catalog.invalidate()
+    return result
+
+UPLOAD_JOBS_PATH = os.getenv('UPLOAD_JOBS_PATH', 'upload_jobs.db')
+upload_jobs = UploadJobs(UPLOAD_JOBS_PATH, workers=int(os.getenv('UPLOAD_WORKERS', 4)))
+UPLOAD_BATCH_CONCURRENCY = int(os.getenv('UPLOAD_BATCH_CONCURRENCY', 8))
+# Abstand der Statusabfragen während der Indexierung (Sekunden)
+UPLOAD_POLL_INTERVAL = float(os.getenv('UPLOAD_POLL_INTERVAL', 1))
 
 @app.route('/upload-file', methods=['POST'])
 def upload_file():
@@ -204,54 +794,123 @@ def upload_file():
         file_content = data.get('file_content')
         file_name = data.get('file_name', 'customer_policies.txt')
         
-        # Create temporary file
-        temp_file_path = f"temp_{file_name}"
-        with open(temp_file_path, 'w', encoding='utf-8') as f:
-            f.write(file_content)
-        
-        # Upload file to vector store
-        with open(temp_file_path, 'rb') as f:
-            result = client.vector_stores.files.upload_and_poll(
-                vector_store_id=vector_store_id,
-                file=f
-            )
+        if not vector_store_id or not file_content:
+            return jsonify({
+                'success': False,
+                'error': 'vector_store_id und file_content sind erforderlich'
+            }), 400
         
-        # Clean up temporary file
-        os.remove(temp_file_path)
+        # Upload und Indexierung laufen im Hintergrund, der Client pollt /upload-status/<job_id>
+        job_id = upload_jobs.submit(
+            index_file, vector_store_id, file_name, file_content,
+            vector_store_id=vector_store_id, file_name=file_name
+        )
         
         return jsonify({
             'success': True,
-            'file_id': result.id,
-            'status': result.status
-        })
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/upload-status/{job_id}'
+        }), 202
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
+        }), error_status(e)
 
-@app.route('/list-vector-stores', methods=['GET'])
-def list_vector_stores():
+@app.route('/upload-files', methods=['POST'])
+def upload_files():
     try:
-        vector_stores = client.vector_stores.list()
-        stores = []
-        for store in vector_stores.data:
-            stores.append({
-                'id': store.id,
-                'name': store.name,
-                'status': store.status,
-                'created_at': store.created_at
-            })
+        # Multipart (mehrere "files"-Felder, .zip wird entpackt) oder JSON mit files/zip_base64
+        if request.files:
+            vector_store_id = request.form.get('vector_store_id')
+            files = collect_files(uploads=[(f.filename, f.read()) for f in request.files.getlist('files')])
+        else:
+            data = request.get_json()
+            vector_store_id = data.get('vector_store_id')
+            files = collect_files(data.get('files'), data.get('zip_base64'))
+        
+        if not vector_store_id or not files:
+            return jsonify({
+                'success': False,
+                'error': 'vector_store_id und mindestens eine Datei sind erforderlich'
+            }), 400
+        
+        job_id = upload_jobs.submit(
+            index_files, vector_store_id, files,
+            vector_store_id=vector_store_id, file_count=len(files)
+        )
         
         return jsonify({
             'success': True,
-            'vector_stores': stores
+            'job_id': job_id,
+            'file_count': len(files),
+            'status': 'queued',
+            'status_url': f'/upload-status/{job_id}'
+        }), 202
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), error_status(e)
+
+@app.route('/upload-status/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job nicht gefunden'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        **job
+    })
+
+def fetch_vector_store_page(limit, after):
+    """Eine Seite der Vector Stores von OpenAI laden"""
+    params = {'limit': limit}
+    if after:
+        params['after'] = after
+    with openai_gate.slot():
+        page = client.vector_stores.list(**params)
+    stores = []
+    for store in page.data:
+        stores.append({
+            'id': store.id,
+            'name': store.name,
+            'status': store.status,
+            'created_at': store.created_at
         })
+    
+    return {
+        'success': True,
+        'vector_stores': stores,
+        'has_more': page.has_more,
+        'next_after': stores[-1]['id'] if page.has_more and stores else None
+    }
+
+# Katalog-Cache: kurze TTL, explizite Invalidierung nach Create/Upload im selben Prozess
+store_catalog = StoreCatalog(fetch_vector_store_page, ttl=float(os.getenv('STORE_CATALOG_TTL', 10)),
+                             max_pages=int(os.getenv('STORE_CATALOG_MAX_PAGES', 256)))
+
+@app.route('/list-vector-stores', methods=['GET'])
+def list_vector_stores():
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 100))
+        after = request.args.get('after') or None
+        page = store_catalog.get_page(limit, after)
+        
+        response = app.response_class(page.body, mimetype='application/json')
+        response.set_etag(page.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
+        }), error_status(e)
 
 # NEUE GEMINI AI ROUTEN 🚀
 @app.route('/ask-question', methods=['POST'])
@@ -267,32 +926,170 @@ def ask_question():
                 'error': 'Keine Frage angegeben'
             }), 400
         
-        # Lade die Kundenrichtlinien
-        with open('customer_policies.txt', 'r', encoding='utf-8') as f:
-            policies_content = f.read()
+        policy_index = bind_policy_version()
+        cache_key = (normalize_question(question), policy_index.content_hash)
+        cached = answer_cache.get(cache_key)
+        if cached is not None:
+            if wants_stream(data):
+                return sse_response(iter([
+                    sse_event({'delta': cached['answer']}),
+                    sse_event(dict(cached, cached=True), event='done')
+                ]))
+            return jsonify(dict(cached, cached=True))
         
-        # Erstelle den Prompt für Gemini
-        prompt = f"""
-Du bist ein intelligenter Assistent für Klick2Automade. Beantworte die folgende Frage basierend auf den Kundenrichtlinien:
-
-KUNDENRICHTLINIEN:
-{policies_content}
-
-FRAGE: {question}
-
-Antworte präzise und hilfreich auf Deutsch. Wenn die Antwort nicht in den Richtlinien steht, sage das ehrlich.
-"""
+        # Relevanteste Abschnitte der Kundenrichtlinien, kleine Dokumente gehen komplett in den Prompt
+        sections = policy_index.search(question, POLICY_TOP_K)
+        
+        # Erstelle den Prompt für Gemini: mit Context Cache nur die Frage (Richtlinien komplett im Cache),
+        # sonst die Richtlinien inline; sources = tatsächlich gesendete Abschnitte
+        cached_model = policy_context.model_for(policy_index)
+        if cached_model is not None:
+            sources = policy_index.chunks
+            prompt = prompts.render('ask_question_cached', question=question).text
+        else:
+            sources = policy_index.context_sections(sections, POLICY_CONTEXT_TOKENS)
+            policies_content = policy_index.context(sections, POLICY_CONTEXT_TOKENS)
+            prompt = prompts.render('ask_question', policies=policies_content, question=question).text
+        
+        def build_result(answer):
+            result = {
+                'success': True,
+                'answer': answer,
+                'source': 'Kundenrichtlinien',
+                'sections': [section.title for section in sources],
+                'confidence': 0.95
+            }
+            answer_cache.set(cache_key, result)
+            return result
+        
+        if wants_stream(data):
+            return stream_generation(prompt, build_result, cached_model)
         
         # Generiere Antwort mit Gemini
-        response = gemini_model.generate_content(prompt)
+        response = gemini_generate(prompt, cached_model)
+        
+        return jsonify(build_result(response.text))
         
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), error_status(e)
+
+@app.route('/ask', methods=['POST'])
+def ask():
+    """Antwort plus Folgefragen aus einem Modellaufruf (statt /ask-question + /generate-followups)"""
+    try:
+        data = request.get_json()
+        question = data.get('question')
+        
+        if not question:
+            return jsonify({
+                'success': False,
+                'error': 'Keine Frage angegeben'
+            }), 400
+        
+        policy_index = bind_policy_version()
+        cache_key = ('ask', normalize_question(question), policy_index.content_hash)
+        cached = answer_cache.get(cache_key)
+        if cached is not None:
+            if wants_stream(data):
+                return sse_response(iter([
+                    sse_event({'delta': cached['answer']}),
+                    sse_event(dict(cached, cached=True), event='done')
+                ]))
+            return jsonify(dict(cached, cached=True))
+        
+        sections = policy_index.search(question, POLICY_TOP_K)
+        cached_model = policy_context.model_for(policy_index)
+        if cached_model is not None:
+            sources = policy_index.chunks
+            prompt = prompts.render('ask_combined_cached', question=question, marker=FOLLOWUPS_MARKER).text
+        else:
+            sources = policy_index.context_sections(sections, POLICY_CONTEXT_TOKENS)
+            policies_content = policy_index.context(sections, POLICY_CONTEXT_TOKENS)
+            prompt = prompts.render('ask_combined', policies=policies_content, question=question,
+                                    marker=FOLLOWUPS_MARKER).text
+        
+        def build_result(text):
+            answer, tail = split_answer(text, FOLLOWUPS_MARKER)
+            if tail.strip():
+                followups_data = followups_output.resolve(gemini_generate, tail)
+            else:
+                # Modell hat den Marker ausgelassen: Folgefragen wie bisher separat erzeugen
+                followups_data = followups_output.generate(gemini_generate, prompts.render(
+                    'generate_followups', question=question, answer=answer).text)
+            result = {
+                'success': True,
+                'answer': answer,
+                'followups': followups_data['followups'] if followups_data else FALLBACK_FOLLOWUPS,
+                'source': 'Kundenrichtlinien',
+                'sections': [section.title for section in sources],
+                'confidence': 0.95
+            }
+            if followups_data:
+                answer_cache.set(cache_key, result)
+            return result
+        
+        if wants_stream(data):
+            return stream_generation(prompt, build_result, cached_model, MarkerSplitter(FOLLOWUPS_MARKER))
+        
+        response = gemini_generate(prompt, cached_model)
+        
+        return jsonify(build_result(response.text))
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), error_status(e)
+
+# Todo-Boards serverseitig: versionierte Einträge, Delta-Sync (since=<version>) und Batch-Änderungen
+TODO_STORE_PATH = os.getenv('TODO_STORE_PATH', 'todos.db')
+TODO_MAX_BATCH = int(os.getenv('TODO_MAX_BATCH', 1000))
+todo_store = TodoStore(TODO_STORE_PATH, TODO_MAX_BATCH)
+
+@app.route('/todos', methods=['GET'])
+def list_todos():
+    try:
+        board = todo_store.check_board(request.args.get('board', 'default'))
+        since = int(request.args.get('since', 0))
         return jsonify({
             'success': True,
-            'answer': response.text,
-            'source': 'Kundenrichtlinien',
-            'confidence': 0.95
+            'board': board,
+            **todo_store.changes(board, since)
         })
-        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/todos', methods=['PATCH', 'POST'])
+def update_todos():
+    """Viele Änderungen in einem Request; mit since kommen zusätzlich fremde Änderungen seit dieser Version zurück"""
+    try:
+        data = request.get_json()
+        board = todo_store.check_board(data.get('board', 'default'))
+        result = todo_store.apply(board, data.get('changes', []))
+        if data.get('since') is not None:
+            delta = todo_store.changes(board, int(data['since']))
+            result.update(version=delta['version'], full=delta['full'], todos=delta['todos'])
+        return jsonify({
+            'success': True,
+            'board': board,
+            **result
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -306,64 +1103,27 @@ def generate_todos():
         project_description = data.get('description', '')
         
         # Erstelle den Prompt für intelligente Todo-Generierung
-        prompt = f"""
-Erstelle 5-7 intelligente Todo-Aufgaben für folgendes Projekt:
-
-PROJEKT: {project_description}
-
-Erstelle Aufgaben mit:
-- Realistischen Titeln
-- Detaillierten Beschreibungen
-- Angemessenen Prioritäten (hoch/mittel/niedrig)
-- Passenden Kategorien (Entwicklung/Testing/Dokumentation/Deployment/Wartung)
-
-Antworte im JSON Format:
-{{
-    "todos": [
-        {{
-            "title": "Titel der Aufgabe",
-            "description": "Detaillierte Beschreibung",
-            "priority": "hoch/mittel/niedrig",
-            "category": "Entwicklung/Testing/Dokumentation/Deployment/Wartung"
-        }}
-    ]
-}}
-"""
-        
-        response = gemini_model.generate_content(prompt)
-        
-        # Parse JSON Response
-        try:
-            todos_data = json.loads(response.text)
-            return jsonify({
-                'success': True,
-                'todos': todos_data.get('todos', [])
-            })
-        except json.JSONDecodeError:
-            # Fallback falls JSON Parsing fehlschlägt
+        prompt = prompts.render('generate_todos', description=project_description).text
+        
+        todos_data = todos_output.generate(gemini_generate, prompt)
+        if todos_data is None:
+            # Fallback falls auch die Reparatur scheitert
             return jsonify({
                 'success': True,
-                'todos': [
-                    {
-                        'title': 'Projekt Setup',
-                        'description': 'Grundlegende Projektstruktur einrichten',
-                        'priority': 'hoch',
-                        'category': 'Entwicklung'
-                    },
-                    {
-                        'title': 'Testing implementieren',
-                        'description': 'Automatisierte Tests für das Projekt erstellen',
-                        'priority': 'mittel',
-                        'category': 'Testing'
-                    }
-                ]
+                'todos': FALLBACK_TODOS,
+                'fallback': True
             })
         
+        return jsonify({
+            'success': True,
+            'todos': todos_data['todos']
+        })
+        
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
+        }), error_status(e)
 
 @app.route('/generate-followups', methods=['POST'])
 def generate_followups():
@@ -378,58 +1138,39 @@ def generate_followups():
                 'error': 'Fehlende Daten'
             }), 400
         
-        prompt = f"""
-Du bist ein hilfreicher Assistent. Basierend auf dieser Frage und Antwort, generiere EXAKT 3 relevante Follow-Up-Fragen auf Deutsch.
-
-FRAGE: {original_question}
-ANTWORT: {original_answer}
-
-Wichtige Regeln:
-- Generiere genau 3 Fragen
-- Jede Frage muss logisch auf die Originale folgen
-- Antworte NUR mit validem JSON, ohne zusätzlichen Text
-- Format: {{"followups": ["Frage 1", "Frage 2", "Frage 3"]}}
-
-Beispiel:
-{{"followups": ["Wie viel kostet das?", "Wann ist es verfügbar?", "Gibt es Alternativen?"]}}
-"""
-        
-        response = gemini_model.generate_content(prompt)
-        
-        try:
-            # Entferne mögliche Markdown oder Extra-Text
-            response_text = response.text.strip().replace('```json', '').replace('```', '')
-            followups_data = json.loads(response_text)
-            followups = followups_data.get('followups', [])
-            
-            if len(followups) == 0:
-                # Fallback Fragen
-                followups = [
-                    "Können Sie das genauer erklären?",
-                    "Gibt es damit zusammenhängende Kosten?",
-                    "Wie wirkt sich das auf mein Projekt aus?"
-                ]
-            
+        policy_index = bind_policy_version()
+        cache_key = (normalize_question(original_question), content_digest(original_answer), policy_index.content_hash)
+        cached = followup_cache.get(cache_key)
+        if cached is not None:
             return jsonify({
                 'success': True,
-                'followups': followups
+                'followups': cached,
+                'cached': True
             })
-        except json.JSONDecodeError:
-            # Erweiterter Fallback
+        
+        prompt = prompts.render('generate_followups', question=original_question, answer=original_answer).text
+        
+        followups_data = followups_output.generate(gemini_generate, prompt)
+        if followups_data is None:
+            # Fallback falls auch die Reparatur scheitert
             return jsonify({
                 'success': True,
-                'followups': [
-                    "Was sind die nächsten Schritte?",
-                    "Gibt es Beispiele dazu?",
-                    "Wie kann ich das anpassen?"
-                ]
+                'followups': FALLBACK_FOLLOWUPS,
+                'fallback': True
             })
         
+        followups = followups_data['followups']
+        followup_cache.set(cache_key, followups)
+        return jsonify({
+            'success': True,
+            'followups': followups
+        })
+        
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
+        }), error_status(e)
 
 @app.route('/ai-suggestions', methods=['POST'])
 def ai_suggestions():
@@ -438,22 +1179,15 @@ def ai_suggestions():
         todo_title = data.get('title', '')
         todo_description = data.get('description', '')
         
-        prompt = f"""
-Analysiere diese Todo-Aufgabe und gib intelligente Verbesserungsvorschläge:
-
-TITEL: {todo_title}
-BESCHREIBUNG: {todo_description}
-
-Gib Vorschläge für:
-1. Bessere Prioritätseinstufung
-2. Zusätzliche Schritte
-3. Mögliche Risiken
-4. Optimierte Beschreibung
-
-Antworte kurz und präzise auf Deutsch.
-"""
+        prompt = prompts.render('ai_suggestions', title=todo_title, description=todo_description).text
         
-        response = gemini_model.generate_content(prompt)
+        if wants_stream(data):
+            return stream_generation(prompt, lambda suggestions: {
+                'success': True,
+                'suggestions': suggestions
+            })
+        
+        response = gemini_generate(prompt)
         
         return jsonify({
             'success': True,
@@ -464,7 +1198,37 @@ Antworte kurz und präzise auf Deutsch.
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
+        }), error_status(e)
+
+@app.route('/upstream-stats', methods=['GET'])
+def upstream_stats():
+    return jsonify({
+        'success': True,
+        'gemini': gemini_gate.stats(),
+        'openai': openai_gate.stats(),
+        'clients': client_limiter.stats()
+    })
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        'success': True,
+        'ask_question': answer_cache.stats(),
+        'generate_followups': followup_cache.stats(),
+        'policy_context': policy_context.stats()
+    })
+
+@app.route('/prompt-stats', methods=['GET'])
+def prompt_stats():
+    return jsonify({
+        'success': True,
+        'max_tokens': prompts.max_tokens,
+        'templates': prompts.stats(),
+        'structured_output': {
+            'generate_todos': todos_output.stats(),
+            'generate_followups': followups_output.stats()
+        }
+    })
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8000))
@@ -0,0 +1,113 @@
+"""
+Bulk Upload
+Viele Dateien (oder ein ZIP-Archiv) parallel hochladen und per File-Batch an einen Vector Store hängen
+"""
+
+import base64
+import io
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+MAX_ZIP_FILES = 1000
+MAX_ZIP_BYTES = 200 * 1024 * 1024
+INDEX_POLL_INTERVAL = 1.0
+
+
+def extract_zip(data: bytes) -> List[Tuple[str, bytes]]:
+    """Entpackt alle regulären Dateien eines ZIP-Archivs in den Speicher"""
+    files = []
+    total = 0
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                continue
+            total += info.file_size
+            if len(files) >= MAX_ZIP_FILES or total > MAX_ZIP_BYTES:
+                raise ValueError('ZIP-Archiv zu groß')
+            files.append((name, archive.read(info)))
+    return files
+
+
+def collect_files(entries: Optional[List[Dict]] = None, zip_base64: Optional[str] = None,
+                  uploads: Optional[List[Tuple[str, bytes]]] = None) -> List[Tuple[str, bytes]]:
+    """Normalisiert JSON-Einträge, Base64-ZIPs und Multipart-Uploads zu (name, bytes)-Paaren"""
+    files: List[Tuple[str, bytes]] = []
+    for i, entry in enumerate(entries or []):
+        content = entry.get('file_content', '')
+        files.append((entry.get('file_name') or f'datei_{i + 1}.txt',
+                      content.encode('utf-8') if isinstance(content, str) else content))
+    if zip_base64:
+        files.extend(extract_zip(base64.b64decode(zip_base64)))
+    for name, content in uploads or []:
+        if name.lower().endswith('.zip'):
+            files.extend(extract_zip(content))
+        else:
+            files.append((name, content))
+    return files
+
+
+def wait_for_indexing(item: Any, retrieve: Callable[[], Any], slot: Callable = nullcontext,
+                      interval: float = INDEX_POLL_INTERVAL) -> Any:
+    """Fragt retrieve() ab, solange item.status 'in_progress' ist. Anders als bei create_and_poll gilt
+    der Gate-Slot nur für die einzelne Abfrage, nicht für die Wartezeit der Indexierung"""
+    while item.status == 'in_progress':
+        time.sleep(interval)
+        with slot():
+            item = retrieve()
+    return item
+
+
+def upload_batch(client, vector_store_id: str, files: List[Tuple[str, bytes]], max_concurrency: int = 8,
+                 gate=None, progress: Optional[Callable] = None, poll_interval: float = INDEX_POLL_INTERVAL) -> Dict:
+    """Lädt files mit begrenzter Parallelität hoch und hängt sie in einem File-Batch an"""
+    slot = gate.slot if gate is not None else nullcontext
+    results = [{'file_name': name, 'file_id': None, 'status': 'pending', 'error': None} for name, _ in files]
+
+    def upload(index: int):
+        name, content = files[index]
+        try:
+            with slot():
+                uploaded = client.files.create(file=(name, content), purpose='assistants')
+            results[index].update(file_id=uploaded.id, status='uploaded')
+        except Exception as e:
+            results[index].update(status='failed', error=str(e))
+
+    if progress:
+        progress('uploading', files=results)
+    with ThreadPoolExecutor(max(1, min(max_concurrency, len(files)))) as pool:
+        list(pool.map(upload, range(len(files))))
+
+    file_ids = [result['file_id'] for result in results if result['file_id']]
+    if not file_ids:
+        return {'batch_id': None, 'batch_status': 'failed', 'file_counts': None, 'files': results}
+
+    if progress:
+        progress('indexing', files=results)
+    with slot():
+        batch = client.vector_stores.file_batches.create(vector_store_id, file_ids=file_ids)
+    batch = wait_for_indexing(
+        batch, lambda: client.vector_stores.file_batches.retrieve(batch.id, vector_store_id=vector_store_id),
+        slot, poll_interval
+    )
+    with slot():
+        statuses = {
+            entry.id: (entry.status, entry.last_error.message if entry.last_error else None)
+            for entry in client.vector_stores.file_batches.list_files(
+                batch.id, vector_store_id=vector_store_id, limit=100
+            )
+        }
+    for result in results:
+        if result['file_id'] in statuses:
+            result['status'], result['error'] = statuses[result['file_id']]
+
+    return {
+        'batch_id': batch.id,
+        'batch_status': batch.status,
+        'file_counts': batch.file_counts.model_dump() if hasattr(batch.file_counts, 'model_dump') else batch.file_counts,
+        'files': results
+    }
@@ -0,0 +1,24 @@
+"""
+Gemeinsame Test-Konfiguration: app.py ohne echte API Keys und ohne
+Datenbank-Dateien im Projektverzeichnis importierbar machen
+"""
+
+import os
+import tempfile
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+os.environ.setdefault('GEMINI_API_KEY', 'test-key')
+os.environ.setdefault('LEAD_PROCESSING_DELAY', '0')
+os.environ.setdefault('UPLOAD_POLL_INTERVAL', '0.01')
+
+_data_dir = tempfile.mkdtemp(prefix='light-autom8-tests-')
+os.environ.setdefault('LEAD_QUEUE_PATH', os.path.join(_data_dir, 'lead_queue.db'))
+os.environ.setdefault('UPLOAD_JOBS_PATH', os.path.join(_data_dir, 'upload_jobs.db'))
+os.environ.setdefault('LEAD_STORE_PATH', os.path.join(_data_dir, 'leads.db'))
+os.environ.setdefault('TODO_STORE_PATH', os.path.join(_data_dir, 'todos.db'))
+os.environ.setdefault('WORKFLOW_DB_PATH', os.path.join(_data_dir, 'workflows.db'))
+os.environ.setdefault('RATE_LIMIT_PATH', os.path.join(_data_dir, 'rate_limits.db'))
+# Lasttests und Benchmarks sollen nicht an den Produktions-Limits hängen; test_rate_limit.py setzt eigene
+os.environ.setdefault('CLIENT_RATE_LIMIT', '0')
+os.environ.setdefault('GEMINI_RPM', '0')
+os.environ.setdefault('OPENAI_RPM', '0')
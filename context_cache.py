@@ -0,0 +1,118 @@
+"""
+Context Cache
+Lädt den statischen Prompt-Präfix (System-Instruktion + Kundenrichtlinien) einmal als Gemini Cached Content hoch,
+damit pro Frage nur noch die Frage selbst gesendet wird. Neu angelegt bei geänderter Richtlinien-Datei
+(content_hash) oder kurz vor Ablauf der TTL; ohne Caching-API fällt der Aufrufer auf Inline-Prompts zurück.
+"""
+
+import datetime
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import google.generativeai as genai
+
+logger = logging.getLogger(__name__)
+
+# Cache etwas vor Ablauf der TTL erneuern, damit kein Request auf einen gerade abgelaufenen Cache trifft
+RENEW_FRACTION = 0.9
+
+
+def _default_model_factory(cached_content: Any) -> Any:
+    return genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+
+
+class PolicyContextCache:
+    """Ein Cached Content pro Richtlinien-Version; model_for() liefert das daran gebundene Modell oder None"""
+
+    def __init__(self, model_name: str, system_instruction: str, ttl: float = 3600,
+                 retry_interval: float = 300, enabled: bool = True, caching: Any = None,
+                 model_factory: Optional[Callable[[Any], Any]] = None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        # google-generativeai < 0.7 hat kein caching-Modul: dann immer Inline-Prompts
+        self.caching = caching if caching is not None else getattr(genai, 'caching', None)
+        self.enabled = enabled and self.caching is not None
+        self.model_factory = model_factory or _default_model_factory
+        self._lock = threading.Lock()
+        self._content_hash: Optional[str] = None
+        self._cached_content: Any = None
+        self._model: Any = None
+        self._created_at = 0.0
+        self._failed_at: Optional[float] = None
+        self.created = 0
+        self.failures = 0
+        self.hits = 0
+        self.fallbacks = 0
+
+    def model_for(self, policy_index) -> Optional[Any]:
+        """Modell mit gecachtem Richtlinien-Kontext für diese Index-Version, None = Inline-Prompt verwenden"""
+        if not self.enabled:
+            with self._lock:
+                self.fallbacks += 1
+            return None
+        with self._lock:
+            now = time.monotonic()
+            if (self._model is not None and self._content_hash == policy_index.content_hash
+                    and now - self._created_at < self.ttl * RENEW_FRACTION):
+                self.hits += 1
+                return self._model
+            if self._failed_at is not None and now - self._failed_at < self.retry_interval:
+                self.fallbacks += 1
+                return None
+            # Unter dem Lock anlegen: gleichzeitige Requests warten auf einen Cache statt mehrere anzulegen
+            try:
+                cached_content = self.caching.CachedContent.create(
+                    model=self.model_name,
+                    display_name=f'policies-{policy_index.content_hash[:12]}',
+                    system_instruction=self.system_instruction,
+                    contents=[policy_text(policy_index)],
+                    ttl=datetime.timedelta(seconds=self.ttl)
+                )
+                model = self.model_factory(cached_content)
+            except Exception as e:
+                # z.B. Dokument unter der Mindestgröße für Caching oder Modell ohne Caching-Support
+                logger.warning(f'Gemini Context Cache nicht verfügbar, nutze Inline-Prompts: {e}')
+                self._failed_at = now
+                self.failures += 1
+                self.fallbacks += 1
+                return None
+            self._discard()
+            self._cached_content, self._model = cached_content, model
+            self._content_hash = policy_index.content_hash
+            self._created_at = now
+            self._failed_at = None
+            self.created += 1
+            return model
+
+    def _discard(self) -> None:
+        old, self._cached_content, self._model = self._cached_content, None, None
+        if old is not None:
+            try:
+                old.delete()
+            except Exception as e:
+                logger.info(f'Alter Gemini Context Cache nicht gelöscht (läuft per TTL ab): {e}')
+
+    def close(self) -> None:
+        with self._lock:
+            self._discard()
+            self._content_hash = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'content_hash': self._content_hash,
+                'created': self.created,
+                'hits': self.hits,
+                'fallbacks': self.fallbacks,
+                'failures': self.failures
+            }
+
+
+def policy_text(policy_index) -> str:
+    """Vollständiges Richtlinien-Dokument aus den Abschnitten des Index"""
+    return '\n\n'.join(chunk.text for chunk in policy_index.chunks)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Lokaler Fake der OpenAI Files/Vector-Store-API für Tests und Benchmarks
+Start: python fake_openai_server.py [port]  ->  OpenAI(base_url='http://127.0.0.1:<port>/v1')
+"""
+
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeOpenAIState:
+    """Speichert Files, Vector Stores und File-Batches im Speicher"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.files = {}
+        self.vector_stores = {}
+        self.store_files = {}
+        self.batches = {}
+        self.requests = 0
+        self.connections = set()
+        self._counter = 0
+
+    def next_id(self, prefix: str) -> str:
+        with self.lock:
+            self._counter += 1
+            return f'{prefix}{self._counter:06d}'
+
+
+def _store_file(file_id, vector_store_id, size):
+    return {
+        'id': file_id,
+        'object': 'vector_store.file',
+        'usage_bytes': size,
+        'created_at': int(time.time()),
+        'vector_store_id': vector_store_id,
+        'status': 'completed',
+        'last_error': None
+    }
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    state: FakeOpenAIState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def _begin(self):
+        with self.state.lock:
+            self.state.requests += 1
+            self.state.connections.add(self.client_address)
+        if self.state.latency:
+            time.sleep(self.state.latency)
+
+    def _list(self, items, query):
+        limit = int(query.get('limit', ['20'])[0])
+        after = query.get('after', [None])[0]
+        ids = [item['id'] for item in items]
+        start = ids.index(after) + 1 if after in ids else 0
+        page = items[start:start + limit]
+        return {
+            'object': 'list',
+            'data': page,
+            'first_id': page[0]['id'] if page else None,
+            'last_id': page[-1]['id'] if page else None,
+            'has_more': start + limit < len(items)
+        }
+
+    def do_POST(self):
+        self._begin()
+        path = urlparse(self.path).path
+        raw = self._body()
+        state = self.state
+
+        if path == '/v1/files':
+            match = re.search(rb'filename="([^"]*)"\r\n(?:[^\r\n]*\r\n)*\r\n(.*?)\r\n--', raw, re.S)
+            name = match.group(1).decode() if match else 'upload'
+            size = len(match.group(2)) if match else len(raw)
+            file_id = state.next_id('file-')
+            state.files[file_id] = {
+                'id': file_id, 'object': 'file', 'bytes': size, 'created_at': int(time.time()),
+                'filename': name, 'purpose': 'assistants', 'status': 'processed'
+            }
+            return self._send(state.files[file_id])
+
+        data = json.loads(raw or b'{}')
+        if path == '/v1/vector_stores':
+            store_id = state.next_id('vs_')
+            state.vector_stores[store_id] = {
+                'id': store_id, 'object': 'vector_store', 'name': data.get('name'), 'status': 'completed',
+                'created_at': int(time.time()), 'usage_bytes': 0, 'last_active_at': None, 'metadata': None,
+                'file_counts': {'in_progress': 0, 'completed': 0, 'failed': 0, 'cancelled': 0, 'total': 0}
+            }
+            state.store_files[store_id] = []
+            return self._send(state.vector_stores[store_id])
+
+        match = re.fullmatch(r'/v1/vector_stores/([^/]+)/(files|file_batches)', path)
+        if match:
+            store_id, kind = match.groups()
+            if store_id not in state.vector_stores:
+                return self._send({'error': {'message': f'No vector store {store_id}', 'type': 'invalid_request_error'}}, 404)
+            file_ids = [data['file_id']] if kind == 'files' else data.get('file_ids', [])
+            entries = [_store_file(fid, store_id, state.files.get(fid, {}).get('bytes', 0)) for fid in file_ids]
+            state.store_files[store_id].extend(entries)
+            if kind == 'files':
+                return self._send(entries[0])
+            batch_id = state.next_id('vsfb_')
+            state.batches[batch_id] = {
+                'batch': {
+                    'id': batch_id, 'object': 'vector_store.files_batch', 'created_at': int(time.time()),
+                    'vector_store_id': store_id, 'status': 'completed',
+                    'file_counts': {'in_progress': 0, 'completed': len(entries), 'failed': 0,
+                                    'cancelled': 0, 'total': len(entries)}
+                },
+                'files': entries
+            }
+            return self._send(state.batches[batch_id]['batch'])
+
+        self._send({'error': {'message': f'Unknown path {path}'}}, 404)
+
+    def do_GET(self):
+        self._begin()
+        parsed = urlparse(self.path)
+        path, query = parsed.path, parse_qs(parsed.query)
+        state = self.state
+
+        if path == '/v1/vector_stores':
+            stores = sorted(state.vector_stores.values(), key=lambda s: s['id'], reverse=True)
+            return self._send(self._list(stores, query))
+        match = re.fullmatch(r'/v1/vector_stores/([^/]+)', path)
+        if match and match.group(1) in state.vector_stores:
+            return self._send(state.vector_stores[match.group(1)])
+        match = re.fullmatch(r'/v1/vector_stores/([^/]+)/files/([^/]+)', path)
+        if match:
+            for entry in state.store_files.get(match.group(1), []):
+                if entry['id'] == match.group(2):
+                    return self._send(entry)
+        match = re.fullmatch(r'/v1/vector_stores/([^/]+)/file_batches/([^/]+)(/files)?', path)
+        if match and match.group(2) in state.batches:
+            batch = state.batches[match.group(2)]
+            return self._send(self._list(batch['files'], query) if match.group(3) else batch['batch'])
+
+        self._send({'error': {'message': f'Unknown path {path}'}}, 404)
+
+
+def start_fake_openai(port: int = 0, latency: float = 0.0):
+    """Startet den Fake-Server im Hintergrund, gibt (server, state, base_url) zurück"""
+    state = FakeOpenAIState(latency)
+    handler = type('Handler', (FakeOpenAIHandler,), {'state': state})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f'http://127.0.0.1:{server.server_address[1]}/v1'
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    server, state, base_url = start_fake_openai(port)
+    print(f"🧪 Fake OpenAI API läuft auf {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,62 @@
+"""
+Fast JSON
+orjson wenn installiert, sonst Standardbibliothek - kompakt, UTF-8 statt \\u-Escapes
+Gemeinsam genutzt von MCP Server, HTTP-Transport und Flask JSON Provider
+"""
+
+import json
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - Fallback ohne orjson
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+# orjson.JSONDecodeError erbt von json.JSONDecodeError, ein except reicht für beide Backends
+JSONDecodeError = json.JSONDecodeError
+
+
+def _stdlib_dumps(obj: Any, indent: bool = False, default: Optional[Callable] = None, sort_keys: bool = False) -> str:
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2, default=default, sort_keys=sort_keys)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default, sort_keys=sort_keys)
+
+
+if orjson is not None:
+    def dumps_bytes(obj: Any, indent: bool = False, default: Optional[Callable] = None,
+                    sort_keys: bool = False) -> bytes:
+        """Serialisiert obj als UTF-8 Bytes"""
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if default is not None:
+            # Datumswerte wie bei der Standardbibliothek dem Aufrufer überlassen (Flask: HTTP-Datum)
+            option |= orjson.OPT_PASSTHROUGH_DATETIME
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # z.B. Integer > 64 Bit: die Standardbibliothek kann das
+            return _stdlib_dumps(obj, indent, default, sort_keys).encode('utf-8')
+
+    def dumps(obj: Any, indent: bool = False, default: Optional[Callable] = None, sort_keys: bool = False) -> str:
+        """Serialisiert obj als str"""
+        return dumps_bytes(obj, indent, default, sort_keys).decode('utf-8')
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        return orjson.loads(data)
+else:  # pragma: no cover - Fallback ohne orjson
+    def dumps_bytes(obj: Any, indent: bool = False, default: Optional[Callable] = None,
+                    sort_keys: bool = False) -> bytes:
+        """Serialisiert obj als UTF-8 Bytes"""
+        return _stdlib_dumps(obj, indent, default, sort_keys).encode('utf-8')
+
+    def dumps(obj: Any, indent: bool = False, default: Optional[Callable] = None, sort_keys: bool = False) -> str:
+        """Serialisiert obj als str"""
+        return _stdlib_dumps(obj, indent, default, sort_keys)
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        return json.loads(bytes(data) if isinstance(data, memoryview) else data)
@@ -0,0 +1,27 @@
+"""
+Gunicorn Konfiguration
+Standard: gthread-Worker, damit ein Prozess viele gleichzeitige OpenAI/Gemini-Aufrufe bedienen kann.
+Die Anzahl paralleler Upstream-Aufrufe begrenzen GEMINI_MAX_CONCURRENCY / OPENAI_MAX_CONCURRENCY in app.py.
+Rate-Limits (GEMINI_RPM / OPENAI_RPM / CLIENT_RATE_LIMIT) teilen sich alle Worker über RATE_LIMIT_PATH.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+
+# gthread (Standard) oder gevent (erfordert `pip install gevent`)
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# KI-Antworten und SSE-Streams dauern länger als der 30s-Standard
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+keepalive = 5
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        # gRPC (google-generativeai) muss mit dem gevent-Hub kooperieren
+        import grpc.experimental.gevent as grpc_gevent
+        grpc_gevent.init_gevent()
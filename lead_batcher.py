@@ -0,0 +1,156 @@
+"""
+Lead Batcher
+Bündelt gleichzeitig eintreffende Lead-Analysen zu einem einzigen Gemini-Aufruf
+"""
+
+import json
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from prompt_templates import PromptLibrary, get_prompt_library, truncate_text
+
+logger = logging.getLogger(__name__)
+
+
+def single_lead_prompt(lead: Dict, prompts: Optional[PromptLibrary] = None) -> str:
+    prompts = prompts or get_prompt_library()
+    return prompts.render(
+        'lead',
+        name=lead.get('name'),
+        email=lead.get('email'),
+        message=lead.get('message'),
+        budget=lead.get('budget')
+    ).text
+
+
+def batch_lead_prompt(leads: List[Dict], prompts: Optional[PromptLibrary] = None) -> str:
+    prompts = prompts or get_prompt_library()
+    limits = prompts.templates['lead'].limits
+    # Gleiche Budgets pro Feld wie beim Einzel-Prompt, damit ein langer Lead den Batch nicht sprengt
+    entries = [
+        {
+            'index': i,
+            'name': truncate_text(str(lead.get('name')), limits.get('name', 50)),
+            'email': truncate_text(str(lead.get('email')), limits.get('email', 50)),
+            'nachricht': truncate_text(str(lead.get('message')), limits.get('message', 1500)),
+            'budget': truncate_text(str(lead.get('budget')), limits.get('budget', 50))
+        }
+        for i, lead in enumerate(leads)
+    ]
+    return prompts.render('lead_batch', count=len(leads), leads=json.dumps(entries, ensure_ascii=False, indent=2)).text
+
+
+def parse_batch_response(text: str, expected: int) -> Optional[List[str]]:
+    """Liest die Analysen aus der Modellantwort, None wenn unvollständig"""
+    try:
+        cleaned = text.strip().replace('```json', '').replace('```', '')
+        items = json.loads(cleaned)
+    except (json.JSONDecodeError, AttributeError):
+        return None
+    if not isinstance(items, list):
+        return None
+    analyses: Dict[int, str] = {}
+    for item in items:
+        if isinstance(item, dict) and isinstance(item.get('index'), int) and isinstance(item.get('analysis'), str):
+            analyses[item['index']] = item['analysis']
+    if sorted(analyses) != list(range(expected)):
+        return None
+    return [analyses[i] for i in range(expected)]
+
+
+class _PendingLead:
+    def __init__(self, lead: Dict):
+        self.lead = lead
+        self.done = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[Exception] = None
+
+
+class LeadBatcher:
+    """Sammelt Leads für window Sekunden (max. max_batch) und analysiert sie gemeinsam"""
+
+    def __init__(self, generate: Callable[[str], str], window: float = 0.05, max_batch: int = 8,
+                 prompts: Optional[PromptLibrary] = None):
+        self.generate = generate
+        self.prompts = prompts
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[_PendingLead] = []
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.model_calls = 0
+        self.batches = 0
+        self.fallbacks = 0
+
+    def analyze(self, lead: Dict) -> str:
+        """Blockiert bis die Analyse für diesen Lead vorliegt"""
+        pending = _PendingLead(lead)
+        batch = None
+        with self._lock:
+            self._pending.append(pending)
+            if len(self._pending) >= self.max_batch:
+                batch = self._take()
+            elif len(self._pending) == 1:
+                timer = threading.Timer(self.window, self._flush, args=(self._generation,))
+                timer.daemon = True
+                timer.start()
+        if batch:
+            self._run(batch)
+
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        if pending.result is None:
+            # Batch-Antwort nicht parsebar: dieser Lead wird einzeln analysiert
+            self._count_call(fallback=True)
+            return self.generate(single_lead_prompt(lead, self.prompts))
+        return pending.result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'model_calls': self.model_calls,
+                'batches': self.batches,
+                'fallbacks': self.fallbacks
+            }
+
+    def _take(self) -> List[_PendingLead]:
+        batch, self._pending = self._pending, []
+        self._generation += 1
+        return batch
+
+    def _flush(self, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation or not self._pending:
+                return
+            batch = self._take()
+        self._run(batch)
+
+    def _count_call(self, fallback: bool = False) -> None:
+        with self._lock:
+            self.model_calls += 1
+            if fallback:
+                self.fallbacks += 1
+
+    def _run(self, batch: List[_PendingLead]) -> None:
+        with self._lock:
+            self.batches += 1
+        try:
+            self._count_call()
+            if len(batch) == 1:
+                batch[0].result = self.generate(single_lead_prompt(batch[0].lead, self.prompts))
+            else:
+                text = self.generate(batch_lead_prompt([pending.lead for pending in batch], self.prompts))
+                analyses = parse_batch_response(text, len(batch))
+                if analyses is None:
+                    logger.warning(f'Batch-Antwort für {len(batch)} Leads nicht parsebar, Fallback auf Einzelaufrufe')
+                else:
+                    for pending, analysis in zip(batch, analyses):
+                        pending.result = analysis
+        except Exception as e:
+            for pending in batch:
+                pending.error = e
+        finally:
+            for pending in batch:
+                pending.done.set()
@@ -0,0 +1,254 @@
+"""
+Lead Queue
+Dauerhafte SQLite-Warteschlange für Lead-Verarbeitung mit Hintergrund-Workern
+Optional idempotent: gleiche Idempotency-Keys teilen sich einen Job (laufend oder bis zur TTL abgeschlossen)
+Laufende Jobs tragen einen Lease (Besitzer + Ablaufzeit, per Heartbeat verlängert); andere Prozesse übernehmen
+nur Jobs, deren Lease abgelaufen ist, z.B. nach einem Absturz
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lead_jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lead_jobs_status ON lead_jobs (status, created_at);
+"""
+
+# Eigener Schritt, damit bestehende Datenbanken die Spalte per ALTER TABLE nachgerüstet bekommen
+IDEMPOTENCY_SCHEMA = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_lead_jobs_idempotency ON lead_jobs (idempotency_key)
+    WHERE idempotency_key IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_lead_jobs_idempotency_expiry ON lead_jobs (updated_at)
+    WHERE idempotency_key IS NOT NULL;
+"""
+
+
+class LeadQueue:
+    """SQLite-basierte Job-Queue, abgearbeitet von einem Thread-Pool"""
+
+    def __init__(self, path: str, handlers: Dict[str, Callable[[Dict], Dict]],
+                 workers: int = 4, max_attempts: int = 3, poll_interval: float = 0.5, lease_seconds: float = 60):
+        self.path = path
+        self.handlers = handlers
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(lead_jobs)')}
+        for column, definition in (('idempotency_key', 'TEXT'), ('lease_owner', 'TEXT'), ('lease_until', 'REAL')):
+            if column not in columns:
+                conn.execute(f'ALTER TABLE lead_jobs ADD COLUMN {column} {definition}')
+        conn.executescript(IDEMPOTENCY_SCHEMA)
+        self._purged_at = 0.0
+        # Liegengebliebene Jobs (abgelaufener Lease) holen sich die Worker selbst, auch ohne neuen Webhook
+        self.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def start(self) -> None:
+        """Startet die Worker-Threads und den Lease-Heartbeat (idempotent)"""
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'lead-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._heartbeat, name='lead-heartbeat', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> str:
+        """Persistiert einen Job und gibt sofort die Job-ID zurück"""
+        if kind not in self.handlers:
+            raise ValueError(f'Unbekannter Job-Typ: {kind}')
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connection().execute(
+            'INSERT INTO lead_jobs (id, kind, payload, status, created_at, updated_at) '
+            "VALUES (?, ?, ?, 'queued', ?, ?)",
+            (job_id, kind, json.dumps(payload), now, now)
+        )
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def enqueue_once(self, kind: str, payload: Dict[str, Any], idempotency_key: str,
+                     ttl: float = 86400) -> Tuple[str, bool]:
+        """Wie enqueue, aber ein laufender oder vor weniger als ttl Sekunden erledigter Job mit gleichem
+        idempotency_key wird wiederverwendet; liefert (job_id, duplicate)"""
+        if kind not in self.handlers:
+            raise ValueError(f'Unbekannter Job-Typ: {kind}')
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if now - self._purged_at > min(ttl, 60):
+                # Abgelaufene Keys freigeben, damit die Key-Tabelle begrenzt bleibt
+                conn.execute(
+                    'UPDATE lead_jobs SET idempotency_key = NULL '
+                    "WHERE idempotency_key IS NOT NULL AND updated_at < ? AND status IN ('done', 'failed')",
+                    (now - ttl,)
+                )
+                self._purged_at = now
+            row = conn.execute(
+                'SELECT id, status, updated_at FROM lead_jobs WHERE idempotency_key = ?', (idempotency_key,)
+            ).fetchone()
+            if row is not None and (row[1] in ('queued', 'processing') or (row[1] == 'done' and now - row[2] < ttl)):
+                conn.execute('COMMIT')
+                return row[0], True
+            if row is not None:
+                # Fehlgeschlagen oder abgelaufen: Key an den neuen Job weitergeben
+                conn.execute('UPDATE lead_jobs SET idempotency_key = NULL WHERE id = ?', (row[0],))
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                'INSERT INTO lead_jobs (id, kind, payload, status, created_at, updated_at, idempotency_key) '
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), now, now, idempotency_key)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id, False
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            'SELECT id, kind, status, result, error, attempts, created_at, updated_at '
+            'FROM lead_jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'job_id': row[0],
+            'kind': row[1],
+            'status': row[2],
+            'result': json.loads(row[3]) if row[3] else None,
+            'error': row[4],
+            'attempts': row[5],
+            'created_at': row[6],
+            'updated_at': row[7]
+        }
+
+    def depth(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM lead_jobs WHERE status IN ('queued', 'processing')"
+        ).fetchone()[0]
+
+    def _claim(self) -> Optional[tuple]:
+        """Holt den ältesten wartenden Job oder einen mit abgelaufenem Lease atomar (auch über Prozessgrenzen)"""
+        now = time.time()
+        # Datenbanken von vor den Leases: updated_at + lease_seconds als Ablaufzeit
+        expired = "status = 'processing' AND COALESCE(lease_until, updated_at + ?) < ?"
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                "UPDATE lead_jobs SET status = 'failed', error = 'Lease abgelaufen', lease_owner = NULL, "
+                f'lease_until = NULL, updated_at = ? WHERE {expired} AND attempts >= ?',
+                (now, self.lease_seconds, now, self.max_attempts)
+            )
+            row = conn.execute(
+                f"SELECT id, kind, payload FROM lead_jobs WHERE status = 'queued' OR ({expired}) "
+                'ORDER BY created_at LIMIT 1', (self.lease_seconds, now)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE lead_jobs SET status = 'processing', attempts = attempts + 1, updated_at = ?, "
+                    'lease_owner = ?, lease_until = ? WHERE id = ?', (now, self.owner, now + self.lease_seconds, row[0])
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return row
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        """Nur mit eigenem Lease; hat ein anderer Prozess den Job übernommen, gilt dessen Ergebnis"""
+        cursor = self._connection().execute(
+            'UPDATE lead_jobs SET status = ?, result = ?, error = ?, updated_at = ?, lease_owner = NULL, '
+            'lease_until = NULL WHERE id = ? AND lease_owner = ?',
+            (status, json.dumps(result) if result is not None else None, error, time.time(), job_id, self.owner)
+        )
+        if cursor.rowcount == 0:
+            logger.warning(f'Lead job {job_id}: Lease verloren, Ergebnis verworfen')
+
+    def _heartbeat(self) -> None:
+        """Verlängert die Leases der eigenen laufenden Jobs, solange dieser Prozess lebt"""
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                self._connection().execute(
+                    "UPDATE lead_jobs SET lease_until = ? WHERE lease_owner = ? AND status = 'processing'",
+                    (time.time() + self.lease_seconds, self.owner)
+                )
+            except sqlite3.Error as e:
+                logger.error(f'Lead queue heartbeat error: {e}')
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                logger.error(f'Lead queue claim error: {e}')
+                job = None
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+
+            job_id, kind, payload = job
+            try:
+                result = self.handlers[kind](json.loads(payload))
+                self._finish(job_id, 'done', result=result)
+            except Exception as e:
+                logger.error(f'Lead job {job_id} failed: {e}')
+                attempts = self._connection().execute(
+                    'SELECT attempts FROM lead_jobs WHERE id = ?', (job_id,)
+                ).fetchone()[0]
+                self._finish(job_id, 'queued' if attempts < self.max_attempts else 'failed', error=str(e))
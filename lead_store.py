@@ -0,0 +1,206 @@
+"""
+Lead Store
+Verarbeitete Leads dauerhaft in SQLite (WAL) mit Indizes auf email, source, status und timestamp.
+Schreiben per Write-Behind: add() puffert nur, ein Hintergrund-Thread schreibt gesammelt in einer Transaktion.
+"""
+
+import atexit
+import base64
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leads (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    email TEXT,
+    source TEXT,
+    budget TEXT,
+    message TEXT,
+    ai_analysis TEXT,
+    status TEXT,
+    workflow_id TEXT,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_leads_email ON leads (email, timestamp);
+CREATE INDEX IF NOT EXISTS idx_leads_source ON leads (source, timestamp);
+CREATE INDEX IF NOT EXISTS idx_leads_status ON leads (status, timestamp);
+CREATE INDEX IF NOT EXISTS idx_leads_timestamp ON leads (timestamp);
+"""
+
+COLUMNS = ('name', 'email', 'source', 'budget', 'message', 'ai_analysis', 'status', 'workflow_id', 'timestamp')
+FILTERS = ('email', 'source', 'status')
+GROUPS = ('source', 'status', 'workflow_id')
+
+INSERT = f"INSERT INTO leads ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})"
+
+
+def _text(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def encode_cursor(timestamp: float, lead_id: int) -> str:
+    return base64.urlsafe_b64encode(f'{timestamp!r}:{lead_id}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, lead_id = raw.split(':')
+        return float(timestamp), int(lead_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f'Ungültiger Cursor: {cursor}') from None
+
+
+class LeadStore:
+    """Lead-Tabelle mit gepuffertem Schreiben; Abfragen sehen alle vorher hinzugefügten Leads"""
+
+    def __init__(self, path: str, flush_interval: float = 0.2, batch_size: int = 500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._pending: List[tuple] = []
+        self._wakeup = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.written = 0
+        self.batches = 0
+
+        self._connection().executescript(SCHEMA)
+        # Gepufferte Leads beim regulären Beenden nicht verlieren
+        atexit.register(self.flush)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='lead-store-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def add(self, lead: Dict[str, Any]) -> None:
+        """Puffert einen Lead; wartet weder auf SQLite noch auf fsync"""
+        row = tuple(_text(lead.get(column)) for column in COLUMNS[:-1])
+        row += (float(lead.get('timestamp') or time.time()),)
+        with self._wakeup:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.notify()
+        self._start()
+
+    def pending(self) -> int:
+        with self._wakeup:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Schreibt alle gepufferten Leads in einer Transaktion"""
+        with self._flush_lock:
+            with self._wakeup:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            conn = self._connection()
+            try:
+                conn.execute('BEGIN')
+                conn.executemany(INSERT, rows)
+                conn.execute('COMMIT')
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                # Beim nächsten Flush erneut versuchen
+                with self._wakeup:
+                    self._pending[:0] = rows
+                raise
+            self.written += len(rows)
+            self.batches += 1
+            return len(rows)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            with self._wakeup:
+                if len(self._pending) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error(f'Lead store flush error: {e}')
+
+    def _where(self, filters: Dict[str, Any], since: Optional[float], until: Optional[float]) -> Tuple[List[str], List]:
+        clauses, params = [], []
+        for column in FILTERS:
+            if filters.get(column) is not None:
+                clauses.append(f'{column} = ?')
+                params.append(filters[column])
+        if since is not None:
+            clauses.append('timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('timestamp < ?')
+            params.append(until)
+        return clauses, params
+
+    def query(self, limit: int = 50, cursor: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, **filters) -> Dict[str, Any]:
+        """Neueste Leads zuerst, Cursor-Paginierung über (timestamp, id)"""
+        unknown = set(filters) - set(FILTERS)
+        if unknown:
+            raise ValueError(f'Unbekannte Filter: {sorted(unknown)}')
+        self.flush()
+        clauses, params = self._where(filters, since, until)
+        if cursor:
+            clauses.append('(timestamp, id) < (?, ?)')
+            params.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._connection().execute(
+            f"SELECT id, {', '.join(COLUMNS)} FROM leads {where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+        leads = [dict(zip(('id',) + COLUMNS, row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = leads[-1]
+            next_cursor = encode_cursor(last['timestamp'], last['id'])
+        return {'leads': leads, 'next_cursor': next_cursor}
+
+    def aggregate(self, group_by: str, since: Optional[float] = None, until: Optional[float] = None,
+                  **filters) -> Dict[str, int]:
+        """Anzahl Leads pro source/status/workflow_id"""
+        if group_by not in GROUPS:
+            raise ValueError(f'Gruppierung nicht erlaubt: {group_by}')
+        self.flush()
+        clauses, params = self._where(filters, since, until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._connection().execute(
+            f'SELECT {group_by}, COUNT(*) FROM leads {where} GROUP BY {group_by} ORDER BY COUNT(*) DESC', params
+        ).fetchall()
+        return {str(key): count for key, count in rows}
+
+    def stats(self) -> Dict[str, int]:
+        return {'pending': self.pending(), 'written': self.written, 'batches': self.batches}
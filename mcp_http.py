@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+MCP HTTP Transport (Streamable HTTP)
+POST /mcp für Requests, GET /mcp als SSE-Stream für Server-Nachrichten, DELETE /mcp beendet die Session
+Viele Client-Sessions in einem asyncio-Prozess, nur Standardbibliothek
+Start: python mcp_http.py [port]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import fast_json
+from mcp_server import (MCP_MAX_LINE_BYTES, MCP_RESOURCE_POLL_INTERVAL, MCPServer, Session,
+                        watch_resources)
+
+MCP_HTTP_HOST = os.getenv("MCP_HTTP_HOST", "127.0.0.1")
+MCP_HTTP_PORT = int(os.getenv("MCP_HTTP_PORT", 8811))
+MCP_SESSION_TTL = float(os.getenv("MCP_SESSION_TTL", 3600))
+MCP_SSE_PING_INTERVAL = float(os.getenv("MCP_SSE_PING_INTERVAL", 15))
+# Zusätzlich erlaubte Origins (kommagetrennt); localhost ist immer erlaubt
+MCP_HTTP_ALLOWED_ORIGINS = [o.strip() for o in os.getenv("MCP_HTTP_ALLOWED_ORIGINS", "").split(",") if o.strip()]
+
+SESSION_HEADER = "mcp-session-id"
+OUTBOX_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed", 411: "Length Required", 413: "Payload Too Large"}
+
+
+class HttpRequest:
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+
+def encode_response(status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None,
+                    keep_alive: bool = True) -> bytes:
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    lines.append(f"Content-Length: {len(body)}")
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[HttpRequest]:
+    """Liest einen HTTP/1.1 Request; None bei geschlossener Verbindung"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HttpError(411, "Chunked request bodies are not supported")
+    length = int(headers.get("content-length", 0))
+    if length > MCP_MAX_LINE_BYTES:
+        raise HttpError(413, "Request too large")
+    body = await reader.readexactly(length) if length else b""
+    return HttpRequest(method.upper(), urlparse(target).path, headers, body)
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class MCPHttpTransport:
+    """Bildet HTTP-Sessions (Mcp-Session-Id) auf MCPServer-Sessions ab"""
+
+    def __init__(self, server: MCPServer, path: str = "/mcp", session_ttl: float = MCP_SESSION_TTL,
+                 ping_interval: float = MCP_SSE_PING_INTERVAL):
+        self.server = server
+        self.path = path
+        self.session_ttl = session_ttl
+        self.ping_interval = ping_interval
+        self.outboxes: Dict[str, asyncio.Queue] = {}
+        self.streams: Dict[str, int] = {}
+        self.http_server: Optional[asyncio.AbstractServer] = None
+        self._background = []
+
+    async def start(self, host: str = MCP_HTTP_HOST, port: int = MCP_HTTP_PORT,
+                    poll_interval: float = MCP_RESOURCE_POLL_INTERVAL) -> asyncio.AbstractServer:
+        """Startet den HTTP-Server plus Session-Aufräumer und Resource-Watcher"""
+        self.http_server = await asyncio.start_server(self.handle_connection, host, port, limit=MCP_MAX_LINE_BYTES)
+        self.server.resources.refresh()
+        self._background = [asyncio.create_task(self._sweep_sessions())]
+        if poll_interval > 0:
+            self._background.append(asyncio.create_task(watch_resources(self.server, poll_interval)))
+        return self.http_server
+
+    def close(self):
+        for task in self._background:
+            task.cancel()
+        if self.http_server is not None:
+            self.http_server.close()
+
+    async def _sweep_sessions(self, interval: float = 60):
+        while True:
+            await asyncio.sleep(min(interval, self.session_ttl))
+            expired = self.expire_sessions()
+            if expired:
+                logger.info(f"Expired {expired} idle MCP sessions")
+
+    # Sessions
+
+    def _open_session(self) -> Session:
+        outbox: asyncio.Queue = asyncio.Queue(OUTBOX_SIZE)
+
+        def send(message: str):
+            # Langsamer/abwesender SSE-Client: älteste Nachricht verwerfen statt Speicher zu füllen
+            if outbox.full():
+                outbox.get_nowait()
+            outbox.put_nowait(message)
+
+        session = self.server.open_session(send)
+        self.outboxes[session.id] = outbox
+        return session
+
+    def _close_session(self, session: Session):
+        self.server.close_session(session)
+        outbox = self.outboxes.pop(session.id, None)
+        if outbox is not None:
+            # Offene SSE-Streams beenden
+            for _ in range(self.streams.get(session.id, 0)):
+                if outbox.full():
+                    outbox.get_nowait()
+                outbox.put_nowait(None)
+
+    def expire_sessions(self) -> int:
+        """Schließt Sessions ohne Aktivität und ohne offenen Stream"""
+        now = time.monotonic()
+        expired = [
+            session for session_id, session in list(self.server.sessions.items())
+            if session_id in self.outboxes and not self.streams.get(session_id)
+            and now - session.last_seen > self.session_ttl
+        ]
+        for session in expired:
+            self._close_session(session)
+        return len(expired)
+
+    def _session_for(self, request: HttpRequest) -> Session:
+        session_id = request.headers.get(SESSION_HEADER)
+        if not session_id:
+            raise HttpError(400, "Missing Mcp-Session-Id header")
+        session = self.server.sessions.get(session_id)
+        if session is None or session_id not in self.outboxes:
+            raise HttpError(404, "Unknown session")
+        return session
+
+    def _check_origin(self, request: HttpRequest):
+        # Schutz gegen DNS-Rebinding: Browser-Requests nur von localhost oder freigegebenen Origins
+        origin = request.headers.get("origin")
+        if origin and urlparse(origin).hostname not in ("localhost", "127.0.0.1", "::1") \
+                and origin not in MCP_HTTP_ALLOWED_ORIGINS:
+            raise HttpError(403, "Origin not allowed")
+
+    # HTTP
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    writer.write(self._error(e.status, str(e), keep_alive=False))
+                    break
+                if request is None:
+                    break
+                try:
+                    self._check_origin(request)
+                    if request.path != self.path:
+                        raise HttpError(404, "Not found")
+                    if request.method == "POST":
+                        writer.write(await self._post(request))
+                    elif request.method == "GET":
+                        # SSE belegt die Verbindung bis zum Ende des Streams
+                        await self._stream(request, writer)
+                        break
+                    elif request.method == "DELETE":
+                        self._close_session(self._session_for(request))
+                        writer.write(encode_response(200, keep_alive=request.keep_alive))
+                    else:
+                        raise HttpError(405, "Method not allowed")
+                except HttpError as e:
+                    writer.write(self._error(e.status, str(e), keep_alive=request.keep_alive))
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _error(self, status: int, message: str, keep_alive: bool = True) -> bytes:
+        body = fast_json.dumps_bytes({"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": message}})
+        return encode_response(status, body, {"Content-Type": "application/json"}, keep_alive)
+
+    async def _post(self, request: HttpRequest) -> bytes:
+        try:
+            message = fast_json.loads(request.body)
+        except (fast_json.JSONDecodeError, UnicodeDecodeError):
+            body = self.server._create_error_response(None, -32700, "Parse error").encode()
+            return encode_response(400, body, {"Content-Type": "application/json"}, request.keep_alive)
+
+        messages = message if isinstance(message, list) else [message]
+        initializing = any(isinstance(m, dict) and m.get("method") == "initialize" for m in messages)
+        headers = {"Content-Type": "application/json"}
+        if initializing and SESSION_HEADER not in request.headers:
+            session = self._open_session()
+            headers["Mcp-Session-Id"] = session.id
+        else:
+            session = self._session_for(request)
+
+        response = await self.server.dispatch(message, session)
+        if response is None:
+            # Nur Notifications/Responses vom Client
+            return encode_response(202, headers=headers, keep_alive=request.keep_alive)
+        return encode_response(200, response.encode("utf-8"), headers, request.keep_alive)
+
+    async def _stream(self, request: HttpRequest, writer: asyncio.StreamWriter):
+        if "text/event-stream" not in request.headers.get("accept", ""):
+            raise HttpError(405, "GET requires Accept: text/event-stream")
+        session = self._session_for(request)
+        outbox = self.outboxes[session.id]
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                     b"Connection: close\r\n\r\n")
+        await writer.drain()
+        self.streams[session.id] = self.streams.get(session.id, 0) + 1
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(outbox.get(), self.ping_interval)
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")
+                else:
+                    if message is None:
+                        break
+                    writer.write(f"event: message\ndata: {message}\n\n".encode("utf-8"))
+                await writer.drain()
+                session.last_seen = time.monotonic()
+        finally:
+            self.streams[session.id] -= 1
+            if not self.streams[session.id]:
+                del self.streams[session.id]
+
+
+async def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else MCP_HTTP_PORT
+    server = MCPServer()
+    transport = MCPHttpTransport(server)
+    http_server = await transport.start(port=port)
+    logger.info(f"MCP HTTP Transport läuft auf http://{MCP_HTTP_HOST}:{port}/mcp")
+    try:
+        await http_server.serve_forever()
+    finally:
+        transport.close()
+        await server.aclose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
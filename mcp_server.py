@@ -5,12 +5,38 @@ Ein funktionierender MCP Server für OpenAI Integration
 """
 
 import asyncio
-import json
 import logging
-from typing import Any, Dict, List, Optional
-from dataclasses import dataclass
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set
+from dataclasses import dataclass, field
 import sys
 import os
+import time
+
+from openai import AsyncOpenAI
+
+import fast_json
+from bulk_upload import collect_files
+from resource_provider import ResourceProvider
+from schema import SchemaError, compile_schema
+
+# OpenAI Client: Timeouts und Retries (exponentielles Backoff, respektiert Retry-After)
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 60))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 3))
+UPLOAD_BATCH_CONCURRENCY = int(os.getenv("UPLOAD_BATCH_CONCURRENCY", 8))
+
+# Stdio-Loop: parallel laufende Requests, max. Zeilenlänge (Uploads kommen inline als JSON)
+MCP_MAX_CONCURRENCY = int(os.getenv("MCP_MAX_CONCURRENCY", 16))
+MCP_MAX_LINE_BYTES = int(os.getenv("MCP_MAX_LINE_BYTES", 64 * 1024 * 1024))
+# Tool-Ergebnisse eingerückt ausgeben (lesbarer, aber größer und langsamer)
+MCP_PRETTY_TOOL_RESULTS = os.getenv("MCP_PRETTY_TOOL_RESULTS", "false").lower() == "true"
+
+# Resources: Verzeichnis + Dateimuster, ab welcher Größe mmap, Prüfintervall für Änderungen (0 = aus)
+MCP_RESOURCE_DIR = os.getenv("MCP_RESOURCE_DIR", ".")
+MCP_RESOURCE_PATTERNS = os.getenv("MCP_RESOURCE_PATTERNS", "customer_policies.txt").split(",")
+MCP_RESOURCE_MMAP_BYTES = int(os.getenv("MCP_RESOURCE_MMAP_BYTES", 1024 * 1024))
+MCP_RESOURCE_MAX_MAPPED = int(os.getenv("MCP_RESOURCE_MAX_MAPPED", 16))
+MCP_RESOURCE_POLL_INTERVAL = float(os.getenv("MCP_RESOURCE_POLL_INTERVAL", 2))
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -32,45 +58,130 @@ class MCPResponse:
     result: Optional[Dict[str, Any]] = None
     error: Optional[Dict[str, Any]] = None
 
+@dataclass
+class Session:
+    """Per-client state: one for stdio, one per Mcp-Session-Id over HTTP"""
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    initialized: bool = False
+    subscriptions: Set[str] = field(default_factory=set)
+    send: Optional[Callable[[str], None]] = None
+    last_seen: float = field(default_factory=time.monotonic)
+
+@dataclass
+class Tool:
+    """Registered tool: schema is compiled once at registration"""
+    name: str
+    description: str
+    input_schema: Dict[str, Any]
+    handler: str
+    validate: Callable[[Any], None]
+
+# Registry: JSON-RPC Methode / Tool-Name -> Name der Handler-Methode (Overrides in Subklassen greifen)
+METHODS: Dict[str, str] = {}
+TOOLS: Dict[str, Tool] = {}
+
+def rpc_method(name: str):
+    """Register a JSON-RPC method handler"""
+    def register(fn):
+        METHODS[name] = fn.__name__
+        return fn
+    return register
+
+def tool(name: str, description: str, input_schema: Dict[str, Any]):
+    """Register an MCP tool with its input schema"""
+    def register(fn):
+        TOOLS[name] = Tool(name, description, input_schema, fn.__name__, compile_schema(input_schema))
+        return fn
+    return register
+
 class MCPServer:
     """MCP Server Implementation"""
     
-    def __init__(self):
-        self.tools = {}
-        self.resources = {}
-        self.initialized = False
+    def __init__(self, openai_client: Optional[AsyncOpenAI] = None,
+                 resources: Optional[ResourceProvider] = None):
+        self.resources = resources or ResourceProvider(
+            MCP_RESOURCE_DIR,
+            [pattern.strip() for pattern in MCP_RESOURCE_PATTERNS if pattern.strip()],
+            mmap_threshold=MCP_RESOURCE_MMAP_BYTES,
+            max_mapped=MCP_RESOURCE_MAX_MAPPED
+        )
+        # Default-Session für stdio bzw. direkte handle_request-Aufrufe
+        self.session = Session("stdio")
+        self.sessions: Dict[str, Session] = {self.session.id: self.session}
+        self._openai = openai_client
+    
+    @property
+    def openai(self) -> AsyncOpenAI:
+        """Shared, lazily constructed client - one connection pool for the whole session"""
+        if self._openai is None:
+            self._openai = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                timeout=OPENAI_TIMEOUT,
+                max_retries=OPENAI_MAX_RETRIES
+            )
+        return self._openai
+    
+    async def aclose(self):
+        """Close pooled HTTP connections"""
+        if self._openai is not None:
+            await self._openai.close()
+            self._openai = None
         
-    async def handle_request(self, request_data: str) -> str:
-        """Handle incoming MCP request"""
+    async def handle_request(self, request_data: str, session: Optional[Session] = None) -> Optional[str]:
+        """Handle incoming MCP request (single object or JSON-RPC batch)"""
+        try:
+            request = fast_json.loads(request_data)
+        except fast_json.JSONDecodeError:
+            return self._create_error_response(None, -32700, "Parse error")
+        return await self.dispatch(request, session)
+    
+    async def dispatch(self, request: Any, session: Optional[Session] = None) -> Optional[str]:
+        """Dispatch an already parsed request; notifications (no id) produce no output"""
+        session = session or self.session
+        session.last_seen = time.monotonic()
+        if isinstance(request, list):
+            return await self._dispatch_batch(request, session)
+        if not isinstance(request, dict):
+            return await self._invalid_request()
+        response = await self._dispatch_single(request, session)
+        return response if "id" in request else None
+    
+    async def _dispatch_batch(self, requests: List, session: Session) -> Optional[str]:
+        """Execute batch entries concurrently, answer with one array"""
+        if not requests:
+            return await self._invalid_request()
+        responses = await asyncio.gather(*(
+            self.dispatch(request, session) if isinstance(request, dict) else self._invalid_request()
+            for request in requests
+        ))
+        responses = [response for response in responses if response is not None]
+        # Nur Notifications im Batch: keine Antwort
+        return "[" + ",".join(responses) + "]" if responses else None
+    
+    async def _invalid_request(self) -> str:
+        return self._create_error_response(None, -32600, "Invalid Request")
+    
+    async def _dispatch_single(self, request: Dict, session: Session) -> str:
+        """Route a single request to its handler"""
         try:
-            request = json.loads(request_data)
             method = request.get("method")
             request_id = request.get("id")
             
             logger.info(f"Handling request: {method}")
             
-            if method == "initialize":
-                return await self._handle_initialize(request, request_id)
-            elif method == "tools/list":
-                return await self._handle_tools_list(request, request_id)
-            elif method == "tools/call":
-                return await self._handle_tools_call(request, request_id)
-            elif method == "resources/list":
-                return await self._handle_resources_list(request, request_id)
-            elif method == "resources/read":
-                return await self._handle_resources_read(request, request_id)
-            else:
+            handler = METHODS.get(method)
+            if handler is None:
                 return self._create_error_response(request_id, -32601, f"Method not found: {method}")
+            return await getattr(self, handler)(request, request_id, session)
                 
-        except json.JSONDecodeError:
-            return self._create_error_response(None, -32700, "Parse error")
         except Exception as e:
             logger.error(f"Error handling request: {e}")
-            return self._create_error_response(request.get("id") if 'request' in locals() else None, -32603, str(e))
+            return self._create_error_response(request.get("id"), -32603, str(e))
     
-    async def _handle_initialize(self, request: Dict, request_id: str) -> str:
+    @rpc_method("initialize")
+    async def _handle_initialize(self, request: Dict, request_id: str, session: Session) -> str:
         """Handle initialize request"""
-        self.initialized = True
+        session.initialized = True
         
         response = {
             "jsonrpc": "2.0",
@@ -79,7 +190,10 @@ class MCPServer:
                 "protocolVersion": "2024-11-05",
                 "capabilities": {
                     "tools": {},
-                    "resources": {}
+                    "resources": {
+                        "subscribe": True,
+                        "listChanged": True
+                    }
                 },
                 "serverInfo": {
                     "name": "light-autom8-mcp-server",
@@ -88,82 +202,30 @@ class MCPServer:
             }
         }
         
-        return json.dumps(response)
+        return fast_json.dumps(response)
     
-    async def _handle_tools_list(self, request: Dict, request_id: str) -> str:
+    @rpc_method("tools/list")
+    async def _handle_tools_list(self, request: Dict, request_id: str, session: Session) -> str:
         """Handle tools/list request"""
-        tools = [
-            {
-                "name": "create_vector_store",
-                "description": "Erstellt einen neuen Vector Store für OpenAI",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "name": {
-                            "type": "string",
-                            "description": "Name des Vector Stores"
-                        }
-                    },
-                    "required": ["name"]
-                }
-            },
-            {
-                "name": "upload_file_to_vector_store",
-                "description": "Lädt eine Datei in einen Vector Store hoch",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "vector_store_id": {
-                            "type": "string",
-                            "description": "ID des Vector Stores"
-                        },
-                        "file_content": {
-                            "type": "string",
-                            "description": "Inhalt der Datei"
-                        },
-                        "file_name": {
-                            "type": "string",
-                            "description": "Name der Datei"
-                        }
-                    },
-                    "required": ["vector_store_id", "file_content"]
-                }
-            },
-            {
-                "name": "list_vector_stores",
-                "description": "Listet alle verfügbaren Vector Stores auf",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {}
-                }
-            }
-        ]
-        
-        response = {
-            "jsonrpc": "2.0",
-            "id": request_id,
-            "result": {
-                "tools": tools
-            }
-        }
-        
-        return json.dumps(response)
+        return self._create_result_response(request_id, TOOLS_LIST_RESULT)
     
-    async def _handle_tools_call(self, request: Dict, request_id: str) -> str:
+    @rpc_method("tools/call")
+    async def _handle_tools_call(self, request: Dict, request_id: str, session: Session) -> str:
         """Handle tools/call request"""
-        params = request.get("params", {})
+        params = request.get("params") or {}
         tool_name = params.get("name")
-        arguments = params.get("arguments", {})
+        arguments = params.get("arguments") or {}
         
+        registered = TOOLS.get(tool_name)
+        if registered is None:
+            return self._create_error_response(request_id, -32602, f"Unknown tool: {tool_name}")
         try:
-            if tool_name == "create_vector_store":
-                result = await self._create_vector_store(arguments)
-            elif tool_name == "upload_file_to_vector_store":
-                result = await self._upload_file_to_vector_store(arguments)
-            elif tool_name == "list_vector_stores":
-                result = await self._list_vector_stores(arguments)
-            else:
-                raise ValueError(f"Unknown tool: {tool_name}")
+            registered.validate(arguments)
+        except SchemaError as e:
+            return self._create_error_response(request_id, -32602, f"Invalid arguments for {tool_name}: {e}")
+        
+        try:
+            result = await getattr(self, registered.handler)(arguments)
             
             response = {
                 "jsonrpc": "2.0",
@@ -172,7 +234,7 @@ class MCPServer:
                     "content": [
                         {
                             "type": "text",
-                            "text": json.dumps(result, indent=2)
+                            "text": fast_json.dumps(result, indent=MCP_PRETTY_TOOL_RESULTS)
                         }
                     ]
                 }
@@ -188,52 +250,29 @@ class MCPServer:
                 }
             }
         
-        return json.dumps(response)
+        return fast_json.dumps(response)
     
-    async def _handle_resources_list(self, request: Dict, request_id: str) -> str:
+    @rpc_method("resources/list")
+    async def _handle_resources_list(self, request: Dict, request_id: str, session: Session) -> str:
         """Handle resources/list request"""
-        resources = [
-            {
-                "uri": "file://customer_policies.txt",
-                "name": "Customer Policies",
-                "description": "Kundenrichtlinien und FAQ-Dokument",
-                "mimeType": "text/plain"
-            }
-        ]
-        
-        response = {
-            "jsonrpc": "2.0",
-            "id": request_id,
-            "result": {
-                "resources": resources
-            }
-        }
-        
-        return json.dumps(response)
+        return self._create_result_response(request_id, self.resources.list_json())
     
-    async def _handle_resources_read(self, request: Dict, request_id: str) -> str:
+    @rpc_method("resources/read")
+    async def _handle_resources_read(self, request: Dict, request_id: str, session: Session) -> str:
         """Handle resources/read request"""
-        params = request.get("params", {})
+        params = request.get("params") or {}
         uri = params.get("uri")
         
         try:
-            if uri == "file://customer_policies.txt":
-                with open("customer_policies.txt", "r", encoding="utf-8") as f:
-                    content = f.read()
-            else:
-                raise ValueError(f"Unknown resource: {uri}")
+            # offset/length (Bytes) sind optional und erlauben Teil-Lesezugriffe auf große Resources
+            content = self.resources.read(uri, int(params.get("offset", 0)),
+                                          int(params["length"]) if params.get("length") is not None else None)
             
             response = {
                 "jsonrpc": "2.0",
                 "id": request_id,
                 "result": {
-                    "contents": [
-                        {
-                            "uri": uri,
-                            "mimeType": "text/plain",
-                            "text": content
-                        }
-                    ]
+                    "contents": [content]
                 }
             }
             
@@ -247,48 +286,234 @@ class MCPServer:
                 }
             }
         
-        return json.dumps(response)
+        return fast_json.dumps(response)
+    
+    @rpc_method("resources/subscribe")
+    async def _handle_resources_subscribe(self, request: Dict, request_id: str, session: Session) -> str:
+        """Handle resources/subscribe request"""
+        uri = (request.get("params") or {}).get("uri")
+        try:
+            if not self._is_watched(uri):
+                self.resources.watch(uri)
+        except (OSError, ValueError):
+            return self._create_error_response(request_id, -32602, f"Unknown resource: {uri}")
+        session.subscriptions.add(uri)
+        return self._create_result_response(request_id, "{}")
+    
+    @rpc_method("resources/unsubscribe")
+    async def _handle_resources_unsubscribe(self, request: Dict, request_id: str, session: Session) -> str:
+        """Handle resources/unsubscribe request"""
+        uri = (request.get("params") or {}).get("uri")
+        session.subscriptions.discard(uri)
+        if not self._is_watched(uri):
+            self.resources.unwatch(uri)
+        return self._create_result_response(request_id, "{}")
+    
+    def _is_watched(self, uri: str) -> bool:
+        return any(uri in session.subscriptions for session in self.sessions.values())
+    
+    def open_session(self, send: Optional[Callable[[str], None]] = None) -> Session:
+        """Neue Client-Session (HTTP) registrieren"""
+        session = Session(send=send)
+        self.sessions[session.id] = session
+        return session
+    
+    def close_session(self, session: Session):
+        """Session entfernen und ihre Abos freigeben"""
+        self.sessions.pop(session.id, None)
+        for uri in session.subscriptions:
+            if not self._is_watched(uri):
+                self.resources.unwatch(uri)
+        session.subscriptions.clear()
+    
+    def notify_resource_changes(self) -> int:
+        """Prüft Resources und schickt Notifications an abonnierte Sessions; Rückgabe: Anzahl gesendet"""
+        messages = [
+            (uri, fast_json.dumps({"jsonrpc": "2.0", "method": "notifications/resources/updated", "params": {"uri": uri}}))
+            for uri in self.resources.changed()
+        ]
+        if self.resources.refresh():
+            messages.append((None, fast_json.dumps({"jsonrpc": "2.0", "method": "notifications/resources/list_changed"})))
+        sent = 0
+        for session in list(self.sessions.values()):
+            if session.send is None:
+                continue
+            for uri, message in messages:
+                if uri is None or uri in session.subscriptions:
+                    session.send(message)
+                    sent += 1
+        return sent
     
+    @tool("create_vector_store", "Erstellt einen neuen Vector Store für OpenAI", {
+        "type": "object",
+        "properties": {
+            "name": {
+                "type": "string",
+                "description": "Name des Vector Stores"
+            }
+        },
+        "required": ["name"]
+    })
     async def _create_vector_store(self, arguments: Dict) -> Dict:
         """Create a new vector store"""
-        # Hier würde die OpenAI API Integration stattfinden
         name = arguments.get("name", "Default Vector Store")
+        store = await self.openai.vector_stores.create(name=name)
         
         return {
             "success": True,
-            "vector_store_id": f"vs_{hash(name)}",
-            "name": name,
-            "status": "ready"
+            "vector_store_id": store.id,
+            "name": store.name,
+            "status": store.status
         }
     
+    @tool("upload_file_to_vector_store", "Lädt eine Datei in einen Vector Store hoch", {
+        "type": "object",
+        "properties": {
+            "vector_store_id": {
+                "type": "string",
+                "description": "ID des Vector Stores"
+            },
+            "file_content": {
+                "type": "string",
+                "description": "Inhalt der Datei"
+            },
+            "file_name": {
+                "type": "string",
+                "description": "Name der Datei"
+            }
+        },
+        "required": ["vector_store_id", "file_content"]
+    })
     async def _upload_file_to_vector_store(self, arguments: Dict) -> Dict:
         """Upload file to vector store"""
         vector_store_id = arguments.get("vector_store_id")
         file_content = arguments.get("file_content")
         file_name = arguments.get("file_name", "uploaded_file.txt")
         
+        uploaded = await self.openai.files.create(
+            file=(file_name, file_content.encode("utf-8")),
+            purpose="assistants"
+        )
+        result = await self.openai.vector_stores.files.create_and_poll(
+            uploaded.id,
+            vector_store_id=vector_store_id
+        )
+        
         return {
             "success": True,
-            "file_id": f"file_{hash(file_content)}",
+            "file_id": result.id,
             "vector_store_id": vector_store_id,
             "file_name": file_name,
-            "status": "uploaded"
+            "status": result.status
+        }
+    
+    @tool("upload_files_to_vector_store", "Lädt viele Dateien (oder ein ZIP-Archiv) gebündelt in einen Vector Store hoch", {
+        "type": "object",
+        "properties": {
+            "vector_store_id": {
+                "type": "string",
+                "description": "ID des Vector Stores"
+            },
+            "files": {
+                "type": "array",
+                "description": "Dateien mit file_name und file_content",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "file_name": {"type": "string"},
+                        "file_content": {"type": "string"}
+                    },
+                    "required": ["file_content"]
+                }
+            },
+            "zip_base64": {
+                "type": "string",
+                "description": "Base64-kodiertes ZIP-Archiv"
+            }
+        },
+        "required": ["vector_store_id"]
+    })
+    async def _upload_files_to_vector_store(self, arguments: Dict) -> Dict:
+        """Upload many files to a vector store as one file batch"""
+        vector_store_id = arguments.get("vector_store_id")
+        files = collect_files(arguments.get("files"), arguments.get("zip_base64"))
+        results = [{"file_name": name, "file_id": None, "status": "pending", "error": None} for name, _ in files]
+        semaphore = asyncio.Semaphore(UPLOAD_BATCH_CONCURRENCY)
+        
+        async def upload(index: int):
+            name, content = files[index]
+            async with semaphore:
+                try:
+                    uploaded = await self.openai.files.create(file=(name, content), purpose="assistants")
+                    results[index].update(file_id=uploaded.id, status="uploaded")
+                except Exception as e:
+                    results[index].update(status="failed", error=str(e))
+        
+        await asyncio.gather(*(upload(i) for i in range(len(files))))
+        file_ids = [result["file_id"] for result in results if result["file_id"]]
+        if not file_ids:
+            return {"success": False, "vector_store_id": vector_store_id, "batch_id": None, "files": results}
+        
+        batch = await self.openai.vector_stores.file_batches.create_and_poll(vector_store_id, file_ids=file_ids)
+        statuses = {}
+        async for entry in self.openai.vector_stores.file_batches.list_files(
+            batch.id, vector_store_id=vector_store_id, limit=100
+        ):
+            statuses[entry.id] = (entry.status, entry.last_error.message if entry.last_error else None)
+        for result in results:
+            if result["file_id"] in statuses:
+                result["status"], result["error"] = statuses[result["file_id"]]
+        
+        return {
+            "success": True,
+            "vector_store_id": vector_store_id,
+            "batch_id": batch.id,
+            "batch_status": batch.status,
+            "files": results
         }
     
+    @tool("list_vector_stores", "Listet alle verfügbaren Vector Stores auf", {
+        "type": "object",
+        "properties": {
+            "limit": {
+                "type": "integer",
+                "minimum": 1,
+                "maximum": 100,
+                "description": "Maximale Anzahl pro Seite (1-100)"
+            },
+            "after": {
+                "type": "string",
+                "description": "Cursor: ID des letzten Stores der vorherigen Seite"
+            }
+        }
+    })
     async def _list_vector_stores(self, arguments: Dict) -> Dict:
-        """List all vector stores"""
+        """List vector stores (one page, cursor via after)"""
+        params = {"limit": arguments.get("limit", 20)}
+        if arguments.get("after"):
+            params["after"] = arguments["after"]
+        page = await self.openai.vector_stores.list(**params)
+        stores = [
+            {
+                "id": store.id,
+                "name": store.name,
+                "status": store.status,
+                "created_at": store.created_at
+            }
+            for store in page.data
+        ]
+        
         return {
             "success": True,
-            "vector_stores": [
-                {
-                    "id": "vs_1",
-                    "name": "Support FAQ",
-                    "status": "ready",
-                    "created_at": "2024-09-22T23:20:00Z"
-                }
-            ]
+            "vector_stores": stores,
+            "has_more": page.has_more,
+            "next_after": stores[-1]["id"] if page.has_more and stores else None
         }
     
+    def _create_result_response(self, request_id: Optional[str], result_json: str) -> str:
+        """Wrap an already serialized result without re-encoding it"""
+        return '{"jsonrpc":"2.0","id":' + fast_json.dumps(request_id) + ',"result":' + result_json + '}'
+    
     def _create_error_response(self, request_id: Optional[str], code: int, message: str) -> str:
         """Create error response"""
         response = {
@@ -299,7 +524,105 @@ class MCPServer:
                 "message": message
             }
         }
-        return json.dumps(response)
+        return fast_json.dumps(response)
+
+# tools/list ist statisch: einmal serialisieren statt pro Request
+TOOLS_LIST_RESULT = fast_json.dumps({
+    "tools": [
+        {"name": t.name, "description": t.description, "inputSchema": t.input_schema}
+        for t in TOOLS.values()
+    ]
+})
+
+async def open_stdin_reader() -> asyncio.StreamReader:
+    """StreamReader auf stdin, Fallback auf einen Lese-Thread (z.B. bei umgeleiteten Dateien)"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MCP_MAX_LINE_BYTES)
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    except (ValueError, OSError):
+        def pump():
+            for chunk in iter(lambda: sys.stdin.buffer.readline(), b""):
+                loop.call_soon_threadsafe(reader.feed_data, chunk)
+            loop.call_soon_threadsafe(reader.feed_eof)
+        loop.run_in_executor(None, pump)
+    return reader
+
+def write_stdout(response: str):
+    """Eine Antwort pro Zeile auf stdout"""
+    sys.stdout.write(response + "\n")
+    sys.stdout.flush()
+
+async def watch_resources(server: MCPServer, interval: float):
+    """Prüft regelmäßig per stat() auf Änderungen und meldet sie den Sessions"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            server.notify_resource_changes()
+        except Exception as e:
+            logger.error(f"Resource watch error: {e}")
+
+def _trackable_id(value: Any) -> Any:
+    """JSON-RPC ids für den Abbruch-Index: nur str und int, Objekte/Arrays sind nicht hashbar"""
+    return value if isinstance(value, (str, int)) and not isinstance(value, bool) else None
+
+async def serve_stdio(server: MCPServer, reader: asyncio.StreamReader, write=write_stdout,
+                      max_concurrency: int = MCP_MAX_CONCURRENCY,
+                      poll_interval: float = MCP_RESOURCE_POLL_INTERVAL):
+    """Liest JSON-RPC Zeilen und bearbeitet jede als eigenen Task; Antworten in Fertigstellungsreihenfolge"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks = set()
+    in_flight: Dict[Any, asyncio.Task] = {}
+    server.session.send = write
+    server.resources.refresh()
+    watcher = asyncio.create_task(watch_resources(server, poll_interval)) if poll_interval > 0 else None
+    
+    async def run(request: Dict):
+        async with semaphore:
+            response = await server.dispatch(request)
+        if response is not None:
+            write(response)
+    
+    while True:
+        try:
+            line = await reader.readline()
+        except ValueError:
+            # Zeile länger als MCP_MAX_LINE_BYTES
+            write(server._create_error_response(None, -32600, "Request too large"))
+            continue
+        if not line:
+            break
+        line = line.strip()
+        if not line:
+            continue
+        
+        try:
+            request = fast_json.loads(line)
+        except fast_json.JSONDecodeError:
+            write(server._create_error_response(None, -32700, "Parse error"))
+            continue
+        
+        if isinstance(request, dict) and request.get("method") == "notifications/cancelled":
+            params = request.get("params")
+            task = in_flight.get(_trackable_id(params.get("requestId") if isinstance(params, dict) else None))
+            if task is not None:
+                # Abgebrochene Requests bekommen laut MCP keine Antwort mehr
+                task.cancel()
+            continue
+        
+        request_id = _trackable_id(request.get("id")) if isinstance(request, dict) else None
+        task = asyncio.create_task(run(request))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        if request_id is not None:
+            in_flight[request_id] = task
+            task.add_done_callback(lambda _, key=request_id, t=task: in_flight.get(key) is t and in_flight.pop(key))
+    
+    # EOF: laufende Requests noch zu Ende bringen
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    if watcher is not None:
+        watcher.cancel()
 
 async def main():
     """Main function to run the MCP server"""
@@ -309,24 +632,13 @@ async def main():
     logger.info("Listening for JSON-RPC requests on stdin")
     
     try:
-        while True:
-            # Read from stdin
-            line = await asyncio.get_event_loop().run_in_executor(None, sys.stdin.readline)
-            if not line:
-                break
-            
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Handle the request
-            response = await server.handle_request(line)
-            print(response, flush=True)
-            
+        await serve_stdio(server, await open_stdin_reader())
     except KeyboardInterrupt:
         logger.info("MCP Server shutting down...")
     except Exception as e:
         logger.error(f"Server error: {e}")
+    finally:
+        await server.aclose()
 
 if __name__ == "__main__":
     asyncio.run(main())
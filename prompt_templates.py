@@ -0,0 +1,193 @@
+"""
+Prompt Templates
+Lädt Prompt-Vorlagen (prompts/*.txt) einmal, rendert sie mit geprüften Variablen,
+schätzt die Tokenzahl, kürzt zu lange Eingaben auf ein Budget und führt Größen-Histogramme
+"""
+
+import os
+import string
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+DEFAULT_PROMPTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts')
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARKER = '\n[… gekürzt …]\n'
+HISTOGRAM_BUCKETS = (128, 256, 512, 1024, 2048, 4096, 8192)
+# Kürzere Variablen (Name, Budget, ...) werden beim Gesamtbudget nicht angetastet
+MIN_SHRINK_TOKENS = 32
+
+
+class PromptError(ValueError):
+    """Unbekannte Vorlage oder fehlende/unerwartete Variablen"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Grobe Schätzung (~4 Zeichen pro Token), reicht für Budgets und Statistik"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """Kürzt auf max_tokens: Anfang (2/3) und Ende (1/3) bleiben erhalten, Schnitt an Wortgrenzen"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    budget = max(0, max_chars - len(TRUNCATION_MARKER))
+    head, tail = text[:budget * 2 // 3], text[len(text) - budget // 3:] if budget // 3 else ''
+    if ' ' in head:
+        head = head[:head.rfind(' ')]
+    if ' ' in tail:
+        tail = tail[tail.find(' ') + 1:]
+    return head + TRUNCATION_MARKER + tail
+
+
+@dataclass
+class PromptTemplate:
+    """Vorkompilierte Vorlage: Literale und Variablennamen im Wechsel"""
+    name: str
+    segments: List[Tuple[bool, str]]
+    variables: List[str]
+    limits: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, name: str, source: str) -> 'PromptTemplate':
+        # Kopfzeilen "# limit <variable> <tokens>" legen Budgets pro Variable fest
+        limits = {}
+        lines = source.split('\n')
+        while lines and lines[0].startswith('#'):
+            parts = lines.pop(0).split()
+            if len(parts) == 4 and parts[1] == 'limit':
+                limits[parts[2]] = int(parts[3])
+        body = '\n'.join(lines)
+
+        segments: List[Tuple[bool, str]] = []
+        position = 0
+        for match in string.Template.pattern.finditer(body):
+            segments.append((False, body[position:match.start()]))
+            if match.group('escaped') is not None:
+                segments.append((False, '$'))
+            elif match.group('invalid') is not None:
+                raise PromptError(f'Ungültiger Platzhalter in {name} an Position {match.start()}')
+            else:
+                segments.append((True, match.group('named') or match.group('braced')))
+            position = match.end()
+        segments.append((False, body[position:]))
+        segments = [(is_var, text) for is_var, text in segments if is_var or text]
+
+        variables = list(dict.fromkeys(text for is_var, text in segments if is_var))
+        unknown = set(limits) - set(variables)
+        if unknown:
+            raise PromptError(f'Limit für unbekannte Variable in {name}: {sorted(unknown)}')
+        return cls(name, segments, variables, limits)
+
+
+@dataclass
+class RenderedPrompt:
+    text: str
+    tokens: int
+    truncated: List[str]
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class PromptLibrary:
+    """Alle Vorlagen eines Verzeichnisses, gerendert mit Gesamtbudget max_tokens"""
+
+    def __init__(self, path: str, max_tokens: int = 4000):
+        self.path = path
+        self.max_tokens = max_tokens
+        self.templates: Dict[str, PromptTemplate] = {}
+        for file_name in sorted(os.listdir(path)):
+            name, extension = os.path.splitext(file_name)
+            if extension == '.txt':
+                with open(os.path.join(path, file_name), 'r', encoding='utf-8') as f:
+                    self.templates[name] = PromptTemplate.parse(name, f.read())
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+
+    def render(self, name: str, /, **values) -> RenderedPrompt:
+        template = self.templates.get(name)
+        if template is None:
+            raise PromptError(f'Unbekannte Prompt-Vorlage: {name}')
+        missing = [variable for variable in template.variables if variable not in values]
+        unexpected = [key for key in values if key not in template.variables]
+        if missing or unexpected:
+            raise PromptError(f'{name}: fehlend {missing}, unerwartet {unexpected}')
+
+        texts = {key: '' if value is None else str(value) for key, value in values.items()}
+        truncated = []
+        for variable, limit in template.limits.items():
+            shortened = truncate_text(texts[variable], limit)
+            if shortened is not texts[variable]:
+                texts[variable] = shortened
+                truncated.append(variable)
+
+        text = self._join(template, texts)
+        # Gesamtbudget überschritten: kürzbare Variablen ab MIN_SHRINK_TOKENS anteilig weiter verkleinern
+        for _ in range(3):
+            overflow = estimate_tokens(text) - self.max_tokens
+            sizes = {variable: estimate_tokens(texts[variable]) for variable in template.limits}
+            sizes = {variable: size for variable, size in sizes.items() if size > MIN_SHRINK_TOKENS}
+            if overflow <= 0 or not sizes:
+                break
+            total = sum(sizes.values())
+            for variable, size in sizes.items():
+                reduction = -(-overflow * size // total)  # aufgerundet
+                texts[variable] = truncate_text(texts[variable], max(MIN_SHRINK_TOKENS, size - reduction))
+                if variable not in truncated:
+                    truncated.append(variable)
+            text = self._join(template, texts)
+
+        rendered = RenderedPrompt(text, estimate_tokens(text), truncated)
+        self._record(name, rendered)
+        return rendered
+
+    @staticmethod
+    def _join(template: PromptTemplate, texts: Dict[str, str]) -> str:
+        return ''.join(texts[text] if is_var else text for is_var, text in template.segments)
+
+    def _record(self, name: str, rendered: RenderedPrompt):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {
+                    'renders': 0, 'truncated': 0, 'tokens_total': 0, 'tokens_max': 0,
+                    'histogram': {label: 0 for label in _bucket_labels()}
+                }
+            stats['renders'] += 1
+            stats['truncated'] += bool(rendered.truncated)
+            stats['tokens_total'] += rendered.tokens
+            stats['tokens_max'] = max(stats['tokens_max'], rendered.tokens)
+            stats['histogram'][_bucket_label(rendered.tokens)] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                name: dict(stats, histogram=dict(stats['histogram']),
+                           tokens_avg=round(stats['tokens_total'] / stats['renders'], 1))
+                for name, stats in self._stats.items()
+            }
+
+
+def _bucket_labels() -> List[str]:
+    return [f'<={bound}' for bound in HISTOGRAM_BUCKETS] + [f'>{HISTOGRAM_BUCKETS[-1]}']
+
+
+def _bucket_label(tokens: int) -> str:
+    for bound in HISTOGRAM_BUCKETS:
+        if tokens <= bound:
+            return f'<={bound}'
+    return f'>{HISTOGRAM_BUCKETS[-1]}'
+
+
+_libraries: Dict[Tuple[str, int], PromptLibrary] = {}
+
+
+def get_prompt_library(path: str = DEFAULT_PROMPTS_PATH, max_tokens: int = 4000) -> PromptLibrary:
+    """Lädt das Vorlagenverzeichnis einmal pro Prozess"""
+    key = (os.path.abspath(path), max_tokens)
+    library = _libraries.get(key)
+    if library is None:
+        library = _libraries[key] = PromptLibrary(path, max_tokens)
+    return library
@@ -0,0 +1,214 @@
+"""
+Rate Limits
+Token-Buckets in einer gemeinsamen SQLite-Datei, damit alle gunicorn-Worker eines Hosts dieselben Limits sehen:
+pro Upstream (Gemini, OpenAI) und pro Client für die öffentlichen Endpoints.
+Upstream-429 werden erkannt, pausieren den gemeinsamen Bucket und werden mit Backoff (Retry-After, Jitter) wiederholt.
+"""
+
+import email.utils
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from upstream import UpstreamBusy
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """429 von OpenAI (status_code) oder Gemini/google.api_core (code, ResourceExhausted)"""
+    for attribute in ('status_code', 'code'):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int) and value == 429:
+            return True
+    return type(error).__name__ in ('RateLimitError', 'ResourceExhausted', 'TooManyRequests')
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Retry-After (Sekunden oder HTTP-Datum) bzw. retry-after-ms aus der Upstream-Antwort"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    value = headers.get('retry-after-ms')
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float, maximum: float, hint: Optional[float] = None) -> float:
+    """Exponentieller Backoff mit Jitter (halb fest, halb zufällig), nie kürzer als Retry-After"""
+    delay = min(maximum, base * 2 ** attempt)
+    delay = delay / 2 + random.uniform(0, delay / 2)
+    return max(delay, hint or 0.0)
+
+
+class RateLimitStore:
+    """Token-Buckets, die sich alle Prozesse mit derselben Datei teilen"""
+
+    def __init__(self, path: str, idle_ttl: float = 3600):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self._local = threading.local()
+        self._purged_at = 0.0
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _update(self, key: str, rate: float, burst: float, change) -> Any:
+        """Liest den aufgefüllten Stand, change(tokens) -> (neue tokens, Ergebnis), alles in einer Transaktion"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if now - self._purged_at > 60:
+                # Buckets inaktiver Clients verwerfen, sie wären ohnehin wieder voll
+                conn.execute('DELETE FROM rate_buckets WHERE updated_at < ?', (now - self.idle_ttl,))
+                self._purged_at = now
+            row = conn.execute('SELECT tokens, updated_at FROM rate_buckets WHERE key = ?', (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+            tokens, result = change(tokens)
+            conn.execute(
+                'INSERT INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at',
+                (key, tokens, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+    def acquire(self, key: str, rate: float, burst: float, cost: float = 1.0,
+                max_wait: float = 0.0) -> Tuple[bool, float]:
+        """(True, Wartezeit) wenn reserviert (Bucket darf bis max_wait ins Minus gehen),
+        sonst (False, Sekunden bis genug Tokens da sind) ohne etwas zu verbrauchen"""
+        def take(tokens):
+            wait = max(0.0, (cost - tokens) / rate)
+            if wait <= max_wait:
+                return tokens - cost, (True, wait)
+            return tokens, (False, wait)
+        return self._update(key, rate, burst, take)
+
+    def penalize(self, key: str, rate: float, burst: float, seconds: float) -> None:
+        """Bucket für seconds leeren, z.B. nach einem 429 mit Retry-After"""
+        self._update(key, rate, burst, lambda tokens: (min(tokens, -seconds * rate), None))
+
+
+class UpstreamLimiter:
+    """Requests pro Minute an einen Provider über alle Worker, plus Retry-Strategie für 429"""
+
+    def __init__(self, name: str, store: RateLimitStore, per_minute: float, burst: float = 10,
+                 max_wait: float = 10.0, retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 20.0):
+        self.name = name
+        self.store = store
+        self.key = f'upstream:{name.lower()}'
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_wait = max_wait
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._stats = {'throttled': 0, 'throttle_wait': 0.0, 'rejected': 0, 'upstream_429': 0,
+                       'retries': 0, 'gave_up': 0}
+
+    def acquire(self) -> None:
+        """Wartet auf ein Token; UpstreamBusy wenn das länger als max_wait dauern würde"""
+        if self.rate <= 0:
+            return
+        granted, wait = self.store.acquire(self.key, self.rate, self.burst, max_wait=self.max_wait)
+        if not granted:
+            self._count('rejected')
+            raise UpstreamBusy(f'{self.name}-Limit erreicht, bitte später erneut versuchen', retry_after=wait)
+        if wait > 0:
+            with self._lock:
+                self._stats['throttled'] += 1
+                self._stats['throttle_wait'] += wait
+            time.sleep(wait)
+
+    def observe(self, error: BaseException) -> None:
+        """Upstream-429: gemeinsamen Bucket pausieren, damit auch die anderen Worker bremsen"""
+        if not is_rate_limited(error):
+            return
+        self._count('upstream_429')
+        if self.rate > 0:
+            self.store.penalize(self.key, self.rate, self.burst, retry_after(error) or self.backoff_base)
+
+    def retry_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """Wartezeit vor dem nächsten Versuch, None wenn error kein 429 ist;
+        UpstreamBusy (mit retry_after) wenn die Versuche aufgebraucht sind"""
+        if not is_rate_limited(error):
+            return None
+        hint = retry_after(error)
+        if attempt >= self.retries:
+            self._count('gave_up')
+            raise UpstreamBusy(f'{self.name} meldet weiterhin 429, bitte später erneut versuchen',
+                               retry_after=hint or self.backoff_base * 2 ** attempt) from error
+        self._count('retries')
+        # Bei aktivem Limiter hält der pausierte Bucket Retry-After schon ein, hier nur noch der Jitter-Backoff
+        return backoff_delay(attempt, self.backoff_base, self.backoff_max, hint if self.rate <= 0 else None)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['throttle_wait'] = round(stats['throttle_wait'], 3)
+        return {'per_minute': self.rate * 60, 'burst': self.burst, **stats}
+
+
+class ClientLimiter:
+    """Requests pro Client und Minute für die öffentlichen Endpoints (0 = aus)"""
+
+    def __init__(self, store: RateLimitStore, per_minute: float, burst: float = 10):
+        self.store = store
+        self.rate = per_minute / 60
+        self.burst = burst
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def check(self, client: str) -> Optional[float]:
+        """None wenn erlaubt, sonst Sekunden bis zum nächsten erlaubten Request"""
+        if self.rate <= 0:
+            return None
+        granted, wait = self.store.acquire(f'client:{client}', self.rate, self.burst)
+        with self._lock:
+            if granted:
+                self.allowed += 1
+            else:
+                self.limited += 1
+        return None if granted else wait
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'per_minute': self.rate * 60, 'burst': self.burst, 'allowed': self.allowed,
+                    'limited': self.limited}
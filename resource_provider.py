@@ -0,0 +1,233 @@
+"""
+Resource Provider
+Stellt ein Verzeichnis als MCP-Resources bereit: Inhalte gecacht nach (mtime, size, inode),
+große Dateien per mmap, Teil-Lesezugriffe über Byte-Bereiche und Änderungserkennung per stat()
+"""
+
+import fnmatch
+import mimetypes
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+
+import fast_json
+
+URI_PREFIX = 'file://'
+
+FileKey = Tuple[int, int, int]
+
+
+@dataclass
+class CachedFile:
+    key: FileKey
+    data: Union[bytes, mmap.mmap]
+    mime_type: str
+
+
+def _file_key(stat: os.stat_result) -> FileKey:
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def _utf8_start(data, offset: int) -> int:
+    """Schiebt offset hinter UTF-8-Folgebytes, damit kein Zeichen zerschnitten wird"""
+    while 0 < offset < len(data) and data[offset] & 0xC0 == 0x80:
+        offset += 1
+    return offset
+
+
+class ResourceProvider:
+    """Dateien unter root, die auf patterns passen, als file://<relativer Pfad>"""
+
+    def __init__(self, root: str = '.', patterns: Optional[List[str]] = None,
+                 mmap_threshold: int = 1024 * 1024, max_cache_bytes: int = 32 * 1024 * 1024,
+                 max_mapped: int = 16, scan_interval: float = 1.0):
+        self.root = os.path.realpath(root)
+        self.patterns = patterns or ['*']
+        self.mmap_threshold = mmap_threshold
+        self.max_cache_bytes = max_cache_bytes
+        # Jede Abbildung hält einen Datei-Deskriptor offen: Anzahl begrenzen statt Bytes zählen
+        self.max_mapped = max_mapped
+        self.scan_interval = scan_interval
+        self._lock = threading.Lock()
+        self._files: 'OrderedDict[str, CachedFile]' = OrderedDict()
+        self._cached_bytes = 0
+        self._mapped = 0
+        self._listing: Dict[str, FileKey] = {}
+        self._listing_json: Optional[str] = None
+        self._watched: Dict[str, Optional[FileKey]] = {}
+        self._paths: Dict[str, str] = {}
+        self._scanned_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, uri: str) -> str:
+        path = self._paths.get(uri)
+        if path is not None:
+            return path
+        if not uri or not uri.startswith(URI_PREFIX):
+            raise ValueError(f'Unknown resource: {uri}')
+        relative = uri[len(URI_PREFIX):]
+        path = os.path.realpath(os.path.join(self.root, relative))
+        if os.path.commonpath([path, self.root]) != self.root or not self._matches(relative):
+            raise ValueError(f'Unknown resource: {uri}')
+        self._paths[uri] = path
+        return path
+
+    def _matches(self, relative: str) -> bool:
+        name = os.path.basename(relative)
+        return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative, pattern) for pattern in self.patterns)
+
+    def _scan(self) -> Dict[str, FileKey]:
+        listing = {}
+        for directory, subdirs, names in os.walk(self.root):
+            subdirs[:] = sorted(d for d in subdirs if not d.startswith('.') and d != '__pycache__')
+            for name in sorted(names):
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if name.startswith('.') or not self._matches(relative):
+                    continue
+                try:
+                    listing[URI_PREFIX + relative] = _file_key(os.stat(path))
+                except OSError:
+                    continue
+        return listing
+
+    def refresh(self) -> bool:
+        """Scannt das Verzeichnis neu; True wenn sich die Liste (Dateien oder Größen) geändert hat"""
+        listing = self._scan()
+        with self._lock:
+            changed = {uri: key[1] for uri, key in listing.items()} != {uri: key[1] for uri, key in self._listing.items()}
+            self._listing = listing
+            self._scanned_at = time.monotonic()
+            if changed:
+                self._listing_json = None
+        return changed
+
+    def list_json(self) -> str:
+        """Serialisiertes resources/list-Ergebnis, neu aufgebaut nur nach Änderungen"""
+        if time.monotonic() - self._scanned_at >= self.scan_interval:
+            self.refresh()
+        with self._lock:
+            if self._listing_json is None:
+                resources = []
+                for uri, key in self._listing.items():
+                    relative = uri[len(URI_PREFIX):]
+                    stem = os.path.splitext(os.path.basename(relative))[0]
+                    resources.append({
+                        'uri': uri,
+                        'name': stem.replace('_', ' ').replace('-', ' ').title(),
+                        'description': f'{relative} ({key[1]} Bytes)',
+                        'mimeType': mimetypes.guess_type(relative)[0] or 'text/plain',
+                        'size': key[1]
+                    })
+                self._listing_json = fast_json.dumps({'resources': resources})
+            return self._listing_json
+
+    def _load(self, uri: str) -> CachedFile:
+        path = self._path(uri)
+        key = _file_key(os.stat(path))
+        with self._lock:
+            cached = self._files.get(uri)
+            if cached is not None and cached.key == key:
+                self._files.move_to_end(uri)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        with open(path, 'rb') as f:
+            if key[1] >= self.mmap_threshold:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                data = f.read()
+        # Während des Lesens geändert: nächster Zugriff lädt erneut
+        cached = CachedFile(_file_key(os.stat(path)), data,
+                            mimetypes.guess_type(uri[len(URI_PREFIX):])[0] or 'text/plain')
+
+        with self._lock:
+            self._evict(uri)
+            self._files[uri] = cached
+            if isinstance(data, mmap.mmap):
+                self._mapped += 1
+            else:
+                self._cached_bytes += len(data)
+            while self._cached_bytes > self.max_cache_bytes or self._mapped > self.max_mapped:
+                # Ältesten Eintrag der Art verdrängen, deren Budget überschritten ist (nie den gerade geladenen)
+                mapped = self._mapped > self.max_mapped
+                victim = next((key for key, entry in self._files.items()
+                               if key != uri and isinstance(entry.data, mmap.mmap) == mapped), None)
+                if victim is None:
+                    break
+                self._evict(victim)
+        return cached
+
+    def _evict(self, uri: str):
+        # mmaps nicht schließen: ein laufendes read() kann noch darauf zugreifen.
+        # Abbildung und Deskriptor verschwinden, sobald die letzte Referenz weg ist
+        old = self._files.pop(uri, None)
+        if old is None:
+            return
+        if isinstance(old.data, mmap.mmap):
+            self._mapped -= 1
+        else:
+            self._cached_bytes -= len(old.data)
+
+    def read(self, uri: str, offset: int = 0, length: Optional[int] = None) -> Dict:
+        """Liest eine Resource ganz oder als Byte-Bereich; Bereichsgrenzen folgen UTF-8-Zeichengrenzen"""
+        cached = self._load(uri)
+        data, mime_type = cached.data, cached.mime_type
+        total = len(data)
+        if offset == 0 and length is None:
+            return {'uri': uri, 'mimeType': mime_type, 'text': data[:].decode('utf-8')}
+
+        start = _utf8_start(data, max(0, min(offset, total)))
+        end = total if length is None else _utf8_start(data, max(start, min(start + length, total)))
+        return {
+            'uri': uri,
+            'mimeType': mime_type,
+            'text': data[start:end].decode('utf-8'),
+            'range': {'offset': start, 'length': end - start, 'total': total}
+        }
+
+    def watch(self, uri: str) -> None:
+        """Merkt sich den aktuellen Stand von uri als Basis für changed()"""
+        key = _file_key(os.stat(self._path(uri)))
+        with self._lock:
+            self._watched[uri] = key
+
+    def unwatch(self, uri: str) -> None:
+        with self._lock:
+            self._watched.pop(uri, None)
+
+    def changed(self) -> List[str]:
+        """Beobachtete URIs, deren (mtime, size, inode) sich seit der letzten Prüfung geändert hat"""
+        with self._lock:
+            watched = list(self._watched.items())
+        changed = []
+        for uri, previous in watched:
+            try:
+                key = _file_key(os.stat(self._path(uri)))
+            except (OSError, ValueError):
+                key = None
+            if key == previous:
+                continue
+            changed.append(uri)
+            with self._lock:
+                if uri in self._watched:
+                    self._watched[uri] = key
+                # Veralteten Inhalt (v.a. mmap auf geänderte Datei) aus dem Cache nehmen
+                self._evict(uri)
+        return changed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'files': len(self._files),
+                'cached_bytes': self._cached_bytes,
+                'mapped': sum(isinstance(f.data, mmap.mmap) for f in self._files.values()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,191 @@
+"""
+Policy Retrieval
+Lokaler BM25-Index über die nummerierten Abschnitte der Kundenrichtlinien
+"""
+
+import hashlib
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from prompt_templates import estimate_tokens
+
+# "1. ALLGEMEINE GESCHÄFTSBEDINGUNGEN" -> Abschnitt 1
+SECTION_PATTERN = re.compile(r'^(\d+)\.\s+(\S.*)$')
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+STOPWORDS = {
+    'der', 'die', 'das', 'und', 'oder', 'ein', 'eine', 'einen', 'einem', 'einer',
+    'ist', 'sind', 'wird', 'werden', 'wie', 'was', 'wann', 'wo', 'wer', 'mit',
+    'für', 'von', 'vor', 'nach', 'bei', 'auf', 'aus', 'zu', 'zum', 'zur', 'im',
+    'in', 'an', 'am', 'es', 'ich', 'sie', 'wir', 'ihr', 'mein', 'meine', 'ihre',
+    'kann', 'können', 'gibt', 'habe', 'hat', 'haben', 'den', 'dem', 'des', 'nicht',
+    'auch', 'alle', 'über', 'unter', 'sich', 'man', 'welche', 'welcher', 'the'
+}
+
+# Einfaches Suffix-Stemming: Verb und Substantiv fallen auf denselben Stamm
+# ("zahlen"/"Zahlungen" -> "zahl", "stornieren"/"Stornierungen" -> "storn")
+SUFFIXES = ('ierungen', 'ierung', 'ieren', 'ungen', 'ung', 'en', 'er', 'es', 'e', 'n', 's')
+# Kürzere Suchbegriffe werden nicht als Teil zusammengesetzter Wörter gesucht
+MIN_COMPOUND_STEM = 4
+# Gewicht eines Treffers in einem Kompositum ("projekt" in "Projektlaufzeiten") gegenüber einem exakten
+COMPOUND_WEIGHT = 0.5
+
+
+def _stem(token: str) -> str:
+    for suffix in SUFFIXES:
+        if len(token) - len(suffix) >= 4 and token.endswith(suffix):
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Zerlegt Text in normalisierte Suchbegriffe"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if len(token) < 2 or token in STOPWORDS:
+            continue
+        tokens.append(_stem(token))
+    return tokens
+
+
+@dataclass
+class PolicyChunk:
+    """Ein Abschnitt der Kundenrichtlinien"""
+    number: str
+    title: str
+    text: str
+    terms: Counter = field(default_factory=Counter, repr=False)
+
+
+def split_sections(content: str) -> List[PolicyChunk]:
+    """Teilt das Richtlinien-Dokument an den nummerierten Überschriften auf"""
+    chunks: List[PolicyChunk] = []
+    number, title, lines = '', '', []
+
+    def flush():
+        text = '\n'.join(lines).strip()
+        if text:
+            chunks.append(PolicyChunk(number=number, title=title or text.splitlines()[0], text=text))
+
+    for line in content.splitlines():
+        match = SECTION_PATTERN.match(line.strip()) if not line[:1].isspace() else None
+        if match:
+            flush()
+            number, title, lines = match.group(1), match.group(2).strip(), [line.rstrip()]
+        else:
+            lines.append(line.rstrip())
+    flush()
+    return chunks
+
+
+class PolicyIndex:
+    """In-Memory BM25-Index über Richtlinien-Abschnitte"""
+
+    def __init__(self, chunks: List[PolicyChunk], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.doc_freq: Counter = Counter()
+        for chunk in chunks:
+            chunk.terms = Counter(tokenize(chunk.text))
+            self.doc_freq.update(chunk.terms.keys())
+        lengths = [sum(chunk.terms.values()) for chunk in chunks]
+        self.avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + (len(chunks) - df + 0.5) / (df + 0.5))
+            for term, df in self.doc_freq.items()
+        }
+        self.text = '\n\n'.join(chunk.text for chunk in chunks)
+        self.content_hash = ''
+        self._expansions: Dict[str, List[Tuple[str, float]]] = {}
+        self.source_path: Optional[str] = None
+        self.source_stat: Optional[Tuple[float, int]] = None
+
+    @classmethod
+    def from_text(cls, content: str) -> 'PolicyIndex':
+        index = cls(split_sections(content))
+        index.text = content
+        index.content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return index
+
+    @classmethod
+    def from_file(cls, path: str) -> 'PolicyIndex':
+        """Baut den Index aus einer Richtlinien-Datei"""
+        with open(path, 'r', encoding='utf-8') as f:
+            index = cls.from_text(f.read())
+        stat = os.stat(path)
+        index.source_path = path
+        index.source_stat = (stat.st_mtime, stat.st_size)
+        return index
+
+    def is_stale(self) -> bool:
+        """Prüft per stat(), ob sich die Quelldatei seit dem Aufbau geändert hat"""
+        if not self.source_path:
+            return False
+        try:
+            stat = os.stat(self.source_path)
+        except OSError:
+            return False
+        return (stat.st_mtime, stat.st_size) != self.source_stat
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """Indexbegriffe zu einem Suchbegriff: der Begriff selbst plus Komposita, die ihn enthalten"""
+        expansions = self._expansions.get(term)
+        if expansions is None:
+            expansions = [(term, 1.0)] if term in self.idf else []
+            if len(term) >= MIN_COMPOUND_STEM:
+                expansions += [(other, COMPOUND_WEIGHT) for other in self.idf if term in other and other != term]
+            self._expansions[term] = expansions
+        return expansions
+
+    def _score(self, chunk: PolicyChunk, query_terms: List[Tuple[str, float]]) -> float:
+        length = sum(chunk.terms.values())
+        norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+        score = 0.0
+        for term, weight in query_terms:
+            tf = chunk.terms.get(term, 0)
+            if tf:
+                score += weight * self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+        return score
+
+    def search(self, query: str, top_k: int = 3) -> List[PolicyChunk]:
+        """Liefert die top_k relevantesten Abschnitte in Dokument-Reihenfolge"""
+        query_terms = [expansion for term in dict.fromkeys(tokenize(query)) for expansion in self._expand(term)]
+        scored = [(self._score(chunk, query_terms), pos) for pos, chunk in enumerate(self.chunks)]
+        hits = sorted((item for item in scored if item[0] > 0), key=lambda item: (-item[0], item[1]))
+        positions = sorted(pos for _, pos in hits[:top_k])
+        return [self.chunks[pos] for pos in positions]
+
+    def context_sections(self, sections: List[PolicyChunk], max_tokens: int = 2000) -> List[PolicyChunk]:
+        """Abschnitte, die context() in den Prompt schreibt: alle, wenn das Dokument in max_tokens passt
+        oder nichts gefunden wurde, sonst nur die Treffer"""
+        if not sections or estimate_tokens(self.text) <= max_tokens:
+            return self.chunks
+        return sections
+
+    def context(self, sections: List[PolicyChunk], max_tokens: int = 2000) -> str:
+        """Prompt-Kontext zu context_sections(): das ganze Dokument oder nur die Treffer"""
+        sent = self.context_sections(sections, max_tokens)
+        if sent is self.chunks:
+            return self.text
+        return '\n\n'.join(chunk.text for chunk in sent)
+
+    def build_context(self, query: str, top_k: int = 3, max_tokens: int = 2000) -> str:
+        """Sucht und formatiert die Treffer als Prompt-Kontext"""
+        return self.context(self.search(query, top_k), max_tokens)
+
+
+_indexes: Dict[str, PolicyIndex] = {}
+
+
+def get_policy_index(path: str) -> PolicyIndex:
+    """Gibt den Index für path zurück und baut ihn nur bei Dateiänderungen neu"""
+    index = _indexes.get(path)
+    if index is None or index.is_stale():
+        index = PolicyIndex.from_file(path)
+        _indexes[path] = index
+    return index
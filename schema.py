@@ -0,0 +1,142 @@
+"""
+Schema
+Kleiner JSON-Schema-Validator: Schemas werden einmal in verschachtelte Prüffunktionen übersetzt
+Unterstützt type, properties, required, additionalProperties, items, enum, minimum/maximum, minLength/maxLength,
+minItems/maxItems, pattern
+"""
+
+import re
+from typing import Any, Callable, Dict, List
+
+Validator = Callable[[Any, str, List[str]], None]
+
+_TYPES = {
+    'object': lambda v: isinstance(v, dict),
+    'array': lambda v: isinstance(v, list),
+    'string': lambda v: isinstance(v, str),
+    'integer': lambda v: isinstance(v, int) and not isinstance(v, bool),
+    'number': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    'boolean': lambda v: isinstance(v, bool),
+    'null': lambda v: v is None,
+}
+
+
+class SchemaError(ValueError):
+    """Daten passen nicht zum Schema; errors enthält alle Verstöße mit Pfad"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+def _compile(schema: Dict) -> Validator:
+    checks: List[Validator] = []
+
+    expected = schema.get('type')
+    if expected is not None:
+        names = expected if isinstance(expected, list) else [expected]
+        unknown = [name for name in names if name not in _TYPES]
+        if unknown:
+            raise ValueError(f'Unbekannter Schema-Typ: {unknown[0]}')
+        tests = [_TYPES[name] for name in names]
+        test = tests[0] if len(tests) == 1 else (lambda v: any(t(v) for t in tests))
+        label = '|'.join(names)
+
+        def check_type(value, path, errors):
+            if not test(value):
+                errors.append(f'{path}: erwartet {label}, erhalten {type(value).__name__}')
+        checks.append(check_type)
+
+    if 'enum' in schema:
+        allowed = list(schema['enum'])
+
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                errors.append(f'{path}: {value!r} nicht in {allowed}')
+        checks.append(check_enum)
+
+    for keyword, compare, text in (('minimum', float.__lt__, '<'), ('maximum', float.__gt__, '>')):
+        if keyword in schema:
+            bound = float(schema[keyword])
+
+            def check_bound(value, path, errors, bound=bound, compare=compare, text=text):
+                if _TYPES['number'](value) and compare(float(value), bound):
+                    errors.append(f'{path}: {value} {text} {bound:g}')
+            checks.append(check_bound)
+
+    for keyword, compare, text in (('minLength', int.__lt__, 'kürzer'), ('maxLength', int.__gt__, 'länger')):
+        if keyword in schema:
+            bound = int(schema[keyword])
+
+            def check_length(value, path, errors, bound=bound, compare=compare, text=text):
+                if isinstance(value, str) and compare(len(value), bound):
+                    errors.append(f'{path}: {text} als {bound} Zeichen')
+            checks.append(check_length)
+
+    if 'pattern' in schema:
+        pattern = re.compile(schema['pattern'])
+
+        def check_pattern(value, path, errors):
+            if isinstance(value, str) and not pattern.search(value):
+                errors.append(f'{path}: passt nicht zu {pattern.pattern}')
+        checks.append(check_pattern)
+
+    for keyword, compare, text in (('minItems', int.__lt__, 'weniger'), ('maxItems', int.__gt__, 'mehr')):
+        if keyword in schema:
+            bound = int(schema[keyword])
+
+            def check_count(value, path, errors, bound=bound, compare=compare, text=text):
+                if isinstance(value, list) and compare(len(value), bound):
+                    errors.append(f'{path}: {text} als {bound} Einträge')
+            checks.append(check_count)
+
+    properties = {name: _compile(sub) for name, sub in schema.get('properties', {}).items()}
+    required = list(schema.get('required', []))
+    additional = schema.get('additionalProperties', True)
+    if properties or required or additional is not True:
+        additional_check = _compile(additional) if isinstance(additional, dict) else None
+
+        def check_object(value, path, errors):
+            if not isinstance(value, dict):
+                return
+            for name in required:
+                if name not in value:
+                    errors.append(f'{path}.{name}: Pflichtfeld fehlt')
+            for name, item in value.items():
+                check = properties.get(name)
+                if check is not None:
+                    check(item, f'{path}.{name}', errors)
+                elif additional is False:
+                    errors.append(f'{path}.{name}: unerwartetes Feld')
+                elif additional_check is not None:
+                    additional_check(item, f'{path}.{name}', errors)
+        checks.append(check_object)
+
+    if 'items' in schema:
+        item_check = _compile(schema['items'])
+
+        def check_items(value, path, errors):
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    item_check(item, f'{path}[{index}]', errors)
+        checks.append(check_items)
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def validate(value, path, errors):
+        for check in checks:
+            check(value, path, errors)
+    return validate
+
+
+def compile_schema(schema: Dict) -> Callable[[Any], None]:
+    """Übersetzt schema einmalig; der Rückgabewert wirft SchemaError bei ungültigen Daten"""
+    validate = _compile(schema)
+
+    def check(value: Any) -> None:
+        errors: List[str] = []
+        validate(value, '$', errors)
+        if errors:
+            raise SchemaError(errors)
+    return check
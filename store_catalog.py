@@ -0,0 +1,94 @@
+"""
+Store Catalog
+Kurzlebiger Cache für Vector-Store-Listen inkl. vorserialisiertem Body und ETag
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import fast_json
+
+
+@dataclass
+class CatalogPage:
+    body: str
+    etag: str
+    fetched_at: float
+
+
+PageKey = Tuple[int, Optional[str]]
+
+
+class StoreCatalog:
+    """Cacht Seiten von client.vector_stores.list() pro (limit, after), höchstens max_pages (LRU)"""
+
+    def __init__(self, fetch_page: Callable[[int, Optional[str]], Dict], ttl: float = 10.0, max_pages: int = 256):
+        self.fetch_page = fetch_page
+        self.ttl = ttl
+        self.max_pages = max_pages
+        self._pages: 'OrderedDict[PageKey, CatalogPage]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._fetching: Dict[PageKey, threading.Lock] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, key: PageKey) -> Optional[CatalogPage]:
+        page = self._pages.get(key)
+        if page is None or time.monotonic() - page.fetched_at >= self.ttl:
+            return None
+        self._pages.move_to_end(key)
+        return page
+
+    def _store(self, key: PageKey, page: CatalogPage) -> None:
+        # after kommt vom Client: abgelaufene Seiten gleich mit entfernen und die Anzahl begrenzen
+        now = time.monotonic()
+        for stale in [k for k, p in self._pages.items() if now - p.fetched_at >= self.ttl]:
+            del self._pages[stale]
+        self._pages[key] = page
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+
+    def get_page(self, limit: int, after: Optional[str] = None) -> CatalogPage:
+        key = (limit, after)
+        with self._lock:
+            page = self._fresh(key)
+            if page is not None:
+                self.hits += 1
+                return page
+            self.misses += 1
+            generation = self._generation
+            fetch_lock = self._fetching.setdefault(key, threading.Lock())
+
+        # Ein Upstream-Aufruf pro Seite, parallele Misses derselben Seite nutzen danach den frischen Eintrag;
+        # andere Seiten warten nicht auf einen langsamen Aufruf
+        with fetch_lock:
+            try:
+                with self._lock:
+                    page = self._fresh(key)
+                if page is not None:
+                    return page
+                body = fast_json.dumps(self.fetch_page(limit, after))
+                page = CatalogPage(body, hashlib.sha1(body.encode('utf-8')).hexdigest(), time.monotonic())
+                with self._lock:
+                    # Während des Fetches invalidiert: Ergebnis ausliefern, aber nicht cachen
+                    if generation == self._generation:
+                        self._store(key, page)
+                return page
+            finally:
+                with self._lock:
+                    if self._fetching.get(key) is fetch_lock:
+                        del self._fetching[key]
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._pages.clear()
+            self._generation += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'pages': len(self._pages), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
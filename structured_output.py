@@ -0,0 +1,180 @@
+"""
+Structured Output
+JSON-Antworten von Gemini nach Schema: JSON-Modus anfordern (falls das SDK ihn kennt), lokal tolerant parsen,
+gegen das Schema prüfen und höchstens einen kurzen Reparatur-Aufruf machen. Zählt Parse- und Schemafehler.
+"""
+
+import inspect
+import json
+import logging
+import re
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import google.generativeai as genai
+
+import fast_json
+from prompt_templates import PromptLibrary
+from schema import SchemaError, compile_schema
+
+logger = logging.getLogger(__name__)
+
+FENCE_PATTERN = re.compile(r'```(?:json)?\s*(.*?)\s*```', re.DOTALL | re.IGNORECASE)
+TRAILING_COMMA_PATTERN = re.compile(r',\s*([}\]])')
+
+# response_mime_type/response_schema gibt es erst in neueren google-generativeai Versionen
+_CONFIG_FIELDS = set(inspect.signature(genai.GenerationConfig).parameters)
+SUPPORTS_JSON_MODE = 'response_mime_type' in _CONFIG_FIELDS
+SUPPORTS_RESPONSE_SCHEMA = 'response_schema' in _CONFIG_FIELDS
+
+# Teilmenge, die Gemini als response_schema akzeptiert; Rest prüft nur der lokale Validator
+_RESPONSE_SCHEMA_KEYS = ('type', 'properties', 'required', 'items', 'enum', 'description')
+
+
+class OutputError(ValueError):
+    """Modellantwort ist kein JSON oder passt nicht zum Schema"""
+
+
+def extract_json(text: str) -> Any:
+    """Parst JSON aus einer Modellantwort: Code-Fences, Text davor/danach und hängende Kommas werden toleriert"""
+    if not isinstance(text, str) or not text.strip():
+        raise OutputError('Leere Antwort')
+    candidate = text.strip()
+    try:
+        return fast_json.loads(candidate)
+    except fast_json.JSONDecodeError:
+        pass
+
+    fenced = FENCE_PATTERN.search(candidate)
+    if fenced:
+        candidate = fenced.group(1)
+    starts = [position for position in (candidate.find('{'), candidate.find('[')) if position >= 0]
+    if not starts:
+        raise OutputError('Kein JSON in der Antwort')
+    candidate = candidate[min(starts):]
+    decoder = json.JSONDecoder()
+    for attempt in (candidate, TRAILING_COMMA_PATTERN.sub(r'\1', candidate)):
+        try:
+            return decoder.raw_decode(attempt)[0]
+        except json.JSONDecodeError as e:
+            error = e
+    raise OutputError(f'Ungültiges JSON: {error.msg} (Zeile {error.lineno}, Spalte {error.colno})')
+
+
+def response_schema(schema: Dict) -> Dict:
+    """Schema ohne die Schlüsselwörter, die Gemini nicht kennt (minItems, additionalProperties, ...)"""
+    result = {key: schema[key] for key in _RESPONSE_SCHEMA_KEYS if key in schema}
+    if 'properties' in result:
+        result['properties'] = {name: response_schema(sub) for name, sub in result['properties'].items()}
+    if 'items' in result:
+        result['items'] = response_schema(result['items'])
+    if 'enum' in result and 'type' not in result:
+        result['type'] = 'string'
+    return result
+
+
+class StructuredOutput:
+    """Ein Schema samt Generation-Config, Validator und Zählern pro Endpoint"""
+
+    def __init__(self, name: str, schema: Dict, prompts: PromptLibrary):
+        self.name = name
+        self.schema = schema
+        self.prompts = prompts
+        self.validate = compile_schema(schema)
+        self.schema_json = fast_json.dumps(schema)
+        self.generation_config = None
+        if SUPPORTS_JSON_MODE:
+            config = {'response_mime_type': 'application/json'}
+            if SUPPORTS_RESPONSE_SCHEMA:
+                config['response_schema'] = response_schema(schema)
+            self.generation_config = genai.GenerationConfig(**config)
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'parsed': 0, 'repaired': 0, 'failed': 0,
+                       'parse_errors': 0, 'schema_errors': 0}
+
+    def parse(self, text: str) -> Any:
+        """Parst und validiert; OutputError mit allen Verstößen"""
+        try:
+            value = extract_json(text)
+        except OutputError:
+            self._count('parse_errors')
+            raise
+        try:
+            self.validate(value)
+        except SchemaError as e:
+            self._count('schema_errors')
+            raise OutputError(str(e)) from e
+        return value
+
+    def generate(self, generate: Callable[..., Any], prompt: str) -> Optional[Any]:
+        """Ein Modellaufruf plus höchstens eine Reparatur; None wenn beides scheitert"""
+        kwargs = {'generation_config': self.generation_config} if self.generation_config is not None else {}
+        return self.resolve(generate, generate(prompt, **kwargs).text)
+
+    def resolve(self, generate: Callable[..., Any], text: str) -> Optional[Any]:
+        """Validiert eine bereits erzeugte Antwort, bei Fehlern mit höchstens einer Reparatur"""
+        self._count('requests')
+        kwargs = {'generation_config': self.generation_config} if self.generation_config is not None else {}
+        try:
+            value = self.parse(text)
+            self._count('parsed')
+            return value
+        except OutputError as e:
+            error = e
+
+        # Reparatur mit kurzem Prompt: nur fehlerhafte Antwort, Fehler und Schema, nicht der Original-Kontext
+        repair_prompt = self.prompts.render('json_repair', schema=self.schema_json, errors=str(error),
+                                            output=text).text
+        try:
+            value = self.parse(generate(repair_prompt, **kwargs).text)
+        except OutputError as e:
+            logger.warning(f'{self.name}: Modellantwort auch nach Reparatur ungültig: {e}')
+            self._count('failed')
+            return None
+        self._count('repaired')
+        return value
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+def split_answer(text: str, marker: str) -> Tuple[str, str]:
+    """Trennt Freitext-Antwort und angehängtes JSON am marker; ohne marker ist der Rest leer"""
+    index = text.find(marker)
+    if index < 0:
+        return text.strip(), ''
+    return text[:index].strip(), text[index + len(marker):]
+
+
+class MarkerSplitter:
+    """Für gestreamte Antworten: Text vor dem marker wird live weitergegeben, alles danach zurückgehalten"""
+
+    def __init__(self, marker: str):
+        self.marker = marker
+        self.found = False
+        self._buffer = ''
+
+    def feed(self, text: str) -> str:
+        """Gibt den Teil von text zurück, der sicher vor dem marker liegt"""
+        if self.found:
+            return ''
+        self._buffer += text
+        index = self._buffer.find(self.marker)
+        if index >= 0:
+            self.found = True
+            safe, self._buffer = self._buffer[:index], ''
+            return safe
+        # Ein über Chunk-Grenzen geteilter marker darf nicht halb ausgegeben werden
+        cut = max(0, len(self._buffer) - len(self.marker) + 1)
+        safe, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return safe
+
+    def flush(self) -> str:
+        """Rest nach Stream-Ende (nur wenn kein marker kam)"""
+        rest, self._buffer = self._buffer, ''
+        return rest
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests für den Antwort-Cache von /ask-question und /generate-followups
+"""
+
+import time
+
+from answer_cache import AnswerCache, normalize_question
+
+
+class CountingModel:
+    """Gemini-Stub, der die Anzahl der Aufrufe zählt"""
+
+    def __init__(self, text='Zahlungen sind nach 30 Tagen fällig.'):
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        return type('Response', (), {'text': self.text})()
+
+
+def test_normalize_question_folds_case_umlauts_and_punctuation():
+    assert normalize_question('Wann sind  Zahlungen FÄLLIG?') == 'wann sind zahlungen faellig'
+    assert normalize_question('wann sind zahlungen fällig') == normalize_question('Wann sind Zahlungen faellig!!')
+    assert normalize_question('Größe?') == 'groesse'
+
+
+def test_lru_eviction_respects_size_bound():
+    cache = AnswerCache(max_size=2, ttl=60)
+    cache.set(('a',), 1)
+    cache.set(('b',), 2)
+    assert cache.get(('a',)) == 1
+    cache.set(('c',), 3)
+    assert cache.get(('b',)) is None
+    assert cache.get(('a',)) == 1
+    assert cache.stats()['evictions'] == 1
+
+
+def test_ttl_expiry():
+    cache = AnswerCache(max_size=10, ttl=0.01)
+    cache.set(('a',), 1)
+    time.sleep(0.02)
+    assert cache.get(('a',)) is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_version_change_clears_entries():
+    cache = AnswerCache()
+    cache.bind_version('v1')
+    cache.set(('a',), 1)
+    cache.bind_version('v1')
+    assert cache.get(('a',)) == 1
+    cache.bind_version('v2')
+    assert cache.get(('a',)) is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_ask_question_serves_repeated_questions_from_cache():
+    import app
+    model = CountingModel()
+    app.gemini_model = model
+    app.answer_cache.clear()
+    client = app.app.test_client()
+
+    first = client.post('/ask-question', json={'question': 'Wann sind Zahlungen fällig?'}).get_json()
+    second = client.post('/ask-question', json={'question': 'wann sind zahlungen faellig'}).get_json()
+
+    assert model.calls == 1
+    assert second['answer'] == first['answer']
+    assert second['cached'] is True
+    stats = client.get('/cache-stats').get_json()
+    assert stats['ask_question']['hits'] >= 1
+
+
+def test_followups_cached_per_question_and_answer():
+    import app
+    model = CountingModel('{"followups": ["A?", "B?", "C?"]}')
+    app.gemini_model = model
+    app.followup_cache.clear()
+    client = app.app.test_client()
+    payload = {'original_question': 'Gibt es Ratenzahlung?', 'original_answer': 'Ja, ab 10.000€.'}
+
+    client.post('/generate-followups', json=payload)
+    data = client.post('/generate-followups', json=payload).get_json()
+    assert model.calls == 1
+    assert data['followups'] == ['A?', 'B?', 'C?']
+
+    client.post('/generate-followups', json=dict(payload, original_answer='Nein.'))
+    assert model.calls == 2
+
+
+if __name__ == '__main__':
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
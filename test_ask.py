@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests und Benchmark für /ask (Antwort + Folgefragen in einem Modellaufruf)
+Misst Time-to-Followups gegenüber /ask-question gefolgt von /generate-followups
+"""
+
+import json
+import time
+
+from structured_output import MarkerSplitter, split_answer
+from test_streaming import parse_events
+
+ANSWER = 'Zahlungen sind innerhalb von 30 Tagen fällig.'
+FOLLOWUPS = ['Gibt es Skonto?', 'Was passiert bei Verzug?', 'Kann ich in Raten zahlen?']
+
+
+def chunked(text, size=5):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class AskModel:
+    """Gemini-Stub: Antwort-Tokens, dann Marker und Folgefragen-JSON; latency pro Aufruf, token_delay pro Chunk"""
+
+    def __init__(self, tail=None, latency=0.0, token_delay=0.0):
+        tail = '\nFOLGEFRAGEN:\n' + json.dumps({'followups': FOLLOWUPS}) if tail is None else tail
+        # Kleine Chunks, damit der Marker über Chunk-Grenzen verteilt ist
+        self.tokens = chunked(ANSWER + tail)
+        self.followup_tokens = chunked(json.dumps({'followups': FOLLOWUPS}))
+        self.latency = latency
+        self.token_delay = token_delay
+        self.prompts = []
+
+    def _chunks(self, tokens):
+        time.sleep(self.latency)
+        for token in tokens:
+            time.sleep(self.token_delay)
+            yield type('Chunk', (), {'text': token})()
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.prompts.append(prompt)
+        tokens = self.tokens
+        if 'KUNDENRICHTLINIEN' not in prompt:
+            # Separater Folgefragen- oder Reparatur-Aufruf
+            tokens = self.followup_tokens
+        if stream:
+            return self._chunks(tokens)
+        return type('Response', (), {'text': ''.join(chunk.text for chunk in self._chunks(tokens))})()
+
+
+def use_model(model):
+    import app
+    app.gemini_model = model
+    app.answer_cache.clear()
+    app.followup_cache.clear()
+    return app.app.test_client()
+
+
+def test_splitter_never_emits_marker_parts():
+    splitter = MarkerSplitter('FOLGEFRAGEN:')
+    text = 'Antwort.\nFOLGEFRAGEN:\n{"followups": []}'
+    emitted = ''.join(splitter.feed(text[i:i + 3]) for i in range(0, len(text), 3))
+    assert emitted == 'Antwort.\n' and splitter.found
+    assert split_answer(text, 'FOLGEFRAGEN:') == ('Antwort.', '\n{"followups": []}')
+
+    splitter = MarkerSplitter('FOLGEFRAGEN:')
+    assert splitter.feed('Nur Antwort FOLGE') + splitter.flush() == 'Nur Antwort FOLGE'
+
+
+def test_ask_returns_answer_and_followups_from_one_call():
+    model = AskModel()
+    client = use_model(model)
+    data = client.post('/ask', json={'question': 'Wann sind Zahlungen fällig?'}).get_json()
+    assert data['answer'] == ANSWER
+    assert data['followups'] == FOLLOWUPS
+    assert len(model.prompts) == 1 and 'FOLGEFRAGEN:' in model.prompts[0]
+
+    cached = client.post('/ask', json={'question': 'wann sind zahlungen faellig'}).get_json()
+    assert cached['cached'] is True and cached['followups'] == FOLLOWUPS
+    assert len(model.prompts) == 1
+
+
+def test_ask_streams_only_the_answer():
+    model = AskModel()
+    client = use_model(model)
+    response = client.post('/ask', json={'question': 'Wann sind Zahlungen fällig?', 'stream': True})
+    events = parse_events(response.get_data(as_text=True))
+    streamed = ''.join(data['delta'] for event, data in events if event == 'message')
+    assert streamed.strip() == ANSWER
+    event, done = events[-1]
+    assert event == 'done' and done['followups'] == FOLLOWUPS and done['answer'] == ANSWER
+    assert len(model.prompts) == 1
+
+
+def test_missing_marker_falls_back_to_separate_followups_call():
+    model = AskModel(tail='')
+    client = use_model(model)
+    data = client.post('/ask', json={'question': 'Wann sind Zahlungen fällig?'}).get_json()
+    assert data['answer'] == ANSWER and data['followups'] == FOLLOWUPS
+    assert len(model.prompts) == 2
+
+
+def test_ask_requires_question():
+    client = use_model(AskModel())
+    assert client.post('/ask', json={}).status_code == 400
+
+
+def time_to_followups(client, combined):
+    started = time.perf_counter()
+    question = {'question': 'Wann sind Zahlungen fällig?', 'stream': True}
+    if combined:
+        body = client.post('/ask', json=question).get_data(as_text=True)
+        followups = parse_events(body)[-1][1]['followups']
+    else:
+        body = client.post('/ask-question', json=question).get_data(as_text=True)
+        answer = parse_events(body)[-1][1]['answer']
+        followups = client.post('/generate-followups', json={
+            'original_question': question['question'], 'original_answer': answer}).get_json()['followups']
+    assert followups == FOLLOWUPS
+    return time.perf_counter() - started
+
+
+def benchmark(rounds=5, latency=0.3, token_delay=0.01):
+    """Stub mit latency pro Aufruf: vorher zwei Aufrufe hintereinander, nachher einer"""
+    print(f"⏱️  Stub: {latency * 1000:.0f} ms pro Aufruf, {token_delay * 1000:.0f} ms pro Chunk")
+    for label, combined in (('/ask-question + /generate-followups', False), ('/ask', True)):
+        timings = []
+        for _ in range(rounds):
+            model = AskModel(tail=None if combined else '', latency=latency, token_delay=token_delay)
+            timings.append(time_to_followups(use_model(model), combined))
+        print(f"🔁 {label:<38} Time-to-Followups {sum(timings) / rounds * 1000:.0f} ms, "
+              f"{len(model.prompts)} Modellaufrufe")
+
+
+if __name__ == '__main__':
+    import conftest  # noqa: F401  (Umgebung wie unter pytest)
+    benchmark()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests und Durchsatz-Messung für Bulk-Uploads gegen den lokalen OpenAI-Fake
+"""
+
+import base64
+import io
+import time
+import zipfile
+
+import pytest
+from openai import OpenAI
+
+from bulk_upload import collect_files, extract_zip, upload_batch, wait_for_indexing
+from upstream import ProviderGate
+from fake_openai_server import start_fake_openai
+
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def fake_openai():
+    server, state, base_url = start_fake_openai()
+    yield OpenAI(api_key='test-key', base_url=base_url, max_retries=0), state
+    server.shutdown()
+
+
+def test_extract_zip_skips_directories_and_hidden_files():
+    data = make_zip({'docs/faq.txt': 'FAQ', 'docs/': '', '.DS_Store': 'x', '__MACOSX/._faq.txt': 'x', 'agb.md': 'AGB'})
+    assert extract_zip(data) == [('faq.txt', b'FAQ'), ('agb.md', b'AGB')]
+
+
+def test_collect_files_merges_json_zip_and_uploads():
+    zip_b64 = base64.b64encode(make_zip({'a.txt': 'A'})).decode()
+    files = collect_files([{'file_name': 'b.txt', 'file_content': 'Bä'}], zip_b64,
+                          [('c.txt', b'C'), ('d.zip', make_zip({'d.txt': 'D'}))])
+    assert files == [('b.txt', 'Bä'.encode('utf-8')), ('a.txt', b'A'), ('c.txt', b'C'), ('d.txt', b'D')]
+
+
+def test_upload_batch_attaches_all_files_in_one_batch(fake_openai):
+    client, state = fake_openai
+    store = client.vector_stores.create(name='Bulk')
+    result = upload_batch(client, store.id, [(f'f{i}.txt', b'x' * i) for i in range(12)], max_concurrency=4)
+
+    assert result['batch_status'] == 'completed'
+    assert result['file_counts']['completed'] == 12
+    assert [f['status'] for f in result['files']] == ['completed'] * 12
+    assert len(state.batches) == 1
+
+
+def test_wait_for_indexing_holds_slot_only_per_poll():
+    gate = ProviderGate('OpenAI', limit=1, timeout=0.01)
+    states = iter(['in_progress', 'in_progress', 'completed'])
+    in_flight = []
+
+    def retrieve():
+        in_flight.append(gate.stats()['in_flight'])
+        return type('Batch', (), {'status': next(states)})()
+
+    result = wait_for_indexing(type('Batch', (), {'status': 'in_progress'})(), retrieve, gate.slot, interval=0.01)
+    assert result.status == 'completed' and in_flight == [1, 1, 1]
+    # Zwischen den Abfragen ist der einzige Slot frei
+    assert gate.stats()['in_flight'] == 0 and gate.stats()['total_calls'] == 3
+
+
+def test_upload_files_route_reports_per_file_status(fake_openai):
+    import app
+    from test_upload_jobs import wait_for_job
+    client, state = fake_openai
+    app.client = client
+    store = client.vector_stores.create(name='Bulk')
+    web = app.app.test_client()
+
+    response = web.post('/upload-files', data={
+        'vector_store_id': store.id,
+        'files': [(io.BytesIO(b'Preise'), 'preise.txt'), (io.BytesIO(make_zip({'agb.txt': 'AGB'})), 'docs.zip')]
+    }, content_type='multipart/form-data')
+    assert response.status_code == 202
+    assert response.get_json()['file_count'] == 2
+
+    job = wait_for_job(web, response.get_json()['status_url'])
+    assert job['status'] == 'completed'
+    assert [(f['file_name'], f['status']) for f in job['result']['files']] == [
+        ('preise.txt', 'completed'), ('agb.txt', 'completed')
+    ]
+
+
+def test_mcp_tool_lists_per_file_status():
+    from test_mcp import call_tool, run_with_fake_openai
+
+    async def scenario(server, state):
+        store = await call_tool(server, 'create_vector_store', {'name': 'Bulk'})
+        return await call_tool(server, 'upload_files_to_vector_store', {
+            'vector_store_id': store['vector_store_id'],
+            'files': [{'file_name': 'a.txt', 'file_content': 'A'}],
+            'zip_base64': base64.b64encode(make_zip({'b.txt': 'B'})).decode()
+        })
+
+    result = run_with_fake_openai(scenario)
+    assert result['batch_status'] == 'completed'
+    assert [(f['file_name'], f['status']) for f in result['files']] == [('a.txt', 'completed'), ('b.txt', 'completed')]
+
+
+def benchmark(files=100, latency=0.02):
+    """100 kleine Dateien: einzelne Upload-and-Poll-Zyklen vs. paralleler Upload + ein File-Batch"""
+    server, state, base_url = start_fake_openai(latency=latency)
+    client = OpenAI(api_key='test-key', base_url=base_url)
+    payload = [(f'doc_{i}.txt', f'Dokument {i}'.encode()) for i in range(files)]
+
+    store = client.vector_stores.create(name='Einzeln')
+    requests_before = state.requests
+    started = time.perf_counter()
+    for name, content in payload:
+        uploaded = client.files.create(file=(name, content), purpose='assistants')
+        client.vector_stores.files.create_and_poll(uploaded.id, vector_store_id=store.id)
+    single = time.perf_counter() - started
+    single_requests = state.requests - requests_before
+
+    store = client.vector_stores.create(name='Bulk')
+    requests_before = state.requests
+    started = time.perf_counter()
+    upload_batch(client, store.id, payload, max_concurrency=8)
+    bulk = time.perf_counter() - started
+    bulk_requests = state.requests - requests_before
+    server.shutdown()
+
+    print(f"🐢 Einzeln: {files} Dateien in {single:.2f}s ({files / single:.0f} Dateien/s, {single_requests} Requests)")
+    print(f"🚀 Bulk:    {files} Dateien in {bulk:.2f}s ({files / bulk:.0f} Dateien/s, {bulk_requests} Requests)")
+
+
+if __name__ == '__main__':
+    benchmark()
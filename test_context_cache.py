@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests für den Gemini Context Cache: Fake-Caching-API und Fake-Modell zeichnen auf, was gesendet wird
+"""
+
+import os
+import tempfile
+import time
+
+from context_cache import PolicyContextCache, policy_text
+from retrieval import PolicyIndex
+
+
+class FakeCachedContent:
+    def __init__(self, store, **kwargs):
+        self.store = store
+        self.kwargs = kwargs
+        self.deleted = False
+
+    def delete(self):
+        self.deleted = True
+
+
+class FakeCaching:
+    """Ersatz für genai.caching: zeichnet jeden hochgeladenen Kontext auf"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.created = []
+        caching = self
+
+        class CachedContent:
+            @staticmethod
+            def create(**kwargs):
+                if caching.fail:
+                    raise RuntimeError('Cached content is too small')
+                content = FakeCachedContent(caching, **kwargs)
+                caching.created.append(content)
+                return content
+
+        self.CachedContent = CachedContent
+
+
+class FakeModel:
+    """Gemini-Stub, der jeden Prompt samt Cache-Bindung aufzeichnet"""
+
+    def __init__(self, cached_content=None, sent=None):
+        self.cached_content = cached_content
+        self.sent = sent if sent is not None else []
+
+    def generate_content(self, prompt, **kwargs):
+        self.sent.append((self.cached_content, prompt))
+        return type('Response', (), {'text': 'Zahlungen sind nach 30 Tagen fällig.'})()
+
+
+def make_cache(caching, sent, **kwargs):
+    return PolicyContextCache('models/test-001', 'SYSTEM', caching=caching,
+                              model_factory=lambda cached: FakeModel(cached, sent), **kwargs)
+
+
+def test_cache_is_created_once_per_policy_version():
+    caching, sent = FakeCaching(), []
+    cache = make_cache(caching, sent)
+    index = PolicyIndex.from_text('1. ZAHLUNG\nZahlung in 30 Tagen.\n\n2. STORNO\nKostenlos bis 14 Tage vorher.')
+
+    first = cache.model_for(index)
+    assert cache.model_for(index) is first
+    assert len(caching.created) == 1
+    created = caching.created[0].kwargs
+    assert created['system_instruction'] == 'SYSTEM'
+    assert created['contents'] == [policy_text(index)]
+    assert 'Kostenlos bis 14 Tage' in created['contents'][0]
+
+    changed = PolicyIndex.from_text('1. ZAHLUNG\nZahlung in 14 Tagen.')
+    assert cache.model_for(changed) is not first
+    assert len(caching.created) == 2
+    assert caching.created[0].deleted
+    assert cache.stats()['created'] == 2 and cache.stats()['hits'] == 1
+
+
+def test_cache_is_renewed_before_ttl_expires():
+    caching = FakeCaching()
+    cache = make_cache(caching, [], ttl=0.05)
+    index = PolicyIndex.from_text('1. ZAHLUNG\nZahlung in 30 Tagen.')
+    cache.model_for(index)
+    time.sleep(0.05)
+    cache.model_for(index)
+    assert len(caching.created) == 2
+
+
+def test_failed_creation_falls_back_and_retries_later():
+    caching = FakeCaching(fail=True)
+    cache = make_cache(caching, [], retry_interval=0.05)
+    index = PolicyIndex.from_text('1. ZAHLUNG\nZahlung in 30 Tagen.')
+    assert cache.model_for(index) is None
+    caching.fail = False
+    assert cache.model_for(index) is None
+    time.sleep(0.06)
+    assert cache.model_for(index) is not None
+    assert cache.stats()['failures'] == 1 and cache.stats()['fallbacks'] == 2
+
+
+def test_ask_question_sends_only_question_delta_with_cached_context(monkeypatch):
+    import app
+    policies = os.path.join(tempfile.mkdtemp(), 'policies.txt')
+    with open(policies, 'w', encoding='utf-8') as f:
+        f.write('1. ZAHLUNG\nRechnungen sind nach 30 Tagen fällig.\n\n2. STORNO\nKostenlos bis 14 Tage vorher.\n')
+    caching, sent = FakeCaching(), []
+    monkeypatch.setattr(app, 'POLICIES_PATH', policies)
+    monkeypatch.setattr(app, 'policy_context', make_cache(caching, sent))
+    monkeypatch.setattr(app, 'gemini_model', FakeModel(sent=sent))
+    app.answer_cache.clear()
+    client = app.app.test_client()
+
+    for question in ('Wann sind Rechnungen fällig?', 'Kann ich kostenlos stornieren?'):
+        assert client.post('/ask-question', json={'question': question}).get_json()['success'] is True
+    assert len(caching.created) == 1
+    assert [prompt for _, prompt in sent] == ['FRAGE: Wann sind Rechnungen fällig?\n',
+                                              'FRAGE: Kann ich kostenlos stornieren?\n']
+    assert all(cached is caching.created[0] for cached, _ in sent)
+
+    # Richtlinien geändert: neuer Cache, Frage wird weiterhin allein gesendet
+    time.sleep(0.01)
+    with open(policies, 'a', encoding='utf-8') as f:
+        f.write('\n3. SUPPORT\nMontag bis Freitag.\n')
+    client.post('/ask-question', json={'question': 'Wann ist Support erreichbar?'})
+    assert len(caching.created) == 2
+    assert 'Montag bis Freitag' in caching.created[1].kwargs['contents'][0]
+    assert sent[-1] == (caching.created[1], 'FRAGE: Wann ist Support erreichbar?\n')
+    stats = client.get('/cache-stats').get_json()['policy_context']
+    assert stats['created'] == 2 and stats['hits'] == 1
+
+
+def test_ask_question_falls_back_to_inline_policies(monkeypatch):
+    import app
+    sent = []
+    monkeypatch.setattr(app, 'policy_context', make_cache(FakeCaching(fail=True), sent))
+    monkeypatch.setattr(app, 'gemini_model', FakeModel(sent=sent))
+    app.answer_cache.clear()
+
+    response = app.app.test_client().post('/ask-question', json={'question': 'Wann sind Zahlungen fällig?'})
+    assert response.get_json()['success'] is True
+    cached, prompt = sent[-1]
+    assert cached is None
+    assert 'KUNDENRICHTLINIEN' in prompt and 'FRAGE: Wann sind Zahlungen fällig?' in prompt
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests und Benchmark für das JSON-Backend von MCP Server und Flask
+"""
+
+import asyncio
+import datetime
+import json
+import time
+
+import fast_json
+
+
+def test_compact_utf8_roundtrip():
+    payload = {'name': 'Größe', 'ids': [1, 2.5, None, True], 'nested': {'a': 'b'}}
+    encoded = fast_json.dumps(payload)
+    assert encoded == '{"name":"Größe","ids":[1,2.5,null,true],"nested":{"a":"b"}}'
+    assert fast_json.loads(encoded) == payload
+    assert fast_json.loads(encoded.encode('utf-8')) == payload
+    assert fast_json.dumps_bytes(payload) == encoded.encode('utf-8')
+    assert json.loads(fast_json.dumps(payload, indent=True)) == payload
+
+
+def test_edge_cases_fall_back_to_stdlib_behaviour():
+    assert fast_json.loads(fast_json.dumps({1: 'x'})) == {'1': 'x'}
+    assert fast_json.loads(fast_json.dumps(2 ** 70)) == 2 ** 70
+    try:
+        fast_json.loads('{kaputt')
+    except fast_json.JSONDecodeError:
+        pass
+    else:
+        raise AssertionError('JSONDecodeError erwartet')
+
+
+def test_flask_uses_fast_provider_with_flask_defaults():
+    import app
+    with app.app.test_request_context():
+        response = app.jsonify({'z': 1, 'a': 'ä', 'when': datetime.datetime(2024, 1, 2, 3, 4, 5)})
+    assert response.get_data(as_text=True) == '{"z":1,"a":"ä","when":"Tue, 02 Jan 2024 03:04:05 GMT"}\n'
+    assert app.app.json.loads(b'{"x": [1]}') == {'x': [1]}
+
+
+def test_mcp_tool_results_are_compact():
+    from test_mcp import SlowServer
+    request = {'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call',
+               'params': {'name': 'create_vector_store', 'arguments': {'name': 'Kompakt'}}}
+    response = json.loads(asyncio.run(SlowServer(0).handle_request(json.dumps(request))))
+    assert response['result']['content'][0]['text'] == '{"success":true,"name":"Kompakt"}'
+
+
+def vector_store_listing(stores=100):
+    return {
+        'success': True,
+        'vector_stores': [
+            {'id': f'vs_{i:024d}', 'name': f'Wissensbasis {i} – Kundenservice', 'status': 'completed',
+             'created_at': 1700000000 + i, 'file_counts': {'completed': i, 'failed': 0, 'total': i}}
+            for i in range(stores)
+        ],
+        'has_more': True,
+        'next_after': f'vs_{stores - 1:024d}'
+    }
+
+
+def benchmark(rounds=2000):
+    """Große typische Payloads: stdlib (bisheriger Pfad) vs. fast_json"""
+    with open('customer_policies.txt', encoding='utf-8') as f:
+        policies = f.read() * 20
+    listing = vector_store_listing()
+    payloads = {
+        'Vector-Store-Liste (Tool)': listing,
+        'Policy-Dokument (Resource)': {'contents': [{'uri': 'file://customer_policies.txt',
+                                                     'mimeType': 'text/plain', 'text': policies}]},
+    }
+
+    def stdlib_tool_response(result):
+        # Bisher: Ergebnis mit indent=2 in das Textfeld, dann die Hülle nochmal serialisieren
+        return json.dumps({'jsonrpc': '2.0', 'id': 1, 'result': {
+            'content': [{'type': 'text', 'text': json.dumps(result, indent=2)}]}})
+
+    def fast_tool_response(result):
+        return fast_json.dumps({'jsonrpc': '2.0', 'id': 1, 'result': {
+            'content': [{'type': 'text', 'text': fast_json.dumps(result)}]}})
+
+    print(f"Backend: {fast_json.BACKEND}")
+    for label, payload in payloads.items():
+        is_tool = 'Tool' in label
+        old = stdlib_tool_response if is_tool else json.dumps
+        new = fast_tool_response if is_tool else fast_json.dumps
+        results = []
+        for encode in (old, new):
+            started = time.perf_counter()
+            for _ in range(rounds):
+                encoded = encode(payload)
+            results.append(((time.perf_counter() - started) / rounds, len(encoded.encode('utf-8'))))
+        (old_time, old_size), (new_time, new_size) = results
+        print(f"📦 {label}: {old_time * 1e6:.0f} µs / {old_size} B  ->  {new_time * 1e6:.0f} µs / {new_size} B "
+              f"({old_time / new_time:.1f}x)")
+
+    encoded = json.dumps(listing)
+    for label, decode in (('json.loads', json.loads), ('fast_json.loads', fast_json.loads)):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            decode(encoded)
+        print(f"📥 {label:<16} {(time.perf_counter() - started) / rounds * 1e6:.0f} µs")
+
+
+if __name__ == '__main__':
+    benchmark()
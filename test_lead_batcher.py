@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests und Benchmark für das Micro-Batching der Lead-Analyse
+"""
+
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lead_batcher import LeadBatcher, parse_batch_response
+
+
+class FakeBatchModel:
+    """Fake-Gemini mit fester Latenz pro Aufruf, versteht Einzel- und Batch-Prompts"""
+
+    def __init__(self, latency=0.0, broken_batches=False, max_concurrent=64):
+        self.latency = latency
+        self.broken_batches = broken_batches
+        self.prompts = []
+        self._lock = threading.Lock()
+        # Simuliert das Rate-Limit: nur max_concurrent Aufrufe gleichzeitig
+        self._quota = threading.Semaphore(max_concurrent)
+
+    def __call__(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+        with self._quota:
+            time.sleep(self.latency)
+        if 'LEADS:' not in prompt:
+            return f"Analyse für {re.search(r'NAME: (.*)', prompt).group(1).strip()}"
+        if self.broken_batches:
+            return 'Hier sind die Analysen: leider kein JSON'
+        leads = json.loads(prompt.split('LEADS:', 1)[1].split('\n\nAntworte', 1)[0])
+        return '```json\n' + json.dumps([
+            {'index': lead['index'], 'analysis': f"Analyse für {lead['name']}"} for lead in reversed(leads)
+        ]) + '\n```'
+
+
+def run_concurrently(batcher, count):
+    with ThreadPoolExecutor(count) as pool:
+        return list(pool.map(lambda i: batcher.analyze({'name': f'Lead {i}', 'message': 'Hallo'}), range(count)))
+
+
+def test_concurrent_leads_share_one_model_call():
+    model = FakeBatchModel(latency=0.01)
+    batcher = LeadBatcher(model, window=0.05, max_batch=8)
+    results = run_concurrently(batcher, 8)
+    assert results == [f'Analyse für Lead {i}' for i in range(8)]
+    assert len(model.prompts) == 1
+
+
+def test_window_flushes_partial_batch():
+    model = FakeBatchModel()
+    batcher = LeadBatcher(model, window=0.02, max_batch=100)
+    results = run_concurrently(batcher, 5)
+    assert results == [f'Analyse für Lead {i}' for i in range(5)]
+    assert batcher.stats()['batches'] <= 2
+
+
+def test_single_lead_uses_individual_prompt():
+    model = FakeBatchModel()
+    batcher = LeadBatcher(model, window=0.01)
+    assert batcher.analyze({'name': 'Solo', 'message': 'Hi'}) == 'Analyse für Solo'
+    assert 'LEADS:' not in model.prompts[0]
+
+
+def test_unparseable_batch_falls_back_to_individual_calls():
+    model = FakeBatchModel(broken_batches=True)
+    batcher = LeadBatcher(model, window=0.05, max_batch=4)
+    results = run_concurrently(batcher, 4)
+    assert results == [f'Analyse für Lead {i}' for i in range(4)]
+    assert batcher.stats()['fallbacks'] == 4
+    assert len(model.prompts) == 5
+
+
+def test_model_errors_propagate_to_all_waiting_leads():
+    def failing(prompt):
+        raise RuntimeError('429 quota')
+
+    batcher = LeadBatcher(failing, window=0.01, max_batch=2)
+    errors = []
+
+    def analyze(i):
+        try:
+            batcher.analyze({'name': str(i)})
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    with ThreadPoolExecutor(2) as pool:
+        list(pool.map(analyze, range(2)))
+    assert errors == ['429 quota', '429 quota']
+
+
+def test_parse_batch_response_requires_every_index():
+    assert parse_batch_response('[{"index": 0, "analysis": "a"}]', 2) is None
+    assert parse_batch_response('{"index": 0}', 1) is None
+    assert parse_batch_response('[{"index": 1, "analysis": "b"}, {"index": 0, "analysis": "a"}]', 2) == ['a', 'b']
+
+
+def benchmark(leads=64, latency=0.3, concurrency=16, quota=2):
+    """Fake-Modell mit fester Latenz pro Aufruf und Rate-Limit: Einzelaufrufe vs. Micro-Batching"""
+    for label, max_batch in (('einzeln', 1), ('batch (8)', 8), ('batch (16)', 16)):
+        model = FakeBatchModel(latency=latency, max_concurrent=quota)
+        batcher = LeadBatcher(model, window=0.05, max_batch=max_batch)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(lambda i: batcher.analyze({'name': f'Lead {i}', 'message': 'Angebot?'}), range(leads)))
+        elapsed = time.perf_counter() - started
+        print(f"⚡ {label:<11} {len(model.prompts):>3} Modell-Aufrufe für {leads} Leads | "
+              f"{elapsed:.2f}s gesamt | {leads / elapsed:.1f} Leads/s")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Tests und Lasttest für die asynchrone Lead-Queue
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lead_queue import LeadQueue
+
+
+class SleepingModel:
+    """Gemini-Stub mit fester Antwortzeit"""
+
+    def __init__(self, latency=0.2):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return type('Response', (), {'text': 'Heißer Lead, schnell antworten.'})()
+
+
+def wait_for(queue, job_id, status='done', timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'Job {job_id} nicht im Status {status}: {queue.get(job_id)}')
+
+
+def test_enqueue_returns_immediately_and_worker_processes(tmp_path):
+    queue = LeadQueue(str(tmp_path / 'q.db'), {'lead': lambda p: (time.sleep(0.2), {'name': p['name']})[1]}, workers=2)
+    started = time.perf_counter()
+    job_id = queue.enqueue('lead', {'name': 'Anna'})
+    assert time.perf_counter() - started < 0.1
+    job = wait_for(queue, job_id)
+    assert job['result'] == {'name': 'Anna'}
+    assert job['attempts'] == 1
+    queue.stop()
+
+
+def test_failed_jobs_are_retried_then_marked_failed(tmp_path):
+    def broken(payload):
+        raise RuntimeError('Gemini nicht erreichbar')
+
+    queue = LeadQueue(str(tmp_path / 'q.db'), {'lead': broken}, workers=1, max_attempts=2, poll_interval=0.01)
+    job_id = queue.enqueue('lead', {})
+    job = wait_for(queue, job_id, status='failed')
+    assert job['attempts'] == 2
+    assert 'Gemini' in job['error']
+    queue.stop()
+
+
+def test_expired_leases_are_reclaimed_without_new_enqueue(tmp_path):
+    path = str(tmp_path / 'q.db')
+    queue = LeadQueue(path, {'lead': lambda p: p})
+    crashed, running = queue.enqueue('lead', {'name': 'Ben'}), queue.enqueue('lead', {'name': 'Cem'})
+    queue.stop()
+    # Ben: Besitzer abgestürzt, Lease abgelaufen; Cem: anderer Worker lebt und verlängert seinen Lease
+    queue._connection().execute("UPDATE lead_jobs SET status = 'processing', lease_owner = 'tot', lease_until = ? "
+                                'WHERE id = ?', (time.time() - 1, crashed))
+    queue._connection().execute("UPDATE lead_jobs SET status = 'processing', lease_owner = 'lebt', lease_until = ? "
+                                'WHERE id = ?', (time.time() + 60, running))
+
+    restarted = LeadQueue(path, {'lead': lambda p: {'ok': True}}, poll_interval=0.01)
+    assert wait_for(restarted, crashed)['result'] == {'ok': True}
+    time.sleep(0.05)
+    assert restarted.get(running)['status'] == 'processing'
+    restarted.stop()
+
+
+def test_heartbeat_keeps_long_jobs_and_stale_owner_cannot_finish(tmp_path):
+    path = str(tmp_path / 'q.db')
+    release = threading.Event()
+    calls = []
+
+    def slow(payload):
+        calls.append(payload)
+        release.wait(5)
+        return {'ok': True}
+
+    first = LeadQueue(path, {'lead': slow}, workers=1, poll_interval=0.01, lease_seconds=0.15)
+    job_id = first.enqueue('lead', {})
+    # Zweiter Prozess startet, während der Job länger als lease_seconds läuft
+    second = LeadQueue(path, {'lead': slow}, workers=1, poll_interval=0.01, lease_seconds=0.15)
+    time.sleep(0.5)
+    assert len(calls) == 1 and second.get(job_id)['status'] == 'processing'
+    release.set()
+    assert wait_for(second, job_id)['attempts'] == 1
+
+    # Lease verloren (z.B. Prozess hing): das verspätete Ergebnis des alten Besitzers wird verworfen
+    first._finish(job_id, 'failed', error='zu spät')
+    assert second.get(job_id)['status'] == 'done'
+    first.stop()
+    second.stop()
+
+
+def test_webhook_returns_202_and_status_endpoint():
+    import app
+    app.gemini_model = SleepingModel(latency=0)
+    client = app.app.test_client()
+
+    response = client.post('/process-lead-n8n', json={'name': 'Clara', 'message': 'Brauche Automatisierung'})
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    job = wait_for(app.lead_queue, job_id)
+    status = client.get(f'/leads/{job_id}').get_json()
+    assert status['status'] == 'done'
+    assert status['result']['ai_analysis'] == job['result']['ai_analysis']
+    assert client.get('/leads/unbekannt').status_code == 404
+
+
+def test_enqueue_once_shares_running_and_recent_jobs(tmp_path):
+    release = threading.Event()
+    queue = LeadQueue(str(tmp_path / 'q.db'), {'lead': lambda p: (release.wait(5), {'name': p['name']})[1]},
+                      workers=1, poll_interval=0.01)
+    job_id, duplicate = queue.enqueue_once('lead', {'name': 'Anna'}, 'k1')
+    assert duplicate is False
+    assert queue.enqueue_once('lead', {'name': 'Anna'}, 'k1') == (job_id, True)
+    release.set()
+    wait_for(queue, job_id)
+    assert queue.enqueue_once('lead', {'name': 'Anna'}, 'k1', ttl=60) == (job_id, True)
+
+    # Nach Ablauf der TTL entsteht ein neuer Job
+    time.sleep(0.02)
+    new_id, duplicate = queue.enqueue_once('lead', {'name': 'Anna'}, 'k1', ttl=0.01)
+    assert new_id != job_id and duplicate is False
+    wait_for(queue, new_id)
+    queue.stop()
+
+
+def test_enqueue_once_retries_failed_jobs_and_migrates_old_databases(tmp_path):
+    path = str(tmp_path / 'q.db')
+    import sqlite3
+    old = sqlite3.connect(path)
+    old.executescript("""CREATE TABLE lead_jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL,
+        status TEXT NOT NULL, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL, updated_at REAL NOT NULL)""")
+    old.close()
+
+    def broken(payload):
+        raise RuntimeError('Gemini nicht erreichbar')
+
+    queue = LeadQueue(path, {'lead': broken}, workers=1, max_attempts=1, poll_interval=0.01)
+    job_id, _ = queue.enqueue_once('lead', {}, 'k2')
+    wait_for(queue, job_id, status='failed')
+    retry_id, duplicate = queue.enqueue_once('lead', {}, 'k2')
+    assert retry_id != job_id and duplicate is False
+    queue.stop()
+
+
+def test_concurrent_duplicate_webhooks_invoke_model_once():
+    import app
+    model = SleepingModel(latency=0.3)
+    app.gemini_model = model
+    client = app.app.test_client()
+    payload = {'name': 'Dora', 'email': 'Dora@Example.com', 'message': 'Retry-Test mit n8n'}
+
+    def post(i, headers=None):
+        # Groß-/Kleinschreibung der E-Mail ändert den abgeleiteten Key nicht
+        body = dict(payload, email=payload['email'].lower()) if i % 2 else payload
+        return client.post('/process-lead-n8n', json=body, headers=headers or {})
+
+    for calls, headers in ((1, None), (2, {'Idempotency-Key': 'n8n-exec-42'})):
+        with ThreadPoolExecutor(8) as pool:
+            responses = list(pool.map(lambda i: post(i, headers), range(8)))
+        assert all(r.status_code == 202 for r in responses)
+        job_ids = {r.get_json()['job_id'] for r in responses}
+        assert len(job_ids) == 1
+        assert sum(bool(r.get_json().get('duplicate')) for r in responses) == 7
+        wait_for(app.lead_queue, job_ids.pop())
+        assert model.calls == calls
+
+    # Retry nach Abschluss: Ergebnis direkt in der Antwort, kein weiterer Modellaufruf
+    again = client.post('/process-lead-n8n', json=payload).get_json()
+    assert again['duplicate'] is True and again['status'] == 'done'
+    assert again['result']['ai_analysis'] == 'Heißer Lead, schnell antworten.'
+    assert model.calls == 2
+
+
+def test_different_leads_from_one_email_without_message_are_not_merged():
+    import app
+    app.gemini_model = SleepingModel(latency=0)
+    client = app.app.test_client()
+
+    first = client.post('/process-lead-n8n', json={'name': 'A', 'email': 'x@y.de', 'budget': '1000'}).get_json()
+    second = client.post('/process-lead-n8n', json={'name': 'B', 'email': 'x@y.de', 'budget': '9000'}).get_json()
+    assert second['job_id'] != first['job_id'] and 'duplicate' not in second
+    retry = client.post('/process-lead-n8n', json={'name': 'B ', 'email': 'X@y.de', 'budget': '9000'}).get_json()
+    assert retry['job_id'] == second['job_id'] and retry['duplicate'] is True
+    wait_for(app.lead_queue, first['job_id'])
+    wait_for(app.lead_queue, second['job_id'])
+
+
+def load_test(leads=200, model_latency=0.2, concurrency=32):
+    """Webhook-Durchsatz mit schlafendem Modell: Queue vs. synchrone Verarbeitung"""
+    import app
+    app.gemini_model = SleepingModel(model_latency)
+    client = app.app.test_client()
+    payload = {'name': 'Lasttest', 'email': 'last@test.de', 'message': 'Bitte Angebot'}
+
+    def post(i):
+        # Eindeutige Nachricht pro Lead, sonst greift die Duplikat-Erkennung
+        return client.post('/process-lead-n8n', json=dict(payload, message=f"{payload['message']} #{i}"))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        responses = list(pool.map(post, range(leads)))
+    accept_time = time.perf_counter() - started
+    assert all(r.status_code == 202 for r in responses)
+    print(f"📥 Queue: {leads} Webhooks in {accept_time:.2f}s angenommen "
+          f"({leads / accept_time:.0f} req/s, Modell-Latenz {model_latency * 1000:.0f} ms)")
+
+    while app.lead_queue.depth():
+        time.sleep(0.05)
+    drain_time = time.perf_counter() - started
+    print(f"⚙️  {app.LEAD_QUEUE_WORKERS} Hintergrund-Worker: alle Leads nach {drain_time:.2f}s analysiert")
+
+    # Bisheriges Verhalten: jeder Webhook blockiert einen Sync-Worker für die volle Modell-Latenz
+    workers = 4
+    sync_time = leads * model_latency / workers
+    print(f"🐢 Synchron ({workers} gunicorn-Worker): ~{sync_time:.2f}s Annahmezeit "
+          f"({leads / sync_time:.0f} req/s)")
+
+
+if __name__ == '__main__':
+    load_test()
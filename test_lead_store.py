@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Tests und Benchmark für den Lead-Store (Write-Behind, Filter, Cursor-Paginierung)
+Benchmark: python test_lead_store.py [anzahl]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pytest
+
+from lead_store import INSERT, COLUMNS, LeadStore
+
+SOURCES = ('website', 'n8n', 'make', 'linkedin', 'empfehlung')
+STATUSES = ('processed', 'processed_by_n8n', 'failed')
+
+
+def synthetic_lead(i):
+    return {
+        'name': f'Lead {i}',
+        'email': f'lead{i % 50000}@example.com',
+        'source': SOURCES[i % len(SOURCES)],
+        'budget': str(1000 + i % 9000),
+        'message': 'Wir brauchen eine Automatisierung für unser CRM.',
+        'status': STATUSES[i % len(STATUSES)],
+        'workflow_id': 'n8n-lead-processing',
+        'timestamp': 1700000000 + i
+    }
+
+
+def test_add_buffers_and_background_thread_writes(tmp_path):
+    store = LeadStore(str(tmp_path / 'leads.db'), flush_interval=0.05, batch_size=1000)
+    for i in range(10):
+        store.add(synthetic_lead(i))
+    assert store.pending() == 10
+    deadline = time.time() + 2
+    while store.written < 10 and time.time() < deadline:
+        time.sleep(0.01)
+    assert store.written == 10 and store.pending() == 0
+    assert store.batches == 1
+    store.stop()
+
+
+def test_query_filters_and_paginates_without_gaps(tmp_path):
+    store = LeadStore(str(tmp_path / 'leads.db'), flush_interval=60)
+    for i in range(100):
+        lead = synthetic_lead(i)
+        # Gleiche Zeitstempel: Cursor muss über die id weiterblättern
+        lead['timestamp'] = 1700000000 + i // 10
+        store.add(lead)
+
+    seen, cursor = [], None
+    while True:
+        page = store.query(limit=7, cursor=cursor, source='n8n')
+        seen.extend(page['leads'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert len(seen) == 20 and len({lead['id'] for lead in seen}) == 20
+    assert all(lead['source'] == 'n8n' for lead in seen)
+    assert [(l['timestamp'], l['id']) for l in seen] == sorted(((l['timestamp'], l['id']) for l in seen), reverse=True)
+
+    recent = store.query(since=1700000008, status='processed')['leads']
+    assert recent and all(lead['timestamp'] >= 1700000008 and lead['status'] == 'processed' for lead in recent)
+    assert store.query(email='lead3@example.com')['leads'][0]['name'] == 'Lead 3'
+    assert store.aggregate('source') == {source: 20 for source in SOURCES}
+
+    with pytest.raises(ValueError):
+        store.query(cursor='kaputt')
+    with pytest.raises(ValueError):
+        store.aggregate('email')
+    store.stop()
+
+
+def test_filtered_queries_use_indexes(tmp_path):
+    store = LeadStore(str(tmp_path / 'leads.db'))
+    conn = sqlite3.connect(store.path)
+    for column in ('email', 'source', 'status'):
+        plan = ' '.join(row[-1] for row in conn.execute(
+            f'EXPLAIN QUERY PLAN SELECT * FROM leads WHERE {column} = ? ORDER BY timestamp DESC, id DESC LIMIT 50',
+            ('x',)))
+        assert f'idx_leads_{column}' in plan and 'TEMP B-TREE' not in plan
+
+
+def test_processed_leads_are_queryable_via_api():
+    import app
+    app.lead_store.add({'name': 'Anna', 'email': 'anna@example.com', 'source': 'n8n', 'status': 'processed_by_n8n'})
+    client = app.app.test_client()
+
+    data = client.get('/leads?email=anna@example.com').get_json()
+    assert data['success'] is True and data['leads'][0]['name'] == 'Anna'
+    stats = client.get('/leads/stats?group_by=status&source=n8n').get_json()
+    assert stats['counts']['processed_by_n8n'] >= 1
+    assert client.get('/leads?cursor=kaputt').status_code == 400
+    assert client.get('/leads/stats?group_by=message').status_code == 400
+    assert client.get('/leads/unbekannt').status_code == 404
+
+
+def benchmark(count=1_000_000):
+    path = os.path.join(tempfile.mkdtemp(), 'leads.db')
+    store = LeadStore(path, flush_interval=0.2, batch_size=5000)
+
+    sample = 2000
+    conn = sqlite3.connect(os.path.join(os.path.dirname(path), 'einzeln.db'), isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE leads (id INTEGER PRIMARY KEY, %s)' % ', '.join(COLUMNS))
+    started = time.perf_counter()
+    for i in range(sample):
+        lead = synthetic_lead(i)
+        conn.execute(INSERT, tuple(lead.get(column) for column in COLUMNS))
+    single = (time.perf_counter() - started) / sample
+    print(f"🐢 Commit pro Lead (synchronous=FULL): {single * 1e6:.0f} µs/Lead")
+
+    started = time.perf_counter()
+    for i in range(count):
+        store.add(synthetic_lead(i))
+    add_time = time.perf_counter() - started
+    store.stop()
+    total = time.perf_counter() - started
+    print(f"⚡ add() Write-Behind: {add_time / count * 1e6:.1f} µs/Lead im Request-Pfad, "
+          f"{count} Leads gespeichert in {total:.1f}s ({count / total:,.0f}/s, {store.batches} Batches)")
+
+    queries = {
+        'neueste 50': {},
+        'email': {'email': 'lead4242@example.com'},
+        'source': {'source': 'linkedin'},
+        'status + Zeitraum': {'status': 'failed', 'since': 1700000000 + count // 2},
+    }
+    for label, filters in queries.items():
+        rounds = 200
+        started = time.perf_counter()
+        for _ in range(rounds):
+            page = store.query(limit=50, **filters)
+        first = (time.perf_counter() - started) / rounds
+        started = time.perf_counter()
+        cursor = page['next_cursor']
+        pages = 0
+        while cursor and pages < 100:
+            cursor = store.query(limit=50, cursor=cursor, **filters)['next_cursor']
+            pages += 1
+        deep = (time.perf_counter() - started) / max(pages, 1)
+        print(f"🔎 {label:<18} erste Seite {first * 1000:.2f} ms, Folgeseiten {deep * 1000:.2f} ms")
+
+    started = time.perf_counter()
+    counts = store.aggregate('source')
+    print(f"📊 aggregate(source): {(time.perf_counter() - started) * 1000:.0f} ms {counts}")
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -6,23 +6,34 @@ Testet die verschiedenen MCP Funktionen
 
 import asyncio
 import json
+import logging
+import os
 import subprocess
 import sys
 import time
 
+from openai import AsyncOpenAI
+
+from fake_openai_server import start_fake_openai
+from mcp_server import MCPServer, serve_stdio
+
 class MCPTester:
     def __init__(self):
         self.server_process = None
+        self.fake_openai = None
     
     async def start_server(self):
-        """Starte den MCP Server"""
+        """Starte den MCP Server (gegen den lokalen OpenAI-Fake)"""
         print("🚀 Starte MCP Server...")
+        self.fake_openai, _, base_url = start_fake_openai()
+        env = dict(os.environ, OPENAI_BASE_URL=base_url, OPENAI_API_KEY="test-key")
         self.server_process = subprocess.Popen(
             [sys.executable, "mcp_server.py"],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True
+            text=True,
+            env=env
         )
         await asyncio.sleep(1)  # Warte kurz bis Server startet
         print("✅ MCP Server gestartet")
@@ -139,10 +150,298 @@ class MCPTester:
             if self.server_process:
                 self.server_process.terminate()
                 print("🛑 MCP Server gestoppt")
+            if self.fake_openai:
+                self.fake_openai.shutdown()
+
+
+async def call_tool(server: MCPServer, name: str, arguments: dict) -> dict:
+    """Führt tools/call aus und gibt das dekodierte Tool-Ergebnis zurück"""
+    request = {"jsonrpc": "2.0", "id": "1", "method": "tools/call",
+               "params": {"name": name, "arguments": arguments}}
+    response = json.loads(await server.handle_request(json.dumps(request)))
+    assert "error" not in response, response
+    return json.loads(response["result"]["content"][0]["text"])
+
+
+def run_with_fake_openai(scenario, latency: float = 0.0):
+    """Startet den Fake, führt scenario(server, state) aus und schließt den Client wieder"""
+    fake, state, base_url = start_fake_openai(latency=latency)
+
+    async def run():
+        server = MCPServer(AsyncOpenAI(api_key="test-key", base_url=base_url, max_retries=0))
+        try:
+            return await scenario(server, state)
+        finally:
+            await server.aclose()
+
+    try:
+        return asyncio.run(run())
+    finally:
+        fake.shutdown()
+
+
+def test_tools_operate_on_real_vector_stores():
+    async def scenario(server, state):
+        store = await call_tool(server, "create_vector_store", {"name": "Support"})
+        assert store["vector_store_id"] in state.vector_stores
+
+        uploaded = await call_tool(server, "upload_file_to_vector_store", {
+            "vector_store_id": store["vector_store_id"], "file_content": "Preise", "file_name": "preise.txt"
+        })
+        assert uploaded["status"] == "completed"
+        assert state.files[uploaded["file_id"]]["filename"] == "preise.txt"
+
+        listed = await call_tool(server, "list_vector_stores", {})
+        assert [s["name"] for s in listed["vector_stores"]] == ["Support"]
+
+    run_with_fake_openai(scenario)
+
+
+def test_list_vector_stores_paginates():
+    async def scenario(server, state):
+        for i in range(3):
+            await call_tool(server, "create_vector_store", {"name": f"Store {i}"})
+        first = await call_tool(server, "list_vector_stores", {"limit": 2})
+        assert len(first["vector_stores"]) == 2 and first["has_more"]
+        rest = await call_tool(server, "list_vector_stores", {"limit": 2, "after": first["next_after"]})
+        assert len(rest["vector_stores"]) == 1 and rest["next_after"] is None
+
+    run_with_fake_openai(scenario)
+
+
+def test_session_reuses_pooled_connections():
+    async def scenario(server, state):
+        for i in range(20):
+            await call_tool(server, "create_vector_store", {"name": f"Store {i}"})
+        return state
+
+    state = run_with_fake_openai(scenario)
+    assert state.requests == 20
+    assert len(state.connections) == 1
+
+
+def test_upstream_errors_become_tool_errors():
+    async def scenario(server, state):
+        request = {"jsonrpc": "2.0", "id": "1", "method": "tools/call", "params": {
+            "name": "upload_file_to_vector_store",
+            "arguments": {"vector_store_id": "vs_fehlt", "file_content": "x"}
+        }}
+        return json.loads(await server.handle_request(json.dumps(request)))
+
+    response = run_with_fake_openai(scenario)
+    assert response["error"]["code"] == -32603
+
+
+class SlowServer(MCPServer):
+    """create_vector_store simuliert einen langsamen Upstream-Aufruf"""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    async def _create_vector_store(self, arguments: dict) -> dict:
+        await asyncio.sleep(self.delay)
+        return {"success": True, "name": arguments.get("name")}
+
+
+async def run_stdio(server: MCPServer, messages: list, max_concurrency: int = 16, gap: float = 0.0) -> list:
+    """Speist messages als Zeilen in serve_stdio und sammelt die Antworten in Ausgabereihenfolge"""
+    reader = asyncio.StreamReader()
+    responses = []
+    serving = asyncio.create_task(serve_stdio(server, reader, lambda line: responses.append(json.loads(line)),
+                                              max_concurrency=max_concurrency))
+    for message in messages:
+        reader.feed_data((json.dumps(message) + "\n").encode())
+        await asyncio.sleep(gap)
+    reader.feed_eof()
+    await serving
+    return responses
+
+
+def slow_call(request_id: str) -> dict:
+    return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+            "params": {"name": "create_vector_store", "arguments": {"name": request_id}}}
+
+
+def test_fast_requests_overtake_slow_tool_calls():
+    messages = [slow_call("slow"), {"jsonrpc": "2.0", "id": "list", "method": "tools/list"}]
+    responses = asyncio.run(run_stdio(SlowServer(0.2), messages))
+    assert [r["id"] for r in responses] == ["list", "slow"]
+
+
+def test_cancelled_request_gets_no_response():
+    messages = [
+        slow_call("a"), slow_call("b"),
+        {"jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": "a", "reason": "timeout"}}
+    ]
+    responses = asyncio.run(run_stdio(SlowServer(0.1), messages, gap=0.01))
+    assert [r["id"] for r in responses] == ["b"]
+
+
+def test_object_ids_do_not_stop_the_stdio_loop():
+    messages = [
+        {"jsonrpc": "2.0", "id": {"a": 1}, "method": "tools/list"},
+        {"jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": [1]}},
+        {"jsonrpc": "2.0", "id": "ok", "method": "tools/list"}
+    ]
+    responses = asyncio.run(run_stdio(SlowServer(0), messages))
+    assert "ok" in [r.get("id") for r in responses]
+    assert len(responses) == 2
+
+
+def test_concurrency_limit_and_parse_errors():
+    async def scenario():
+        started = time.perf_counter()
+        responses = await run_stdio(SlowServer(0.1), [slow_call(str(i)) for i in range(4)], max_concurrency=2)
+        return time.perf_counter() - started, responses
+
+    elapsed, responses = asyncio.run(scenario())
+    assert sorted(r["id"] for r in responses) == ["0", "1", "2", "3"]
+    assert 0.2 <= elapsed < 0.35
+
+    async def garbage():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"{kein json\n")
+        reader.feed_eof()
+        responses = []
+        await serve_stdio(MCPServer(), reader, lambda line: responses.append(json.loads(line)))
+        return responses
+
+    assert asyncio.run(garbage())[0]["error"]["code"] == -32700
+
+
+def test_tools_list_comes_from_registry_and_arguments_are_validated():
+    server = MCPServer()
+    tools = json.loads(asyncio.run(server.handle_request('{"jsonrpc": "2.0", "id": 1, "method": "tools/list"}')))
+    assert [t["name"] for t in tools["result"]["tools"]] == [
+        "create_vector_store", "upload_file_to_vector_store", "upload_files_to_vector_store", "list_vector_stores"
+    ]
+
+    invalid = {"jsonrpc": "2.0", "id": 2, "method": "tools/call",
+               "params": {"name": "list_vector_stores", "arguments": {"limit": "viele"}}}
+    response = json.loads(asyncio.run(server.handle_request(json.dumps(invalid))))
+    assert response["error"]["code"] == -32602
+    assert "$.limit: erwartet integer" in response["error"]["message"]
+
+    unknown = {"jsonrpc": "2.0", "id": 3, "method": "tools/call", "params": {"name": "gibt_es_nicht"}}
+    assert json.loads(asyncio.run(server.handle_request(json.dumps(unknown))))["error"]["code"] == -32602
+
+
+def test_batch_runs_calls_concurrently_and_skips_notifications():
+    batch = [
+        {"jsonrpc": "2.0", "id": "tools", "method": "tools/list"},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": "resources", "method": "resources/list"},
+        slow_call("a"), slow_call("b"), slow_call("c")
+    ]
+
+    async def scenario():
+        started = time.perf_counter()
+        response = await SlowServer(0.1).handle_request(json.dumps(batch))
+        return time.perf_counter() - started, json.loads(response)
+
+    elapsed, responses = asyncio.run(scenario())
+    assert [r["id"] for r in responses] == ["tools", "resources", "a", "b", "c"]
+    assert elapsed < 0.2
+
+
+def test_batch_edge_cases():
+    server = MCPServer()
+    assert json.loads(asyncio.run(server.handle_request("[]")))["error"]["code"] == -32600
+    assert asyncio.run(server.handle_request('[{"jsonrpc": "2.0", "method": "notifications/initialized"}]')) is None
+    assert asyncio.run(server.handle_request('{"jsonrpc": "2.0", "method": "notifications/initialized"}')) is None
+    responses = json.loads(asyncio.run(server.handle_request('[1, [], {"jsonrpc": "2.0", "id": 7, "method": "tools/list"}]')))
+    assert [r.get("error", {}).get("code") for r in responses] == [-32600, -32600, None]
+    assert responses[2]["id"] == 7
+
+
+def test_batch_is_one_line_on_stdio():
+    batch = [{"jsonrpc": "2.0", "id": str(i), "method": "tools/list"} for i in range(3)]
+    responses = asyncio.run(run_stdio(MCPServer(), [batch]))
+    assert len(responses) == 1 and [r["id"] for r in responses[0]] == ["0", "1", "2"]
+
+
+def benchmark_pipelining(slow=10, fast=100, delay=0.2):
+    """Gemischte Last: sequenzielle Bearbeitung (Limit 1) vs. parallele Tasks"""
+    messages = []
+    for i in range(slow):
+        messages.append(slow_call(f"slow-{i}"))
+        messages.extend({"jsonrpc": "2.0", "id": f"fast-{i}-{j}", "method": "tools/list"} for j in range(fast // slow))
+
+    for label, limit in (("🐢 Sequenziell", 1), ("🚀 Parallel   ", 16)):
+        async def scenario():
+            started = time.perf_counter()
+            finished = {}
+            reader = asyncio.StreamReader()
+            serving = asyncio.create_task(serve_stdio(
+                SlowServer(delay), reader,
+                lambda line: finished.setdefault(json.loads(line)["id"], time.perf_counter() - started),
+                max_concurrency=limit
+            ))
+            for message in messages:
+                reader.feed_data((json.dumps(message) + "\n").encode())
+            reader.feed_eof()
+            await serving
+            return time.perf_counter() - started, finished
+
+        total, finished = asyncio.run(scenario())
+        fast_latency = sorted(v for k, v in finished.items() if k.startswith("fast"))
+        print(f"{label}: {len(messages)} Requests in {total:.2f}s ({len(messages) / total:.0f} req/s), "
+              f"tools/list p50 {fast_latency[len(fast_latency) // 2] * 1000:.0f} ms")
+
+
+def benchmark_dispatch(requests=20000):
+    """Requests/s durch handle_request ohne I/O (Dispatch, Validierung, Serialisierung)"""
+    server = SlowServer(0)
+    cases = {
+        "tools/list": {"jsonrpc": "2.0", "id": "1", "method": "tools/list"},
+        "resources/list": {"jsonrpc": "2.0", "id": "1", "method": "resources/list"},
+        "tools/call": slow_call("1")
+    }
+
+    async def run(line):
+        started = time.perf_counter()
+        for _ in range(requests):
+            await server.handle_request(line)
+        return requests / (time.perf_counter() - started)
+
+    for label, request in cases.items():
+        rate = asyncio.run(run(json.dumps(request)))
+        print(f"⚙️  {label:<15} {rate:>8.0f} req/s")
+
+
+def benchmark(calls=100, latency=0.005):
+    """Tool-Aufrufe pro Session: ein gepoolter Client vs. neuer Client pro Aufruf"""
+    async def pooled(server, state):
+        started = time.perf_counter()
+        for i in range(calls):
+            await call_tool(server, "create_vector_store", {"name": f"Store {i}"})
+        return time.perf_counter() - started, len(state.connections)
+
+    async def fresh(server, state):
+        base_url = str(server.openai.base_url)
+        started = time.perf_counter()
+        for i in range(calls):
+            per_call = MCPServer(AsyncOpenAI(api_key="test-key", base_url=base_url, max_retries=0))
+            await call_tool(per_call, "create_vector_store", {"name": f"Store {i}"})
+            await per_call.aclose()
+        return time.perf_counter() - started, len(state.connections)
+
+    pooled_time, pooled_connections = run_with_fake_openai(pooled, latency)
+    fresh_time, fresh_connections = run_with_fake_openai(fresh, latency)
+    print(f"🔁 Gepoolt:     {calls} Aufrufe in {pooled_time:.2f}s, {pooled_connections} Verbindung(en)")
+    print(f"🐢 Pro Aufruf:  {calls} Aufrufe in {fresh_time:.2f}s, {fresh_connections} Verbindung(en)")
+
 
 async def main():
     tester = MCPTester()
     await tester.run_all_tests()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if "--benchmark" in sys.argv:
+        logging.disable(logging.INFO)
+        benchmark()
+        benchmark_pipelining()
+        benchmark_dispatch()
+    else:
+        asyncio.run(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Tests und Lasttest für den MCP HTTP Transport
+Lasttest: python test_mcp_http.py [sessions]
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import time
+
+from mcp_http import MCPHttpTransport
+from mcp_server import MCPServer
+from resource_provider import ResourceProvider
+from test_mcp import SlowServer
+
+
+class HttpClient:
+    """Minimaler HTTP/1.1 Keep-Alive Client für eine MCP-Session"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.session_id = None
+        self.reader = self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        return self
+
+    async def request(self, method: str, body=None, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        lines = [f'{method} /mcp HTTP/1.1', 'Host: 127.0.0.1', f'Content-Length: {len(payload)}',
+                 'Content-Type: application/json', 'Accept: application/json, text/event-stream']
+        if self.session_id:
+            lines.append(f'Mcp-Session-Id: {self.session_id}')
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + payload)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode().partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        length = int(response_headers.get('content-length', 0))
+        data = json.loads(await self.reader.readexactly(length)) if length else None
+        return status, response_headers, data
+
+    async def initialize(self):
+        status, headers, data = await self.request('POST', {
+            'jsonrpc': '2.0', 'id': 0, 'method': 'initialize',
+            'params': {'protocolVersion': '2024-11-05', 'capabilities': {}, 'clientInfo': {'name': 'test'}}
+        })
+        self.session_id = headers['mcp-session-id']
+        return data
+
+    async def call(self, method: str, params=None, request_id=1):
+        message = {'jsonrpc': '2.0', 'id': request_id, 'method': method}
+        if params is not None:
+            message['params'] = params
+        return (await self.request('POST', message))[2]
+
+    def close(self):
+        self.writer.close()
+
+
+def run_transport(scenario, server=None, poll_interval=0.0):
+    async def run():
+        transport = MCPHttpTransport(server or MCPServer())
+        http_server = await transport.start(port=0, poll_interval=poll_interval)
+        try:
+            return await scenario(transport, http_server.sockets[0].getsockname()[1])
+        finally:
+            transport.close()
+
+    return asyncio.run(run())
+
+
+def test_sessions_are_independent():
+    async def scenario(transport, port):
+        first, second = await HttpClient(port).connect(), await HttpClient(port).connect()
+        await first.initialize()
+        assert first.session_id and second.session_id is None
+        tools = await first.call('tools/list')
+        assert len(tools['result']['tools']) == 4
+
+        await second.initialize()
+        assert second.session_id != first.session_id
+        sessions = transport.server.sessions
+        assert sessions[first.session_id].initialized and sessions[second.session_id].initialized
+        assert not transport.server.session.initialized
+        first.close(), second.close()
+
+    run_transport(scenario)
+
+
+def test_session_errors_notifications_and_batches():
+    async def scenario(transport, port):
+        client = await HttpClient(port).connect()
+        assert (await client.request('POST', {'jsonrpc': '2.0', 'id': 1, 'method': 'tools/list'}))[0] == 400
+        client.session_id = 'gibt-es-nicht'
+        assert (await client.request('POST', {'jsonrpc': '2.0', 'id': 1, 'method': 'tools/list'}))[0] == 404
+
+        client.session_id = None
+        await client.initialize()
+        status, _, data = await client.request('POST', {'jsonrpc': '2.0', 'method': 'notifications/initialized'})
+        assert status == 202 and data is None
+        status, _, data = await client.request('POST', [
+            {'jsonrpc': '2.0', 'id': 1, 'method': 'tools/list'},
+            {'jsonrpc': '2.0', 'id': 2, 'method': 'resources/list'}
+        ])
+        assert status == 200 and [r['id'] for r in data] == [1, 2]
+        assert (await client.request('POST', {'jsonrpc': '2.0', 'id': 1, 'method': 'tools/list'},
+                                     {'Origin': 'https://evil.example'}))[0] == 403
+
+        assert (await client.request('DELETE'))[0] == 200
+        assert (await client.request('POST', {'jsonrpc': '2.0', 'id': 1, 'method': 'tools/list'}))[0] == 404
+        client.close()
+
+    run_transport(scenario)
+
+
+def test_sse_stream_delivers_notifications_to_subscribed_session(tmp_path):
+    (tmp_path / 'agb.txt').write_text('AGB')
+    server = MCPServer(resources=ResourceProvider(str(tmp_path), ['*.txt']))
+
+    async def scenario(transport, port):
+        subscriber, other = await HttpClient(port).connect(), await HttpClient(port).connect()
+        await subscriber.initialize()
+        await other.initialize()
+        await subscriber.call('resources/subscribe', {'uri': 'file://agb.txt'})
+
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET /mcp HTTP/1.1\r\nHost: x\r\nAccept: text/event-stream\r\n'
+                     f'Mcp-Session-Id: {subscriber.session_id}\r\n\r\n'.encode())
+        assert b'text/event-stream' in await reader.readuntil(b'\r\n\r\n')
+
+        (tmp_path / 'agb.txt').write_text('AGB geändert und länger')
+        event = await asyncio.wait_for(reader.readuntil(b'\n\n'), 2)
+        assert json.loads(event.split(b'data: ', 1)[1]) == {
+            'jsonrpc': '2.0', 'method': 'notifications/resources/updated', 'params': {'uri': 'file://agb.txt'}
+        }
+        # Andere Session: nur die Listenänderung (Dateigröße), kein updated für fremde Abos
+        pending = transport.outboxes[other.session_id]
+        assert [json.loads(pending.get_nowait())['method'] for _ in range(pending.qsize())] == [
+            'notifications/resources/list_changed'
+        ]
+
+        await subscriber.request('DELETE')
+        # DELETE beendet den Stream (restliche Events, dann EOF)
+        await asyncio.wait_for(reader.read(), 2)
+        assert reader.at_eof()
+        writer.close(), subscriber.close(), other.close()
+
+    run_transport(scenario, server, poll_interval=0.02)
+
+
+def test_idle_sessions_expire():
+    async def scenario(transport, port):
+        client = await HttpClient(port).connect()
+        await client.initialize()
+        transport.session_ttl = 0
+        assert transport.expire_sessions() == 1
+        assert (await client.request('POST', {'jsonrpc': '2.0', 'id': 1, 'method': 'tools/list'}))[0] == 404
+        client.close()
+
+    run_transport(scenario)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def load_test(sessions=300, calls=10, tool_delay=0.05):
+    """Viele gleichzeitige Sessions gegen einen Prozess: initialize + gemischte Requests"""
+    logging.disable(logging.INFO)
+    latencies = []
+
+    async def session_run(port):
+        client = await HttpClient(port).connect()
+        started = time.perf_counter()
+        await client.initialize()
+        latencies.append(time.perf_counter() - started)
+        for i in range(calls):
+            started = time.perf_counter()
+            if i % 3 == 0:
+                await client.call('tools/call', {'name': 'create_vector_store', 'arguments': {'name': 'Last'}}, i)
+            elif i % 3 == 1:
+                await client.call('tools/list', request_id=i)
+            else:
+                await client.call('resources/read', {'uri': 'file://customer_policies.txt'}, i)
+            latencies.append(time.perf_counter() - started)
+        client.close()
+
+    async def scenario(transport, port):
+        started = time.perf_counter()
+        await asyncio.gather(*(session_run(port) for _ in range(sessions)))
+        return time.perf_counter() - started
+
+    elapsed = run_transport(scenario, SlowServer(tool_delay))
+    print(f"👥 {sessions} Sessions, {len(latencies)} Requests in {elapsed:.2f}s ({len(latencies) / elapsed:.0f} req/s)")
+    print(f"⏱️  p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms "
+          f"(Tool-Aufrufe simulieren {tool_delay * 1000:.0f} ms Upstream)")
+
+
+if __name__ == '__main__':
+    load_test(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Tests und Goodput-Benchmark für Rate-Limits (geteilte Token-Buckets, 429-Backoff, Client-Limits)
+Fake-Upstream: antwortet oberhalb von quota Aufrufen pro Sekunde mit 429 und Retry-After
+Benchmark: python test_rate_limit.py [aufrufe]
+"""
+
+import email.utils
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from rate_limit import (ClientLimiter, RateLimitStore, UpstreamLimiter, backoff_delay, is_rate_limited,
+                        retry_after)
+from upstream import ProviderGate, UpstreamBusy
+
+
+class FakeRateLimit(Exception):
+    """Wie openai.RateLimitError: status_code 429, Header in response.headers"""
+    status_code = 429
+
+    def __init__(self, headers):
+        super().__init__('429 Too Many Requests')
+        self.response = type('Response', (), {'headers': headers})()
+
+
+class FakeUpstream:
+    """Modell-Stub mit eigenem Kontingent: quota Aufrufe pro Sekunde (burst auf einmal), sonst 429"""
+
+    def __init__(self, quota=100.0, burst=5, latency=0.0):
+        self.quota = quota
+        self.burst = burst
+        self.latency = latency
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+
+    def generate_content(self, prompt, **kwargs):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.quota)
+            self.updated = now
+            if self.tokens < 1:
+                self.rejected += 1
+                raise FakeRateLimit({'retry-after': f'{(1 - self.tokens) / self.quota:.3f}'})
+            self.tokens -= 1
+            self.accepted += 1
+        time.sleep(self.latency)
+        return type('Response', (), {'text': 'Antwort'})()
+
+
+def test_bucket_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / 'limits.db')
+    worker_a, worker_b = RateLimitStore(path), RateLimitStore(path)
+    results = [store.acquire('upstream:test', rate=1, burst=4) for store in (worker_a, worker_b) * 3]
+    assert [granted for granted, _ in results] == [True] * 4 + [False] * 2
+    assert results[-1][1] == pytest.approx(1, abs=0.05)
+
+
+def test_reservation_waits_only_up_to_max_wait(tmp_path):
+    store = RateLimitStore(str(tmp_path / 'limits.db'))
+    assert store.acquire('k', rate=10, burst=1) == (True, 0.0)
+    granted, wait = store.acquire('k', rate=10, burst=1, max_wait=0.5)
+    assert granted and wait == pytest.approx(0.1, abs=0.02)
+    # Der reservierte Platz zählt: der nächste müsste ~0.2s warten
+    granted, wait = store.acquire('k', rate=10, burst=1, max_wait=0.15)
+    assert not granted and wait == pytest.approx(0.2, abs=0.02)
+    store.penalize('k', rate=10, burst=1, seconds=5)
+    assert store.acquire('k', rate=10, burst=1, max_wait=1)[0] is False
+
+
+def test_retry_after_and_backoff():
+    assert retry_after(FakeRateLimit({'retry-after': '3'})) == 3
+    assert retry_after(FakeRateLimit({'retry-after-ms': '250', 'retry-after': '1'})) == 0.25
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 28 < retry_after(FakeRateLimit({'retry-after': date})) <= 30
+    assert retry_after(ValueError('kein Upstream')) is None
+    assert is_rate_limited(FakeRateLimit({})) and not is_rate_limited(ValueError())
+
+    delays = [backoff_delay(3, base=0.5, maximum=20) for _ in range(200)]
+    assert all(2 <= delay <= 4 for delay in delays) and len(set(delays)) > 100
+    assert backoff_delay(0, base=0.5, maximum=20, hint=7) == 7
+    assert backoff_delay(10, base=0.5, maximum=20) <= 20
+
+
+def test_gate_retries_429_then_raises_upstream_busy(tmp_path):
+    store = RateLimitStore(str(tmp_path / 'limits.db'))
+    limiter = UpstreamLimiter('Fake', store, per_minute=0, retries=2, backoff_base=0.01)
+    gate = ProviderGate('Fake', limit=4, timeout=1, limiter=limiter)
+    calls = []
+
+    def always_limited():
+        calls.append(time.perf_counter())
+        raise FakeRateLimit({'retry-after': '0.05'})
+
+    with pytest.raises(UpstreamBusy) as excinfo:
+        gate.call(always_limited)
+    assert len(calls) == 3 and excinfo.value.retry_after == 0.05
+    # Retry-After wird eingehalten
+    assert all(later - earlier >= 0.05 for earlier, later in zip(calls, calls[1:]))
+    assert limiter.stats()['retries'] == 2 and limiter.stats()['gave_up'] == 1
+
+    with pytest.raises(ZeroDivisionError):
+        gate.call(lambda: 1 / 0)
+    assert limiter.stats()['retries'] == 2
+
+
+def run_load(gate, upstream, calls, threads=16):
+    """calls Aufrufe über threads Threads; liefert (erfolgreich, fehlgeschlagen, Dauer, Latenzen)"""
+    latencies, failures = [], []
+
+    def call(_):
+        started = time.perf_counter()
+        try:
+            gate.call(upstream.generate_content, 'Frage')
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            failures.append(e)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(call, range(calls)))
+    return len(latencies), len(failures), time.perf_counter() - started, sorted(latencies)
+
+
+def test_limiter_keeps_goodput_without_upstream_429s(tmp_path):
+    upstream = FakeUpstream(quota=100, burst=5)
+    store = RateLimitStore(str(tmp_path / 'limits.db'))
+    # Etwas unter dem Upstream-Kontingent, Buckets zweier "Worker" teilen sich die Datei
+    limiters = [UpstreamLimiter('Fake', RateLimitStore(store.path), per_minute=95 * 60, burst=5, max_wait=5)
+                for _ in range(2)]
+    gates = [ProviderGate('Fake', limit=8, timeout=5, limiter=limiter) for limiter in limiters]
+
+    results = []
+    workers = [threading.Thread(target=lambda gate=gate: results.append(run_load(gate, upstream, 40, threads=8)))
+               for gate in gates]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sum(ok for ok, _, _, _ in results) == 80 and sum(failed for _, failed, _, _ in results) == 0
+    assert upstream.rejected <= 4
+    assert max(elapsed for _, _, elapsed, _ in results) >= 0.7
+
+
+def test_client_limit_returns_429_with_retry_after(tmp_path):
+    import app
+    original = app.client_limiter
+    app.client_limiter = ClientLimiter(RateLimitStore(str(tmp_path / 'limits.db')), per_minute=60, burst=2)
+    try:
+        client = app.app.test_client()
+        statuses = [client.post('/ask-question', json={}).status_code for _ in range(3)]
+        assert statuses == [400, 400, 429]
+        response = client.post('/ask-question', json={})
+        assert response.headers['Retry-After'] == '1' and response.get_json()['retry_after'] == 1
+        # Andere Clients und nicht begrenzte Endpoints sind nicht betroffen
+        assert client.post('/ask-question', json={}, environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 400
+        assert client.get('/upstream-stats').get_json()['clients']['limited'] == 2
+    finally:
+        app.client_limiter = original
+
+
+def test_lead_webhooks_from_one_ip_are_not_client_limited(tmp_path):
+    import app
+    original = app.client_limiter
+    app.client_limiter = ClientLimiter(RateLimitStore(str(tmp_path / 'limits.db')), per_minute=30, burst=10)
+
+    class Model:
+        def generate_content(self, prompt, **kwargs):
+            return type('Response', (), {'text': 'Lead-Analyse'})()
+
+    app.gemini_model = Model()
+    try:
+        client = app.app.test_client()
+        # n8n schickt einen Burst aus einer IP: alle werden eingereiht statt mit 429 abgewiesen
+        statuses = [client.post('/process-lead-n8n', json={'name': f'Lead {i}', 'email': f'lead{i}@example.com',
+                                                            'message': f'Burst {i}'}).status_code for i in range(12)]
+        statuses += [client.post('/process-lead', json={'name': f'Lead {i}'}).status_code for i in range(12)]
+        assert statuses == [202] * 24
+        assert client.get('/upstream-stats').get_json()['clients']['limited'] == 0
+    finally:
+        app.client_limiter = original
+
+
+def test_trusted_proxy_uses_entry_of_outermost_proxy(monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'RATE_LIMIT_TRUST_PROXY', True)
+    monkeypatch.setattr(app, 'RATE_LIMIT_PROXY_HOPS', 1)
+    headers = {'X-Forwarded-For': '1.2.3.4, 203.0.113.7'}
+    with app.app.test_request_context(headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        # 1.2.3.4 hat der Client selbst gesetzt, 203.0.113.7 der Proxy
+        assert app.client_address() == '203.0.113.7'
+    monkeypatch.setattr(app, 'RATE_LIMIT_PROXY_HOPS', 2)
+    with app.app.test_request_context(headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        assert app.client_address() == '1.2.3.4'
+    with app.app.test_request_context(environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        assert app.client_address() == '10.0.0.1'
+    monkeypatch.setattr(app, 'RATE_LIMIT_TRUST_PROXY', False)
+    with app.app.test_request_context(headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        assert app.client_address() == '10.0.0.1'
+
+
+def test_persistent_upstream_429_becomes_503_with_retry_after(tmp_path):
+    import app
+
+    class LimitedModel:
+        def generate_content(self, prompt, **kwargs):
+            raise FakeRateLimit({'retry-after': '2'})
+
+    original = app.gemini_gate
+    limiter = UpstreamLimiter('Gemini', RateLimitStore(str(tmp_path / 'limits.db')), per_minute=0,
+                              retries=0)
+    app.gemini_gate = ProviderGate('Gemini', limit=4, timeout=1, limiter=limiter)
+    app.gemini_model = LimitedModel()
+    try:
+        response = app.app.test_client().post('/ai-suggestions', json={'title': 'Rate Limit'})
+        assert response.status_code == 503 and response.headers['Retry-After'] == '2'
+        assert limiter.stats()['upstream_429'] == 1 and limiter.stats()['gave_up'] == 1
+    finally:
+        app.gemini_gate = original
+
+
+def benchmark(calls=600, quota=50.0, threads=32):
+    """Goodput gegen einen Fake-Upstream mit quota Aufrufen/s: ohne Schutz, nur Retries, Bucket + Retries"""
+    print(f"⏱️  Fake-Upstream: {quota:.0f} Aufrufe/s, {calls} Aufrufe über {threads} Threads")
+    path = tempfile.mktemp(suffix='.db')
+    variants = {
+        'ohne Limiter/Retries': None,
+        'nur Retries (Backoff)': UpstreamLimiter('Fake', RateLimitStore(path), per_minute=0, retries=8,
+                                                 backoff_base=0.05, backoff_max=2),
+        'Token-Bucket + Retries': UpstreamLimiter('Fake', RateLimitStore(path), per_minute=quota * 0.95 * 60,
+                                                  burst=5, max_wait=60, retries=8, backoff_base=0.05,
+                                                  backoff_max=2),
+    }
+    for label, limiter in variants.items():
+        upstream = FakeUpstream(quota=quota, burst=5)
+        gate = ProviderGate('Fake', limit=threads, timeout=60, limiter=limiter)
+        ok, failed, elapsed, latencies = run_load(gate, upstream, calls, threads)
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+        print(f"📈 {label:<24} Goodput {ok / elapsed:6.1f}/s, {ok / calls:4.0%} ok, {failed} Fehler (→ 500/503), "
+              f"{upstream.rejected} Upstream-429, p95 {p95:.0f} ms")
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 600)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Tests und Lese-Benchmark für den Resource Provider des MCP Servers
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from mcp_server import MCPServer, serve_stdio
+from resource_provider import ResourceProvider
+
+
+def write(path, text, mtime=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def docs(tmp_path):
+    write(tmp_path / 'agb.txt', 'AGB Inhalt')
+    write(tmp_path / 'preise.md', 'Preise: 100€')
+    write(tmp_path / 'notizen.bin', 'ignorieren')
+    (tmp_path / 'faq').mkdir()
+    write(tmp_path / 'faq' / 'versand.txt', 'Versand in 2 Tagen')
+    return tmp_path
+
+
+def test_lists_matching_files_and_caches_reads(docs):
+    provider = ResourceProvider(str(docs), ['*.txt', '*.md'])
+    listed = json.loads(provider.list_json())['resources']
+    assert [r['uri'] for r in listed] == ['file://agb.txt', 'file://preise.md', 'file://faq/versand.txt']
+    assert provider.list_json() is provider.list_json()
+
+    assert provider.read('file://faq/versand.txt')['text'] == 'Versand in 2 Tagen'
+    provider.read('file://faq/versand.txt')
+    assert provider.stats()['hits'] == 1 and provider.stats()['misses'] == 1
+
+    write(docs / 'faq' / 'versand.txt', 'Versand in 1 Tag', mtime=time.time() + 10)
+    assert provider.read('file://faq/versand.txt')['text'] == 'Versand in 1 Tag'
+
+
+def test_rejects_unknown_and_escaping_uris(docs):
+    provider = ResourceProvider(str(docs), ['*.txt'])
+    for uri in ('file://notizen.bin', 'file://../agb.txt', 'http://agb.txt', None):
+        with pytest.raises(ValueError):
+            provider.read(uri)
+
+
+def test_large_files_are_mapped_and_ranges_respect_utf8(docs):
+    write(docs / 'gross.txt', 'ä' * 5000)
+    provider = ResourceProvider(str(docs), ['*.txt'], mmap_threshold=1024)
+    part = provider.read('file://gross.txt', offset=1, length=5)
+    assert part['text'] == 'äää'
+    assert part['range'] == {'offset': 2, 'length': 6, 'total': 10000}
+    assert provider.stats()['mapped'] == 1
+    assert provider.read('file://gross.txt', offset=9998)['text'] == 'ä'
+
+
+def test_eviction_during_read_keeps_mapping_valid(docs):
+    write(docs / 'gross.txt', 'x' * 5000)
+    write(docs / 'klein.txt', 'y' * 600)
+    provider = ResourceProvider(str(docs), ['*.txt'], mmap_threshold=1024, max_cache_bytes=100)
+    provider.watch('file://gross.txt')
+    load = provider._load
+
+    def load_then_evict(uri):
+        cached = load(uri)
+        if uri == 'file://gross.txt':
+            # Zwischen _load und dem Slicing verdrängen ein anderer Leser (Cache voll) und changed() den Eintrag
+            provider.read('file://klein.txt')
+            write(docs / 'neu.tmp', 'z' * 5000)
+            os.replace(docs / 'neu.tmp', docs / 'gross.txt')
+            assert provider.changed() == ['file://gross.txt']
+            assert provider.stats()['mapped'] == 0
+        return cached
+
+    provider._load = load_then_evict
+    part = provider.read('file://gross.txt', offset=10, length=5)
+    assert part['text'] == 'xxxxx'
+    provider._load = load
+    assert provider.read('file://gross.txt', offset=10, length=5)['text'] == 'zzzzz'
+
+
+def test_mapped_files_are_capped_and_release_descriptors(docs):
+    for i in range(50):
+        write(docs / f'gross{i}.txt', str(i % 10) * 2000)
+    provider = ResourceProvider(str(docs), ['*.txt'], mmap_threshold=1024, max_cache_bytes=10000, max_mapped=4)
+    open_fds = len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else None
+    for i in range(50):
+        assert provider.read(f'file://gross{i}.txt', offset=0, length=1)['text'] == str(i % 10)
+    assert provider.stats()['mapped'] == 4
+    if open_fds is not None:
+        assert len(os.listdir('/proc/self/fd')) <= open_fds + 4
+    # Zuletzt gelesene Dateien bleiben gemappt
+    assert provider.read('file://gross49.txt', offset=0, length=1)['text'] == '9'
+    assert provider.stats()['hits'] == 1
+
+
+def test_subscribed_changes_are_notified_over_stdio(docs):
+    provider = ResourceProvider(str(docs), ['*.txt'])
+    server = MCPServer(resources=provider)
+
+    async def scenario():
+        reader = asyncio.StreamReader()
+        messages = []
+        serving = asyncio.create_task(serve_stdio(server, reader, lambda line: messages.append(json.loads(line)),
+                                                  poll_interval=0.02))
+        reader.feed_data(b'{"jsonrpc": "2.0", "id": 1, "method": "resources/subscribe", '
+                         b'"params": {"uri": "file://agb.txt"}}\n')
+        await asyncio.sleep(0.05)
+        write(docs / 'agb.txt', 'AGB neu und länger', mtime=time.time() + 10)
+        write(docs / 'neu.txt', 'Neu')
+        await asyncio.sleep(0.1)
+        reader.feed_eof()
+        await serving
+        return messages
+
+    messages = asyncio.run(scenario())
+    assert messages[0] == {'jsonrpc': '2.0', 'id': 1, 'result': {}}
+    methods = [m.get('method') for m in messages[1:]]
+    assert methods == ['notifications/resources/updated', 'notifications/resources/list_changed']
+    assert messages[1]['params'] == {'uri': 'file://agb.txt'}
+
+
+def test_resources_read_supports_ranges():
+    server = MCPServer()
+    request = {'jsonrpc': '2.0', 'id': 1, 'method': 'resources/read',
+               'params': {'uri': 'file://customer_policies.txt', 'offset': 0, 'length': 20}}
+    content = json.loads(asyncio.run(server.handle_request(json.dumps(request))))['result']['contents'][0]
+    assert content['text'] == 'KUNDENRICHTLINIEN - '
+    assert content['range']['total'] == os.path.getsize('customer_policies.txt')
+
+
+def benchmark(reads=20000):
+    """Wiederholte resources/read: Datei jedes Mal öffnen vs. gecachter Provider"""
+    uri, path = 'file://customer_policies.txt', 'customer_policies.txt'
+    provider = ResourceProvider('.', ['customer_policies.txt'])
+
+    started = time.perf_counter()
+    for _ in range(reads):
+        with open(path, 'r', encoding='utf-8') as f:
+            f.read()
+    disk = (time.perf_counter() - started) / reads
+
+    started = time.perf_counter()
+    for _ in range(reads):
+        provider.read(uri)
+    cached = (time.perf_counter() - started) / reads
+
+    started = time.perf_counter()
+    for _ in range(reads):
+        provider.read(uri, offset=1000, length=256)
+    ranged = (time.perf_counter() - started) / reads
+
+    print(f"💾 open()+read():    {disk * 1e6:.1f} µs pro Lesezugriff")
+    print(f"⚡ Provider (Cache): {cached * 1e6:.1f} µs pro Lesezugriff (nur stat())")
+    print(f"✂️  Bereich 256 B:    {ranged * 1e6:.1f} µs pro Lesezugriff")
+
+
+if __name__ == '__main__':
+    benchmark()
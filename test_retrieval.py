@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests und Benchmark für den Policy-Retrieval-Index
+Vergleicht Prompt-Größe und Latenz mit dem bisherigen Voll-Dokument-Prompt
+"""
+
+import os
+import time
+
+from retrieval import PolicyIndex, get_policy_index, split_sections, tokenize
+
+POLICIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'customer_policies.txt')
+
+
+class StubModel:
+    """Simuliert Gemini: Latenz wächst linear mit der Prompt-Länge"""
+
+    def __init__(self, base_latency=0.005, per_char=0.000002):
+        self.base_latency = base_latency
+        self.per_char = per_char
+        self.prompt_chars = []
+
+    def generate_content(self, prompt):
+        self.prompt_chars.append(len(prompt))
+        time.sleep(self.base_latency + self.per_char * len(prompt))
+        return type('Response', (), {'text': 'Antwort'})()
+
+
+def full_document_prompt(policies_content, question):
+    return f"KUNDENRICHTLINIEN:\n{policies_content}\n\nFRAGE: {question}\n"
+
+
+def synthetic_policies(sections=200):
+    """Vergrößert das Richtlinien-Dokument für den Benchmark"""
+    with open(POLICIES_FILE, 'r', encoding='utf-8') as f:
+        base = split_sections(f.read())[1:]
+    parts = ['KUNDENRICHTLINIEN - KLICK2AUTOMADE\n']
+    for i in range(sections):
+        chunk = base[i % len(base)]
+        body = chunk.text.split('\n', 1)[1] if '\n' in chunk.text else ''
+        parts.append(f"{i + 1}. {chunk.title} VARIANTE {i}\n{body}\n   - Referenz Vertrag{i}\n")
+    return '\n'.join(parts)
+
+
+def test_split_sections_uses_numbered_headings():
+    with open(POLICIES_FILE, 'r', encoding='utf-8') as f:
+        chunks = split_sections(f.read())
+    numbered = [chunk for chunk in chunks if chunk.number]
+    assert [chunk.number for chunk in numbered] == [str(i) for i in range(1, 11)]
+    assert numbered[4].title == 'PREISE UND ZAHLUNGEN'
+    assert 'Ratenzahlung' in numbered[4].text
+
+
+def test_tokenize_stems_plural_forms():
+    assert tokenize('Zahlungen') == tokenize('Zahlung')
+    assert tokenize('Wie ist die') == []
+
+
+def test_tokenize_maps_verbs_and_nouns_to_one_stem():
+    assert tokenize('zahlen') == tokenize('Zahlungen') == tokenize('Zahlung')
+    assert tokenize('stornieren') == tokenize('Stornierungen')
+
+
+def test_search_returns_relevant_sections():
+    index = PolicyIndex.from_file(POLICIES_FILE)
+    titles = [chunk.title for chunk in index.search('Gibt es Ratenzahlung?', top_k=3)]
+    assert titles == ['PREISE UND ZAHLUNGEN']
+    titles = [chunk.title for chunk in index.search('Wann ist das Wartungsfenster für den Support?')]
+    assert 'SUPPORT UND WARTUNG' in titles
+
+
+def test_everyday_questions_find_sections_in_real_policies():
+    index = PolicyIndex.from_file(POLICIES_FILE)
+    expected = {
+        'Wann muss ich zahlen?': '1',
+        'Kann ich stornieren?': '1',
+        'Sind meine Daten sicher?': '3',
+        # "Projekt" steckt in "Projektlaufzeiten"
+        'Wie lange dauert ein Projekt?': '2',
+    }
+    for question, number in expected.items():
+        assert number in [chunk.number for chunk in index.search(question)], question
+
+
+def test_context_falls_back_to_full_text():
+    with open(POLICIES_FILE, 'r', encoding='utf-8') as f:
+        content = f.read()
+    index = PolicyIndex.from_text(content)
+    # Keine Treffer: ganzes Dokument statt nur Überschriften
+    for question in ('Hallo', 'Wie erreiche ich euch?', 'Gibt es Garantie?'):
+        assert index.search(question) == [] and index.build_context(question, max_tokens=10) == content
+    # Dokument passt ins Budget: immer komplett, auch mit Treffern
+    assert index.build_context('Wann muss ich zahlen?') == content
+    assert '30 Tagen' in index.build_context('Wann muss ich zahlen?', max_tokens=10)
+
+    assert index.context_sections(index.search('Wann muss ich zahlen?')) == index.chunks
+
+    large = PolicyIndex.from_text(synthetic_policies())
+    context = large.build_context('Gibt es Ratenzahlung?', top_k=3, max_tokens=2000)
+    assert context != large.text and 'Ratenzahlung' in context
+    hits = large.search('Gibt es Ratenzahlung?', 3)
+    assert large.context_sections(hits, 2000) == hits
+
+
+def test_ask_question_prompt_contains_policy_facts():
+    import app
+
+    class Model:
+        prompts = []
+
+        def generate_content(self, prompt, **kwargs):
+            self.prompts.append(prompt)
+            return type('Response', (), {'text': 'Antwort'})()
+
+    app.gemini_model = model = Model()
+    app.answer_cache.clear()
+    client = app.app.test_client()
+    titles = [chunk.title for chunk in app.bind_policy_version().chunks]
+    for question in ('Wann muss ich zahlen?', 'Gibt es Garantie?', 'Wie erreiche ich euch?'):
+        response = client.post('/ask-question', json={'question': question})
+        assert response.status_code == 200
+        # Ganzes Dokument gesendet: alle Abschnitte sind Quellen, nicht nur die BM25-Treffer
+        assert response.get_json()['sections'] == titles
+    assert all('30 Tagen' in prompt and '12 Monate Gewährleistung' in prompt and 'info@klick2automade.de' in prompt
+               for prompt in model.prompts)
+
+
+def test_index_rebuilds_when_file_changes(tmp_path):
+    path = tmp_path / 'policies.txt'
+    path.write_text('1. PREISE\n   - Alles kostenlos\n', encoding='utf-8')
+    first = get_policy_index(str(path))
+    assert get_policy_index(str(path)) is first
+    path.write_text('1. PREISE\n   - Alles kostenlos\n2. SUPPORT\n   - Hotline\n', encoding='utf-8')
+    second = get_policy_index(str(path))
+    assert second is not first
+    assert len(second.chunks) == 2
+
+
+def benchmark(requests=30):
+    """Prompt-Größe und Ende-zu-Ende-Latenz: Voll-Dokument vs. Retrieval"""
+    questions = [
+        'Wann sind Zahlungen fällig?',
+        'Wie lange gilt die Gewährleistung?',
+        'Gibt es Notfall-Support am Wochenende?',
+        'Welche Browser werden unterstützt?',
+        'Wie werden meine Daten geschützt?',
+    ]
+    with open(POLICIES_FILE, 'r', encoding='utf-8') as f:
+        corpora = {'customer_policies.txt': f.read(), 'synthetisch (200 Abschnitte)': synthetic_policies()}
+
+    for label, content in corpora.items():
+        print(f"\n📚 Korpus: {label} ({len(content)} Zeichen)")
+        for mode in ('voll', 'retrieval'):
+            model = StubModel()
+            started = time.perf_counter()
+            index = PolicyIndex.from_text(content) if mode == 'retrieval' else None
+            build_time = time.perf_counter() - started
+            started = time.perf_counter()
+            for i in range(requests):
+                question = questions[i % len(questions)]
+                if index is None:
+                    prompt = full_document_prompt(content, question)
+                else:
+                    prompt = full_document_prompt(index.build_context(question, 3), question)
+                model.generate_content(prompt)
+            elapsed = time.perf_counter() - started
+            avg_chars = sum(model.prompt_chars) / len(model.prompt_chars)
+            print(f"  {mode:<10} Ø Prompt {avg_chars:>9.0f} Zeichen | "
+                  f"Ø Latenz {elapsed / requests * 1000:7.2f} ms | Index-Aufbau {build_time * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests für den kompilierten JSON-Schema-Validator
+"""
+
+import pytest
+
+from schema import SchemaError, compile_schema
+
+LEAD_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'name': {'type': 'string', 'minLength': 1},
+        'score': {'type': 'integer', 'minimum': 0, 'maximum': 100},
+        'priority': {'enum': ['hoch', 'mittel', 'niedrig']},
+        'tags': {'type': 'array', 'items': {'type': 'string'}},
+        'budget': {'type': ['number', 'null']}
+    },
+    'required': ['name', 'score'],
+    'additionalProperties': False
+}
+
+
+def test_valid_document_passes():
+    compile_schema(LEAD_SCHEMA)({'name': 'Anna', 'score': 80, 'priority': 'hoch', 'tags': ['crm'], 'budget': None})
+
+
+def test_collects_all_errors_with_paths():
+    with pytest.raises(SchemaError) as error:
+        compile_schema(LEAD_SCHEMA)({'score': 120, 'priority': 'sofort', 'tags': ['ok', 3], 'extra': 1})
+    assert error.value.errors == [
+        '$.name: Pflichtfeld fehlt',
+        '$.score: 120 > 100',
+        "$.priority: 'sofort' nicht in ['hoch', 'mittel', 'niedrig']",
+        '$.tags[1]: erwartet string, erhalten int',
+        '$.extra: unerwartetes Feld'
+    ]
+
+
+def test_bool_is_not_an_integer_and_unknown_types_fail_at_compile_time():
+    with pytest.raises(SchemaError):
+        compile_schema({'type': 'integer'})(True)
+    with pytest.raises(ValueError):
+        compile_schema({'type': 'datetime'})
+
+
+def test_array_length_bounds():
+    check = compile_schema({'type': 'array', 'minItems': 1, 'maxItems': 2})
+    check(['a'])
+    with pytest.raises(SchemaError) as error:
+        check([])
+    assert error.value.errors == ['$: weniger als 1 Einträge']
+    with pytest.raises(SchemaError):
+        check([1, 2, 3])
+
+
+def test_pattern_uses_search_semantics():
+    check = compile_schema({'type': 'string', 'pattern': '^[a-z]+$'})
+    check('abc')
+    with pytest.raises(SchemaError) as error:
+        check('ab1')
+    assert error.value.errors == ['$: passt nicht zu ^[a-z]+$']
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests und Latenz-Messung für den gecachten, paginierten Vector-Store-Katalog
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from openai import OpenAI
+
+from fake_openai_server import start_fake_openai
+from store_catalog import StoreCatalog
+
+
+@pytest.fixture
+def app_with_fake_openai():
+    import app
+    server, state, base_url = start_fake_openai()
+    app.client = OpenAI(api_key='test-key', base_url=base_url, max_retries=0)
+    app.store_catalog.invalidate()
+    yield app, state
+    server.shutdown()
+
+
+def test_catalog_serves_hot_pages_from_cache():
+    calls = []
+    catalog = StoreCatalog(lambda limit, after: calls.append((limit, after)) or {'vector_stores': []}, ttl=60)
+    first = catalog.get_page(20)
+    assert catalog.get_page(20) is first
+    catalog.get_page(20, 'vs_1')
+    assert calls == [(20, None), (20, 'vs_1')]
+    catalog.invalidate()
+    catalog.get_page(20)
+    assert len(calls) == 3
+
+
+def test_invalidation_during_fetch_is_not_cached():
+    catalog = StoreCatalog(lambda limit, after: catalog.invalidate() or {'n': 1}, ttl=60)
+    catalog.get_page(20)
+    assert catalog.stats()['pages'] == 0
+
+
+def test_cache_is_bounded_and_drops_expired_pages():
+    catalog = StoreCatalog(lambda limit, after: {'after': after}, ttl=60, max_pages=100)
+    for i in range(10000):
+        catalog.get_page(20, f'vs_{i}')
+    assert catalog.stats()['pages'] == 100
+    assert catalog.get_page(20, 'vs_9999').body == '{"after":"vs_9999"}'
+    assert catalog.stats()['hits'] == 1
+
+    catalog.ttl = 0.01
+    time.sleep(0.02)
+    catalog.get_page(20, 'neu')
+    assert catalog.stats()['pages'] == 1
+
+
+def test_slow_fetch_blocks_only_its_own_page():
+    release = threading.Event()
+    calls = []
+
+    def fetch(limit, after):
+        calls.append(after)
+        if after == 'langsam':
+            release.wait(5)
+        return {'after': after}
+
+    catalog = StoreCatalog(fetch, ttl=60)
+    with ThreadPoolExecutor(4) as pool:
+        slow = [pool.submit(catalog.get_page, 20, 'langsam') for _ in range(2)]
+        time.sleep(0.05)
+        started = time.perf_counter()
+        assert catalog.get_page(20, 'schnell').body == '{"after":"schnell"}'
+        assert time.perf_counter() - started < 0.5
+        release.set()
+        assert slow[0].result().body == slow[1].result().body
+    assert calls.count('langsam') == 1
+
+
+def test_list_paginates_with_limit_and_after(app_with_fake_openai):
+    app, state = app_with_fake_openai
+    for i in range(5):
+        app.client.vector_stores.create(name=f'Store {i}')
+    web = app.app.test_client()
+
+    first = web.get('/list-vector-stores?limit=2').get_json()
+    assert len(first['vector_stores']) == 2 and first['has_more'] is True
+    seen = [store['id'] for store in first['vector_stores']]
+    after = first['next_after']
+    while after:
+        page = web.get(f'/list-vector-stores?limit=2&after={after}').get_json()
+        seen += [store['id'] for store in page['vector_stores']]
+        after = page['next_after']
+    assert sorted(seen) == sorted(state.vector_stores)
+
+
+def test_etag_returns_304_and_create_invalidates(app_with_fake_openai):
+    app, state = app_with_fake_openai
+    web = app.app.test_client()
+
+    response = web.get('/list-vector-stores')
+    etag = response.headers['ETag']
+    requests_before = state.requests
+    cached = web.get('/list-vector-stores', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert state.requests == requests_before
+
+    web.post('/create-vector-store', json={'name': 'Neu'})
+    fresh = web.get('/list-vector-stores', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert fresh.headers['ETag'] != etag
+    assert [store['name'] for store in fresh.get_json()['vector_stores']] == ['Neu']
+
+
+def benchmark(requests=200, latency=0.05):
+    """Listen-Latenz: Upstream-Roundtrip vs. Cache-Treffer vs. 304-Revalidierung"""
+    import app
+    server, state, base_url = start_fake_openai(latency=latency)
+    app.client = OpenAI(api_key='test-key', base_url=base_url)
+    for i in range(20):
+        app.client.vector_stores.create(name=f'Store {i}')
+    web = app.app.test_client()
+
+    app.store_catalog.invalidate()
+    started = time.perf_counter()
+    etag = web.get('/list-vector-stores').headers['ETag']
+    cold = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        web.get('/list-vector-stores')
+    hot = (time.perf_counter() - started) / requests
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        web.get('/list-vector-stores', headers={'If-None-Match': etag})
+    not_modified = (time.perf_counter() - started) / requests
+    catalog_started = time.perf_counter()
+    for _ in range(requests):
+        app.store_catalog.get_page(20)
+    catalog_only = (time.perf_counter() - catalog_started) / requests
+    server.shutdown()
+
+    print(f"🌐 Upstream (kalt):    {cold * 1000:.2f} ms")
+    print(f"⚡ Cache-Treffer:      {hot * 1000:.3f} ms pro Request (inkl. Flask)")
+    print(f"📭 304 Not Modified:   {not_modified * 1000:.3f} ms pro Request (inkl. Flask)")
+    print(f"🗂️  Katalog-Lookup:     {catalog_only * 1000:.4f} ms")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests für den SSE-Streaming-Modus von /ask-question und /ai-suggestions
+Misst Time-to-first-Token gegenüber der vollständigen Generierung
+"""
+
+import json
+import time
+
+
+class StreamingModel:
+    """Gemini-Stub, der Tokens mit fester Verzögerung liefert"""
+
+    def __init__(self, tokens=None, token_delay=0.05):
+        self.tokens = tokens or ['Zahlungen ', 'sind ', 'innerhalb ', 'von ', '30 ', 'Tagen ', 'fällig.']
+        self.token_delay = token_delay
+        self.calls = 0
+
+    def _chunks(self):
+        for token in self.tokens:
+            time.sleep(self.token_delay)
+            yield type('Chunk', (), {'text': token})()
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        if stream:
+            return self._chunks()
+        return type('Response', (), {'text': ''.join(chunk.text for chunk in self._chunks())})()
+
+
+def parse_events(body):
+    events = []
+    for frame in body.strip().split('\n\n'):
+        event, data = 'message', ''
+        for line in frame.split('\n'):
+            if line.startswith('event: '):
+                event = line[7:]
+            elif line.startswith('data: '):
+                data += line[6:]
+        events.append((event, json.loads(data)))
+    return events
+
+
+def test_ask_question_streams_deltas_then_done():
+    import app
+    model = StreamingModel(token_delay=0)
+    app.gemini_model = model
+    app.answer_cache.clear()
+    client = app.app.test_client()
+
+    response = client.post('/ask-question', json={'question': 'Wann sind Zahlungen fällig?', 'stream': True})
+    assert response.mimetype == 'text/event-stream'
+    events = parse_events(response.get_data(as_text=True))
+    deltas = [data['delta'] for event, data in events if event == 'message']
+    assert deltas == model.tokens
+    event, done = events[-1]
+    assert event == 'done'
+    assert done['answer'] == ''.join(model.tokens)
+    assert done['sections']
+
+    # Gestreamte Antworten landen im Cache
+    cached = client.post('/ask-question', json={'question': 'wann sind zahlungen faellig', 'stream': True})
+    assert parse_events(cached.get_data(as_text=True))[-1][1]['cached'] is True
+    assert model.calls == 1
+
+
+def test_accept_header_enables_streaming_for_suggestions():
+    import app
+    app.gemini_model = StreamingModel(tokens=['1. ', 'Priorität ', 'hoch'], token_delay=0)
+    client = app.app.test_client()
+
+    response = client.post('/ai-suggestions', json={'title': 'Deployment'}, headers={'Accept': 'text/event-stream'})
+    events = parse_events(response.get_data(as_text=True))
+    assert events[-1] == ('done', {'success': True, 'suggestions': '1. Priorität hoch'})
+
+
+def test_json_mode_unchanged_without_stream_flag():
+    import app
+    app.gemini_model = StreamingModel(tokens=['Ok'], token_delay=0)
+    client = app.app.test_client()
+    assert client.post('/ai-suggestions', json={'title': 'X'}).get_json() == {'success': True, 'suggestions': 'Ok'}
+
+
+def test_stream_errors_are_reported_as_error_event():
+    import app
+
+    class FailingModel:
+        def generate_content(self, prompt, stream=False):
+            raise RuntimeError('Gemini nicht erreichbar')
+
+    app.gemini_model = FailingModel()
+    client = app.app.test_client()
+    events = parse_events(client.post('/ai-suggestions', json={'title': 'X', 'stream': True}).get_data(as_text=True))
+    assert events == [('error', {'success': False, 'error': 'Gemini nicht erreichbar'})]
+
+
+def benchmark(tokens=40, token_delay=0.05):
+    """Time-to-first-Token im Streaming-Modus vs. Latenz der kompletten JSON-Antwort"""
+    import app
+    client = app.app.test_client()
+    model = StreamingModel(tokens=[f'Token{i} ' for i in range(tokens)], token_delay=token_delay)
+    app.gemini_model = model
+
+    started = time.perf_counter()
+    client.post('/ai-suggestions', json={'title': 'Benchmark'})
+    full_latency = time.perf_counter() - started
+
+    started = time.perf_counter()
+    response = client.post('/ai-suggestions', json={'title': 'Benchmark', 'stream': True}, buffered=False)
+    chunks = iter(response.response)
+    next(chunks)
+    first_token = time.perf_counter() - started
+    for _ in chunks:
+        pass
+    stream_total = time.perf_counter() - started
+
+    print(f"⏱️  JSON:      erste Anzeige nach {full_latency * 1000:.0f} ms")
+    print(f"⚡ Streaming: erstes Token nach {first_token * 1000:.0f} ms, komplett nach {stream_total * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Tests für Structured Output: Korpus fehlerhafter Modellantworten, Reparatur-Aufruf und Zähler
+"""
+
+import json
+import time
+
+import pytest
+
+from prompt_templates import get_prompt_library
+from structured_output import OutputError, StructuredOutput, extract_json, response_schema
+
+FOLLOWUPS = ["Wie viel kostet das?", "Wann ist es verfügbar?", "Gibt es Alternativen?"]
+
+# (Modellantwort, erwartetes Ergebnis von extract_json oder None wenn lokal nicht parsebar)
+MALFORMED_CORPUS = [
+    ('{"followups": ["A?", "B?"]}', {'followups': ['A?', 'B?']}),
+    ('```json\n{"followups": ["A?"]}\n```', {'followups': ['A?']}),
+    ('```\n{"followups": ["A?"]}\n```', {'followups': ['A?']}),
+    ('Hier sind die Fragen:\n{"followups": ["A?"]}\nViel Erfolg!', {'followups': ['A?']}),
+    ('{"followups": ["A?", "B?",]}', {'followups': ['A?', 'B?']}),
+    ('{"todos": [{"title": "X",},],}', {'todos': [{'title': 'X'}]}),
+    ('  \n{"followups": ["Größe?"]}  ', {'followups': ['Größe?']}),
+    ('["A?", "B?"]', ['A?', 'B?']),
+    ('', None),
+    ('Leider kann ich keine Fragen generieren.', None),
+    ('{"followups": ["A?", "B?"', None),
+    ("{'followups': ['A?']}", None),
+    ('{followups: ["A?"]}', None),
+]
+
+
+class ScriptedModel:
+    """Gemini-Stub mit vorgegebenen Antworten in Reihenfolge"""
+
+    def __init__(self, *texts):
+        self.texts = list(texts)
+        self.prompts = []
+        self.kwargs = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        self.kwargs.append(kwargs)
+        return type('Response', (), {'text': self.texts.pop(0)})()
+
+
+def followups_output():
+    schema = {'type': 'object', 'required': ['followups'],
+              'properties': {'followups': {'type': 'array', 'minItems': 1, 'items': {'type': 'string'}}}}
+    return StructuredOutput('test', schema, get_prompt_library())
+
+
+@pytest.mark.parametrize('text,expected', MALFORMED_CORPUS)
+def test_extract_json_corpus(text, expected):
+    if expected is None:
+        with pytest.raises(OutputError):
+            extract_json(text)
+    else:
+        assert extract_json(text) == expected
+
+
+def test_valid_output_needs_one_call():
+    output = followups_output()
+    model = ScriptedModel('```json\n{"followups": ["A?", "B?", "C?"]}\n```')
+    assert output.generate(model.generate_content, 'PROMPT') == {'followups': ['A?', 'B?', 'C?']}
+    assert len(model.prompts) == 1
+    assert output.stats()['parsed'] == 1 and output.stats()['parse_errors'] == 0
+
+
+def test_single_repair_pass_with_short_prompt():
+    output = followups_output()
+    model = ScriptedModel('Gerne! Hier: followups = A?, B?', '{"followups": ["A?", "B?"]}')
+    assert output.generate(model.generate_content, 'LANGER ORIGINAL-PROMPT ' * 100) == {'followups': ['A?', 'B?']}
+    repair = model.prompts[1]
+    assert 'LANGER ORIGINAL-PROMPT' not in repair
+    assert 'Gerne! Hier: followups = A?, B?' in repair and '"minItems":1' in repair
+    stats = output.stats()
+    assert stats['repaired'] == 1 and stats['parse_errors'] == 1 and stats['failed'] == 0
+
+
+def test_gives_up_after_one_repair():
+    output = followups_output()
+    model = ScriptedModel('{"followups": []}', '{"fragen": ["A?"]}', 'nie verwendet')
+    assert output.generate(model.generate_content, 'PROMPT') is None
+    assert len(model.prompts) == 2
+    stats = output.stats()
+    assert stats['failed'] == 1 and stats['schema_errors'] == 2
+
+
+def test_response_schema_drops_unsupported_keywords():
+    schema = {'type': 'object', 'additionalProperties': False, 'required': ['a'],
+              'properties': {'a': {'type': 'array', 'minItems': 1, 'items': {'enum': ['x'], 'minLength': 1}}}}
+    assert response_schema(schema) == {
+        'type': 'object', 'required': ['a'],
+        'properties': {'a': {'type': 'array', 'items': {'enum': ['x'], 'type': 'string'}}}
+    }
+
+
+def test_generate_followups_repairs_instead_of_falling_back():
+    import app
+    model = ScriptedModel('Natürlich!\n```json\n{"followups": []}\n```', json.dumps({'followups': FOLLOWUPS}))
+    app.gemini_model = model
+    app.followup_cache.clear()
+    client = app.app.test_client()
+
+    data = client.post('/generate-followups', json={'original_question': 'Preis?', 'original_answer': '100€'}).get_json()
+    assert data == {'success': True, 'followups': FOLLOWUPS}
+    stats = client.get('/prompt-stats').get_json()['structured_output']['generate_followups']
+    assert stats['repaired'] >= 1 and stats['schema_errors'] >= 1
+
+
+def test_generate_todos_validates_and_falls_back_after_failed_repair():
+    import app
+    todo = {'title': 'API bauen', 'description': 'REST-Endpunkte', 'priority': 'hoch', 'category': 'Entwicklung'}
+    app.gemini_model = ScriptedModel('{"todos": [%s,]}' % json.dumps(todo))
+    client = app.app.test_client()
+    assert client.post('/generate-todos', json={'description': 'Shop'}).get_json()['todos'] == [todo]
+
+    app.gemini_model = ScriptedModel('{"todos": [{"title": "X", "priority": "dringend"}]}', 'kein JSON')
+    data = client.post('/generate-todos', json={'description': 'Shop'}).get_json()
+    assert data['fallback'] is True and data['todos'] == app.FALLBACK_TODOS
+
+
+def benchmark(rounds=2000):
+    """Wie viele Antworten des Korpus ohne zweiten Modellaufruf auskommen, alt (replace + json.loads) vs. neu"""
+    old_ok = new_ok = 0
+    for text, _ in MALFORMED_CORPUS:
+        try:
+            json.loads(text.strip().replace('```json', '').replace('```', ''))
+            old_ok += 1
+        except json.JSONDecodeError:
+            pass
+        try:
+            extract_json(text)
+            new_ok += 1
+        except OutputError:
+            pass
+    print(f"🧪 Korpus {len(MALFORMED_CORPUS)} Antworten: lokal parsebar alt {old_ok}, neu {new_ok}")
+
+    output = followups_output()
+    text = '```json\n{"followups": ["A?", "B?", "C?"],}\n```'
+    started = time.perf_counter()
+    for _ in range(rounds):
+        output.parse(text)
+    print(f"⏱️  parse + validate: {(time.perf_counter() - started) / rounds * 1e6:.1f} µs")
+
+
+if __name__ == '__main__':
+    benchmark()
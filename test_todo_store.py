@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Tests und Benchmark für den Todo-Store (versionierte Einträge, Delta-Sync, Batch-PATCH)
+Benchmark: python test_todo_store.py [anzahl]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+from schema import SchemaError
+from todo_store import TodoStore
+
+
+def synthetic_todo(i):
+    return {
+        'id': f'todo-{i}',
+        'title': f'Aufgabe {i}',
+        'description': 'Vector Store Operationen testen und die Ergebnisse dokumentieren.',
+        'priority': ('high', 'medium', 'low')[i % 3],
+        'category': 'development',
+        'created_at': 1700000000 + i
+    }
+
+
+def test_delta_contains_only_changes_and_tombstones(tmp_path):
+    store = TodoStore(str(tmp_path / 'todos.db'))
+    first = store.apply('default', [synthetic_todo(i) for i in range(5)])
+    assert first['version'] == 1 and len(first['todos']) == 5
+
+    full = store.changes('default')
+    assert full['full'] is True and full['version'] == 1
+    assert [todo['id'] for todo in full['todos']] == [f'todo-{i}' for i in range(4, -1, -1)]
+
+    store.apply('default', [{'id': 'todo-1', 'completed': True}, {'id': 'todo-2', 'deleted': True}])
+    delta = store.changes('default', since=1)
+    assert delta['full'] is False and delta['version'] == 2
+    assert {todo['id']: todo for todo in delta['todos']} == {
+        'todo-1': {**synthetic_todo(1), 'completed': True, 'updated_at': delta['todos'][0]['updated_at'],
+                   'version': 2},
+        'todo-2': {'id': 'todo-2', 'deleted': True, 'version': 2}
+    }
+    assert store.changes('default', since=2)['todos'] == []
+    # Gelöschte Einträge fehlen im Vollabzug, unbekannte Versionen erzwingen ihn
+    assert len(store.changes('default')['todos']) == 4
+    assert store.changes('default', since=99)['full'] is True
+    # Boards sind unabhängig
+    assert store.changes('anderes') == {'version': 0, 'full': True, 'todos': []}
+
+
+def test_batch_is_one_version_and_noops_do_not_bump(tmp_path):
+    store = TodoStore(str(tmp_path / 'todos.db'))
+    assert store.apply('default', [synthetic_todo(i) for i in range(100)])['version'] == 1
+    assert store.apply('default', [])['version'] == 1
+    # Löschen eines unbekannten Eintrags ändert nichts
+    assert store.apply('default', [{'id': 'fehlt', 'deleted': True}]) == {'version': 1, 'todos': [], 'conflicts': []}
+    assert store.apply('default', [{'id': 'todo-3', 'title': 'Neu'}])['version'] == 2
+
+
+def test_stale_base_version_is_reported_as_conflict(tmp_path):
+    store = TodoStore(str(tmp_path / 'todos.db'))
+    store.apply('default', [synthetic_todo(1)])
+    store.apply('default', [{'id': 'todo-1', 'title': 'Von Client A', 'base_version': 1}])
+    result = store.apply('default', [{'id': 'todo-1', 'title': 'Von Client B', 'base_version': 1},
+                                     {'id': 'todo-2', 'title': 'Unabhängig'}])
+    assert [todo['id'] for todo in result['todos']] == ['todo-2']
+    assert result['conflicts'][0]['title'] == 'Von Client A' and result['conflicts'][0]['version'] == 2
+
+
+def test_upsert_on_tombstone_restores_the_todo(tmp_path):
+    store = TodoStore(str(tmp_path / 'todos.db'))
+    store.apply('default', [synthetic_todo(1)])
+    store.apply('default', [{'id': 'todo-1', 'deleted': True}])
+    assert store.changes('default')['todos'] == []
+
+    # Neu anlegen ohne deleted: false
+    result = store.apply('default', [{'id': 'todo-1', 'title': 'Wieder da'}])
+    assert result['todos'][0]['title'] == 'Wieder da' and 'deleted' not in result['todos'][0]
+    assert [todo['id'] for todo in store.changes('default')['todos']] == ['todo-1']
+    assert store.changes('default', since=2)['todos'][0]['title'] == 'Wieder da'
+
+
+def test_apply_returns_rows_even_if_another_writer_commits_right_after(tmp_path, monkeypatch):
+    store = TodoStore(str(tmp_path / 'todos.db'))
+    other = TodoStore(store.path)
+    store.apply('default', [synthetic_todo(1)])
+    conn = store._connection()
+
+    class Interleaved:
+        """Lässt direkt nach dem COMMIT von store einen zweiten Schreiber dieselbe id ändern"""
+
+        def execute(self, sql, *args):
+            cursor = conn.execute(sql, *args)
+            if sql == 'COMMIT' and not getattr(self, 'done', False):
+                self.done = True
+                other.apply('default', [{'id': 'todo-1', 'title': 'Von anderem Client'}])
+            return cursor
+
+    monkeypatch.setattr(store, '_connection', lambda: Interleaved())
+    result = store.apply('default', [{'id': 'todo-1', 'title': 'Eigene Änderung'}])
+    assert result['version'] == 2 and [todo['title'] for todo in result['todos']] == ['Eigene Änderung']
+    assert store.version('default') == 3
+
+
+def test_invalid_changes_are_rejected_before_writing(tmp_path):
+    store = TodoStore(str(tmp_path / 'todos.db'), max_batch=10)
+    for changes in ([{'title': 'ohne id'}], [{'id': 'a b'}], [{'id': 'x', 'unbekannt': 1}],
+                    [{'id': f'todo-{i}'} for i in range(11)]):
+        with pytest.raises(SchemaError):
+            store.apply('default', changes)
+    assert store.version('default') == 0
+    with pytest.raises(ValueError):
+        store.check_board('../etc')
+
+
+def test_todos_api_patch_and_delta_sync():
+    import app
+    client = app.app.test_client()
+    board = f'api-{time.time_ns()}'
+
+    data = client.patch('/todos', json={'board': board, 'changes': [synthetic_todo(i) for i in range(3)]}).get_json()
+    assert data['success'] is True and data['version'] == 1 and data['conflicts'] == []
+
+    other = client.get(f'/todos?board={board}').get_json()
+    assert other['full'] is True and len(other['todos']) == 3
+
+    # PATCH mit since liefert eigene und fremde Änderungen in einem Roundtrip
+    client.patch('/todos', json={'board': board, 'changes': [{'id': 'todo-0', 'deleted': True}]})
+    data = client.patch('/todos', json={'board': board, 'since': 1,
+                                        'changes': [{'id': 'todo-1', 'completed': True}]}).get_json()
+    assert data['version'] == 3 and data['full'] is False
+    assert [todo['id'] for todo in data['todos']] == ['todo-0', 'todo-1']
+
+    assert client.get(f'/todos?board={board}&since=3').get_json()['todos'] == []
+    assert client.patch('/todos', json={'board': board, 'changes': [{'id': 'a b'}]}).status_code == 400
+    assert client.get('/todos?since=abc').status_code == 400
+    assert client.get('/todos?board=../x').status_code == 400
+
+
+def payload_size(data):
+    return len(json.dumps({'success': True, **data}).encode())
+
+
+def benchmark(count=10_000, edits=20, rounds=50):
+    path = os.path.join(tempfile.mkdtemp(), 'todos.db')
+    store = TodoStore(path, max_batch=count)
+
+    started = time.perf_counter()
+    store.apply('default', [synthetic_todo(i) for i in range(count)])
+    print(f"📥 {count} Todos in einem Batch angelegt: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    base = store.version('default')
+    started = time.perf_counter()
+    for i in range(edits):
+        store.apply('default', [{'id': f'todo-{i * 37 % count}', 'completed': True}])
+    single = (time.perf_counter() - started) / edits
+    changes = [{'id': f'todo-{i * 53 % count}', 'priority': 'high'} for i in range(edits)]
+    started = time.perf_counter()
+    store.apply('default', changes)
+    batched = time.perf_counter() - started
+    print(f"✏️  {edits} Änderungen: einzeln {single * edits * 1000:.1f} ms ({edits} Requests), "
+          f"als Batch {batched * 1000:.1f} ms (1 Request)")
+
+    for label, since in (('Vollabzug (vorher: ganze Liste)', 0), (f'Delta since={base}', base)):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            data = store.changes('default', since)
+        latency = (time.perf_counter() - started) / rounds
+        print(f"🔄 {label:<32} {len(data['todos']):>6} Einträge, {payload_size(data) / 1024:>8.1f} KiB, "
+              f"{latency * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
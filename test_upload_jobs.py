@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests für nicht-blockierende Uploads gegen einen lokalen Fake der Vector-Store-API
+"""
+
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeVectorStoreAPI:
+    """Bildet client.files.create und client.vector_stores.files.create/retrieve nach;
+    die Indexierung dauert index_delay Sekunden"""
+
+    def __init__(self, index_delay=0.2, fail=False):
+        self.index_delay = index_delay
+        self.fail = fail
+        self.uploads = {}
+        self.indexing = {}
+        self._lock = threading.Lock()
+        self.files = SimpleNamespace(create=self._create_file)
+        self.vector_stores = SimpleNamespace(files=SimpleNamespace(create=self._attach, retrieve=self._retrieve))
+
+    def _create_file(self, file, purpose):
+        name, content = file
+        assert isinstance(content, bytes)
+        with self._lock:
+            file_id = f'file_{len(self.uploads) + 1}'
+            self.uploads[file_id] = (name, content)
+        return SimpleNamespace(id=file_id)
+
+    def _attach(self, vector_store_id, file_id):
+        if self.fail:
+            raise RuntimeError('Indexierung fehlgeschlagen')
+        self.indexing[file_id] = time.time() + self.index_delay
+        return self._retrieve(file_id, vector_store_id)
+
+    def _retrieve(self, file_id, vector_store_id):
+        status = 'completed' if time.time() >= self.indexing[file_id] else 'in_progress'
+        return SimpleNamespace(id=file_id, status=status, vector_store_id=vector_store_id)
+
+
+def wait_for_job(client, status_url, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(status_url).get_json()
+        if job['status'] in ('completed', 'failed'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f'Upload-Job nicht fertig: {job}')
+
+
+def test_upload_returns_job_immediately_and_completes_in_background():
+    import app
+    fake = FakeVectorStoreAPI(index_delay=0.3)
+    app.client = fake
+    client = app.app.test_client()
+
+    started = time.perf_counter()
+    response = client.post('/upload-file', json={
+        'vector_store_id': 'vs_test', 'file_name': 'faq.txt', 'file_content': 'Frage: Preise?'
+    })
+    assert time.perf_counter() - started < 0.2
+    assert response.status_code == 202
+    data = response.get_json()
+    assert client.get(data['status_url']).get_json()['status'] in ('queued', 'uploading', 'indexing')
+
+    job = wait_for_job(client, data['status_url'])
+    assert job['status'] == 'completed'
+    assert job['file_name'] == 'faq.txt'
+    assert job['result']['file_status'] == 'completed'
+    assert fake.uploads[job['result']['file_id']] == ('faq.txt', 'Frage: Preise?'.encode('utf-8'))
+    assert not os.path.exists('temp_faq.txt')
+
+
+def test_concurrent_uploads_with_same_name_do_not_collide():
+    import app
+    fake = FakeVectorStoreAPI(index_delay=0.05)
+    app.client = fake
+    client = app.app.test_client()
+
+    urls = [client.post('/upload-file', json={
+        'vector_store_id': 'vs_test', 'file_name': 'same.txt', 'file_content': f'Inhalt {i}'
+    }).get_json()['status_url'] for i in range(5)]
+    jobs = [wait_for_job(client, url) for url in urls]
+
+    assert all(job['status'] == 'completed' for job in jobs)
+    contents = sorted(content.decode() for _, content in fake.uploads.values())
+    assert contents == [f'Inhalt {i}' for i in range(5)]
+
+
+def test_indexing_does_not_hold_an_openai_slot():
+    import app
+    app.client = FakeVectorStoreAPI(index_delay=0.5)
+    client = app.app.test_client()
+    status_url = client.post('/upload-file', json={
+        'vector_store_id': 'vs_test', 'file_name': 'lang.txt', 'file_content': 'Große Datei'
+    }).get_json()['status_url']
+    deadline = time.time() + 2
+    while client.get(status_url).get_json()['status'] != 'indexing' and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    # Indexierung läuft serverseitig weiter, der Slot ist nur für die einzelnen Statusabfragen belegt
+    assert app.openai_gate.stats()['in_flight'] == 0
+    assert wait_for_job(client, status_url)['status'] == 'completed'
+
+
+def test_failed_indexing_is_reported():
+    import app
+    app.client = FakeVectorStoreAPI(index_delay=0, fail=True)
+    client = app.app.test_client()
+    data = client.post('/upload-file', json={'vector_store_id': 'vs_test', 'file_content': 'x'}).get_json()
+    job = wait_for_job(client, data['status_url'])
+    assert job['status'] == 'failed'
+    assert 'Indexierung' in job['error']
+    assert job['result'] == {'file_id': 'file_1'}
+
+
+def test_other_process_keeps_running_jobs_and_fails_expired_ones(tmp_path):
+    from upload_jobs import UploadJobs
+    path = str(tmp_path / 'uploads.db')
+    release = threading.Event()
+    first = UploadJobs(path, lease_seconds=0.15)
+    running = first.submit(lambda progress: (progress('indexing'), release.wait(5), {'ok': True})[2])
+    # Job eines abgestürzten Prozesses: Lease abgelaufen
+    crashed = 'abgestuerzt'
+    first._connection().execute(
+        "INSERT INTO upload_jobs (id, status, meta, created_at, updated_at, lease_owner, lease_until) "
+        "VALUES (?, 'indexing', '{}', ?, ?, 'tot', ?)", (crashed, time.time(), time.time(), time.time() - 1))
+
+    # Neuer Worker-Prozess: laufende Jobs anderer Prozesse bleiben unberührt, auch über lease_seconds hinaus
+    second = UploadJobs(path, lease_seconds=0.15)
+    time.sleep(0.4)
+    assert second.get(running)['status'] == 'indexing'
+    assert second.get(crashed)['status'] == 'failed'
+    release.set()
+    first.shutdown()
+    assert second.get(running)['status'] == 'completed'
+    second.shutdown()
+
+
+def test_missing_fields_and_unknown_job():
+    import app
+    client = app.app.test_client()
+    assert client.post('/upload-file', json={'vector_store_id': 'vs_test'}).status_code == 400
+    assert client.get('/upload-status/unbekannt').status_code == 404
+
+
+if __name__ == '__main__':
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
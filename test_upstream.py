@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Tests für die Upstream-Gates und Lasttest sync- vs. gthread-Worker
+"""
+
+import json
+import multiprocessing
+import socket
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from upstream import ProviderGate, UpstreamBusy
+
+
+class SleepingModel:
+    def __init__(self, latency=0.2):
+        self.latency = latency
+
+    def generate_content(self, prompt, stream=False):
+        time.sleep(self.latency)
+        return type('Response', (), {'text': 'Antwort'})()
+
+
+def test_gate_caps_concurrency_and_tracks_queue_depth():
+    gate = ProviderGate('Test', limit=2, timeout=5)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def call(_):
+        with gate.slot():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+
+    with ThreadPoolExecutor(6) as pool:
+        list(pool.map(call, range(6)))
+
+    stats = gate.stats()
+    assert peak[0] == 2
+    assert stats['total_calls'] == 6
+    assert stats['in_flight'] == 0
+    assert stats['queue_depth'] == 0
+    assert stats['max_queue_depth'] >= 4
+
+
+def test_gate_rejects_after_timeout():
+    gate = ProviderGate('Test', limit=1, timeout=0.01)
+    with gate.slot():
+        with pytest.raises(UpstreamBusy):
+            with gate.slot():
+                pass
+    assert gate.stats()['rejected'] == 1
+
+
+def test_busy_upstream_returns_503():
+    import app
+    app.gemini_model = SleepingModel(latency=0)
+    original = app.gemini_gate
+    app.gemini_gate = ProviderGate('Gemini', limit=1, timeout=0.01)
+    try:
+        with app.gemini_gate.slot():
+            response = app.app.test_client().post('/ai-suggestions', json={'title': 'X'})
+        assert response.status_code == 503
+        stats = app.app.test_client().get('/upstream-stats').get_json()
+        assert stats['gemini']['rejected'] == 1
+    finally:
+        app.gemini_gate = original
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _serve(port, options, latency):
+    from gunicorn.app.base import BaseApplication
+    import app as flask_app
+
+    flask_app.gemini_model = SleepingModel(latency)
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+            self.cfg.set('bind', f'127.0.0.1:{port}')
+            self.cfg.set('workers', 1)
+            self.cfg.set('loglevel', 'warning')
+
+        def load(self):
+            return flask_app.app
+
+    Server().run()
+
+
+def load_test(requests=64, concurrency=32, latency=0.2):
+    """Wie viele gleichzeitige /ask-question-Requests schafft ein einzelner Worker?
+    Im gthread-Modus begrenzt GEMINI_MAX_CONCURRENCY den Durchsatz, nicht der Worker."""
+    modes = {
+        'sync (bisher)': {'worker_class': 'sync'},
+        'gthread (32 Threads)': {'worker_class': 'gthread', 'threads': 32}
+    }
+    for label, options in modes.items():
+        port = _free_port()
+        server = multiprocessing.Process(target=_serve, args=(port, options, latency), daemon=True)
+        server.start()
+        time.sleep(2)
+
+        def ask(i):
+            # Unterschiedliche Fragen, damit der Antwort-Cache nicht greift
+            payload = json.dumps({'question': f'Wann sind Zahlungen fällig? #{i}'}).encode()
+            req = urllib.request.Request(f'http://127.0.0.1:{port}/ask-question', data=payload,
+                                         headers={'Content-Type': 'application/json'})
+            with urllib.request.urlopen(req, timeout=120) as response:
+                return response.status
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            statuses = list(pool.map(ask, range(requests)))
+        elapsed = time.perf_counter() - started
+        server.terminate()
+        server.join()
+        ok = statuses.count(200)
+        print(f"🚦 {label:<22} {ok}/{requests} OK in {elapsed:.2f}s | {ok / elapsed:.1f} req/s "
+              f"bei {latency * 1000:.0f} ms Upstream-Latenz")
+
+
+if __name__ == '__main__':
+    load_test()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Tests und Benchmark für die Workflow-Engine (DAG-Ausführung, Historie, API)
+Benchmark: python test_workflow_engine.py [runs]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+from workflow_engine import WorkflowEngine, check_dag, check_http_target, route_lead
+
+DIAMOND = [
+    {'id': 'a', 'type': 'sleep'},
+    {'id': 'b', 'type': 'sleep', 'depends_on': ['a']},
+    {'id': 'c', 'type': 'sleep', 'depends_on': ['a']},
+    {'id': 'd', 'type': 'join', 'depends_on': ['b', 'c']}
+]
+
+
+def sleep_handlers(delay=0.0, log=None):
+    def sleep_step(step, context):
+        if log is not None:
+            log.append(('start', step['id'], time.perf_counter()))
+        time.sleep(step.get('delay', delay))
+        if log is not None:
+            log.append(('end', step['id'], time.perf_counter()))
+        return {'text': step['id']}
+
+    def join_step(step, context):
+        return {'text': '+'.join(sorted(output['text'] for output in context['steps'].values()))}
+
+    def fail_step(step, context):
+        raise RuntimeError('kaputt')
+
+    return {'sleep': sleep_step, 'join': join_step, 'fail': fail_step}
+
+
+def wait_for(engine, run_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        run = engine.run(run_id)
+        if run['status'] != 'running':
+            return run
+        time.sleep(0.01)
+    raise TimeoutError(run_id)
+
+
+def test_ids_are_unique_within_the_same_second(tmp_path):
+    engine = WorkflowEngine(str(tmp_path / 'wf.db'), sleep_handlers())
+    ids = {engine.create({'name': f'W{i}', 'steps': DIAMOND})['id'] for i in range(50)}
+    assert len(ids) == 50 and len(engine.list()) == 50
+
+
+def test_independent_steps_run_in_parallel(tmp_path):
+    log = []
+    engine = WorkflowEngine(str(tmp_path / 'wf.db'), sleep_handlers(0.1, log), workers=4)
+    workflow = engine.create({'name': 'Diamant', 'steps': DIAMOND})
+    run = wait_for(engine, engine.start(workflow['id'], {'lead': 'x'})['run_id'])
+
+    assert run['status'] == 'completed'
+    assert run['steps']['d']['output'] == {'text': 'b+c'}
+    assert all(step['duration_ms'] is not None for step in run['steps'].values())
+    times = {(kind, step_id): at for kind, step_id, at in log}
+    # b und c starten beide nach a und überlappen sich
+    assert times['start', 'b'] >= times['end', 'a'] and times['start', 'c'] >= times['end', 'a']
+    assert times['start', 'c'] < times['end', 'b'] and times['start', 'b'] < times['end', 'c']
+
+
+def test_failed_step_skips_dependents_and_is_recorded(tmp_path):
+    engine = WorkflowEngine(str(tmp_path / 'wf.db'), sleep_handlers())
+    steps = [{'id': 'a', 'type': 'fail'}, {'id': 'b', 'type': 'sleep', 'depends_on': ['a']},
+             {'id': 'c', 'type': 'sleep'}]
+    workflow = engine.create({'name': 'Fehler', 'steps': steps})
+    run = wait_for(engine, engine.start(workflow['id'])['run_id'])
+    assert run['status'] == 'failed' and 'a' in run['error']
+    assert {step_id: step['status'] for step_id, step in run['steps'].items()} == {
+        'a': 'failed', 'b': 'skipped', 'c': 'completed'}
+    assert run['steps']['a']['error'] == 'kaputt'
+
+    wait_for(engine, engine.start(workflow['id'])['run_id'])
+    history = engine.runs(workflow['id'])
+    assert len(history) == 2 and history[0]['created_at'] >= history[1]['created_at']
+    assert engine.stats()['runs_failed'] == 2
+
+
+def test_restart_keeps_runs_of_live_processes_and_fails_expired_ones(tmp_path):
+    path = str(tmp_path / 'wf.db')
+    release = threading.Event()
+    handlers = {'wait': lambda step, context: (release.wait(5), {'text': 'ok'})[1]}
+    first = WorkflowEngine(path, handlers, lease_seconds=0.15)
+    workflow = first.create({'name': 'Lang', 'steps': [{'id': 'a', 'type': 'wait'}]})
+    running = first.start(workflow['id'])['run_id']
+    crashed = first.start(workflow['id'])['run_id']
+    # Besitzer von crashed ist abgestürzt: Lease nicht mehr verlängert
+    first._connection().execute("UPDATE workflow_runs SET lease_owner = 'tot', lease_until = ? WHERE id = ?",
+                                (time.time() - 1, crashed))
+
+    second = WorkflowEngine(path, handlers, lease_seconds=0.15)
+    time.sleep(0.4)
+    assert second.run(running)['status'] == 'running'
+    assert second.run(crashed)['status'] == 'failed' and 'Neustart' in second.run(crashed)['error']
+    release.set()
+    first.close()
+    assert second.run(running)['status'] == 'completed'
+    second.close()
+
+
+def test_invalid_definitions_are_rejected(tmp_path):
+    handlers = sleep_handlers()
+    with pytest.raises(ValueError, match='Zyklus'):
+        check_dag([{'id': 'a', 'type': 'sleep', 'depends_on': ['b']},
+                   {'id': 'b', 'type': 'sleep', 'depends_on': ['a']}], handlers)
+    with pytest.raises(ValueError, match='unbekannte Abhängigkeiten'):
+        check_dag([{'id': 'a', 'type': 'sleep', 'depends_on': ['x']}], handlers)
+    with pytest.raises(ValueError, match='Schritt-Typ'):
+        check_dag([{'id': 'a', 'type': 'shell'}], handlers)
+    with pytest.raises(ValueError):
+        WorkflowEngine(str(tmp_path / 'wf.db'), handlers).create({'name': 'leer', 'steps': []})
+
+
+def test_route_lead_uses_first_matching_rule():
+    step = {'default': 'standard', 'rules': [{'field': 'budget', 'min': 5000, 'route': 'premium'},
+                                             {'field': 'source', 'equals': 'LinkedIn', 'route': 'sales'}]}
+    assert route_lead(step, {'input': {'budget': '7.500 €'}})['route'] == 'premium'
+    assert route_lead(step, {'input': {'budget': '100', 'source': 'linkedin'}})['route'] == 'sales'
+    assert route_lead(step, {'input': {}})['route'] == 'standard'
+
+
+def test_http_target_requires_allowlist_and_public_address(monkeypatch):
+    with pytest.raises(ValueError, match='Host nicht erlaubt'):
+        check_http_target('https://example.com/hook', set())
+    with pytest.raises(ValueError, match='http'):
+        check_http_target('file:///etc/passwd', {'example.com'})
+    for host, url in (('169.254.169.254', 'http://169.254.169.254/latest/meta-data/'),
+                      ('127.0.0.1', 'http://127.0.0.1:8080/admin'), ('::1', 'http://[::1]/'),
+                      ('10.0.0.5', 'http://10.0.0.5/'), ('::ffff:192.168.1.1', 'http://[::ffff:192.168.1.1]/')):
+        with pytest.raises(ValueError, match='internen Adresse'):
+            check_http_target(url, {host})
+
+    # Auch erlaubte Hostnamen dürfen nicht auf interne Adressen zeigen
+    monkeypatch.setattr('socket.getaddrinfo', lambda host, port, **kwargs: [(2, 1, 6, '', ('10.1.2.3', port))])
+    with pytest.raises(ValueError, match='internen Adresse'):
+        check_http_target('https://hooks.example.com/x', {'hooks.example.com'})
+    monkeypatch.setattr('socket.getaddrinfo', lambda host, port, **kwargs: [(2, 1, 6, '', ('93.184.216.34', port))])
+    check_http_target('https://hooks.example.com/x', {'hooks.example.com'})
+
+
+def test_workflow_api_runs_builtin_lead_router():
+    import app
+
+    class Model:
+        def __init__(self):
+            self.prompts = []
+            self.lock = threading.Lock()
+
+        def generate_content(self, prompt, **kwargs):
+            with self.lock:
+                self.prompts.append(prompt)
+            return type('Response', (), {'text': f'Antwort {len(self.prompts)}'})()
+
+    app.gemini_model = Model()
+    client = app.app.test_client()
+
+    first = client.post('/create-workflow', json={'name': 'A', 'type': 'email', 'config': {'description': 'x'}})
+    second = client.post('/create-workflow', json={'name': 'B', 'type': 'email', 'config': {'description': 'x'}})
+    assert first.get_json()['workflow']['id'] != second.get_json()['workflow']['id']
+    assert client.post('/create-workflow', json={
+        'name': 'Zyklus', 'steps': [{'id': 'a', 'type': 'gemini', 'depends_on': ['a']}]}).status_code == 400
+    for body in ({'name': 'X', 'config': 'kein Objekt'}, {'name': 'X', 'config': []}, ['kein', 'Objekt']):
+        assert client.post('/create-workflow', json=body).status_code == 400
+
+    # Ohne Allowlist sind HTTP-Schritte gesperrt, der Fehler landet im Run statt eine Antwort zu liefern
+    internal = client.post('/create-workflow', json={'name': 'Intern', 'steps': [
+        {'id': 'meta', 'type': 'http', 'url': 'http://169.254.169.254/latest/meta-data/'}]}).get_json()
+    status_url = client.post(f"/workflows/{internal['workflow']['id']}/run", json={}).get_json()['status_url']
+    deadline = time.time() + 5
+    while (run := client.get(status_url).get_json())['status'] == 'running' and time.time() < deadline:
+        time.sleep(0.02)
+    assert run['status'] == 'failed' and 'Host nicht erlaubt' in run['steps']['meta']['error']
+    assert run['steps']['meta']['output'] is None
+
+    response = client.post('/workflows/lead-router/run', json={'input': {
+        'name': 'Anna', 'email': 'anna@example.com', 'budget': '8000', 'message': 'Hilfe bei n8n'}})
+    assert response.status_code == 202
+    status_url = response.get_json()['status_url']
+    deadline = time.time() + 5
+    while (run := client.get(status_url).get_json())['status'] == 'running' and time.time() < deadline:
+        time.sleep(0.02)
+    assert run['status'] == 'completed'
+    assert run['steps']['route']['output']['route'] == 'premium'
+    summary_prompt = next(prompt for prompt in app.gemini_model.prompts if 'ROUTE: premium' in prompt)
+    assert 'Anna' in summary_prompt
+
+    assert client.get('/workflows/lead-router').get_json()['runs'][0]['run_id'] == run['run_id']
+    assert client.post('/workflows/unbekannt/run', json={}).status_code == 404
+    assert client.get('/workflow-runs/unbekannt').status_code == 404
+
+
+def benchmark(runs=500, step_delay=0.01):
+    """Diamant-DAG mit Stub-Schritten (step_delay Sekunden): sequentiell (1 Worker) gegen Pool"""
+    print(f"⏱️  {runs} Runs, 4 Schritte pro Run, {step_delay * 1000:.0f} ms pro Stub-Schritt")
+    for workers in (1, 4, 16, 32):
+        path = os.path.join(tempfile.mkdtemp(), 'wf.db')
+        engine = WorkflowEngine(path, sleep_handlers(step_delay), workers=workers)
+        workflow = engine.create({'name': 'Benchmark', 'steps': DIAMOND})
+        started = time.perf_counter()
+        run_ids = [engine.start(workflow['id'], {'i': i})['run_id'] for i in range(runs)]
+        finished = [wait_for(engine, run_id, timeout=600) for run_id in run_ids]
+        elapsed = time.perf_counter() - started
+        latency = sorted((run['finished_at'] - run['created_at']) for run in finished)
+        assert all(run['status'] == 'completed' for run in finished)
+        print(f"🚀 {workers:>2} Worker: {runs / elapsed:7.1f} Runs/s, {runs * 4 / elapsed:7.1f} Schritte/s, "
+              f"Run-Dauer p50 {latency[len(latency) // 2] * 1000:.0f} ms")
+        engine.close()
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,175 @@
+"""
+Todo Store
+Todo-Boards in SQLite: jeder Änderungs-Batch erhöht die Board-Version, Clients holen mit since=<version>
+nur geänderte Einträge (inkl. Lösch-Markierungen) und schicken viele Änderungen in einem Request
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List
+
+from schema import compile_schema
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS todo_boards (
+    board TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS todos (
+    board TEXT NOT NULL,
+    id TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    priority TEXT NOT NULL DEFAULT 'medium',
+    category TEXT NOT NULL DEFAULT 'other',
+    completed INTEGER NOT NULL DEFAULT 0,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (board, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_todos_version ON todos (board, version);
+"""
+
+FIELDS = ('title', 'description', 'priority', 'category', 'completed')
+COLUMNS = ('id',) + FIELDS + ('deleted', 'created_at', 'updated_at', 'version')
+
+ID_PATTERN = r'^[A-Za-z0-9_.-]{1,64}$'
+CHANGE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'id': {'type': 'string', 'pattern': ID_PATTERN},
+        'title': {'type': 'string', 'maxLength': 500},
+        'description': {'type': 'string', 'maxLength': 5000},
+        'priority': {'type': 'string', 'maxLength': 32},
+        'category': {'type': 'string', 'maxLength': 32},
+        'completed': {'type': 'boolean'},
+        'deleted': {'type': 'boolean'},
+        'created_at': {'type': 'number'},
+        'base_version': {'type': 'integer', 'minimum': 0}
+    },
+    'required': ['id'],
+    'additionalProperties': False
+}
+
+
+def _row_to_todo(row: tuple) -> Dict[str, Any]:
+    todo = dict(zip(COLUMNS, row))
+    if todo['deleted']:
+        # Lösch-Markierung: für den Client reichen id und Version
+        return {'id': todo['id'], 'deleted': True, 'version': todo['version']}
+    todo['completed'] = bool(todo['completed'])
+    del todo['deleted']
+    return todo
+
+
+class TodoStore:
+    """Versionierte Todo-Boards; Lösch-Markierungen bleiben erhalten, damit Deltas Löschungen enthalten"""
+
+    def __init__(self, path: str, max_batch: int = 1000):
+        self.path = path
+        self.max_batch = max_batch
+        self.validate = compile_schema({'type': 'array', 'items': CHANGE_SCHEMA, 'maxItems': max_batch})
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def check_board(board: Any) -> str:
+        if not isinstance(board, str) or not re.match(ID_PATTERN, board):
+            raise ValueError(f'Ungültiges Board: {board!r}')
+        return board
+
+    def version(self, board: str) -> int:
+        row = self._connection().execute('SELECT version FROM todo_boards WHERE board = ?', (board,)).fetchone()
+        return row[0] if row else 0
+
+    def changes(self, board: str, since: int = 0) -> Dict[str, Any]:
+        """Alle Todos (since=0) oder nur die seit Version since geänderten"""
+        conn = self._connection()
+        conn.execute('BEGIN')
+        try:
+            version = self.version(board)
+            # Unbekannte Client-Version (z.B. nach Datenbank-Reset): vollständig neu laden
+            full = since <= 0 or since > version
+            if full:
+                rows = conn.execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM todos WHERE board = ? AND deleted = 0 "
+                    'ORDER BY created_at DESC', (board,)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM todos WHERE board = ? AND version > ? ORDER BY version",
+                    (board, since)
+                ).fetchall()
+        finally:
+            conn.execute('COMMIT')
+        return {'version': version, 'full': full, 'todos': [_row_to_todo(row) for row in rows]}
+
+    def apply(self, board: str, changes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Wendet einen Batch in einer Transaktion an; Änderungen mit veralteter base_version landen in conflicts"""
+        self.validate(changes)
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = self.version(board) + 1
+            changed: List[str] = []
+            conflicts: List[Dict[str, Any]] = []
+            for change in changes:
+                row = conn.execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM todos WHERE board = ? AND id = ?", (board, change['id'])
+                ).fetchone()
+                if row is not None and 'base_version' in change and row[-1] > change['base_version']:
+                    conflicts.append(_row_to_todo(row))
+                    continue
+                fields = {key: change[key] for key in FIELDS if key in change}
+                if 'completed' in fields:
+                    fields['completed'] = int(fields['completed'])
+                if row is None:
+                    if change.get('deleted'):
+                        continue
+                    conn.execute(
+                        f"INSERT INTO todos (board, id, {', '.join(fields)}{', ' if fields else ''}"
+                        'created_at, updated_at, version) '
+                        f"VALUES (?, ?, {'?, ' * len(fields)}?, ?, ?)",
+                        (board, change['id'], *fields.values(), change.get('created_at', now), now, version)
+                    )
+                else:
+                    # Upsert auf eine Lösch-Markierung stellt den Eintrag wieder her
+                    fields['deleted'] = int(change.get('deleted', False))
+                    conn.execute(
+                        f"UPDATE todos SET {', '.join(f'{key} = ?' for key in fields)}, updated_at = ?, version = ? "
+                        'WHERE board = ? AND id = ?',
+                        (*fields.values(), now, version, board, change['id'])
+                    )
+                changed.append(change['id'])
+
+            todos = []
+            if changed:
+                conn.execute(
+                    'INSERT INTO todo_boards (board, version) VALUES (?, ?) '
+                    'ON CONFLICT (board) DO UPDATE SET version = excluded.version', (board, version)
+                )
+                # Noch in der Transaktion lesen: danach kann ein anderer Schreiber sie schon weiterversioniert haben
+                todos = [_row_to_todo(row) for row in conn.execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM todos WHERE board = ? AND version = ?", (board, version)
+                )]
+            else:
+                version -= 1
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return {'version': version, 'todos': todos, 'conflicts': conflicts}
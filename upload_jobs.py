@@ -0,0 +1,132 @@
+"""
+Upload Jobs
+Hintergrund-Jobs für Vector-Store-Uploads mit Fortschritt in SQLite (prozessübergreifend abfragbar)
+Laufende Jobs tragen einen Lease, den der ausführende Prozess per Heartbeat verlängert; erst wenn er abläuft
+(Prozess abgestürzt), gilt der Job als fehlgeschlagen
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS upload_jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    meta TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+ACTIVE = "status NOT IN ('completed', 'failed')"
+
+
+class UploadJobs:
+    """Führt Upload-Funktionen im Thread-Pool aus und protokolliert ihren Fortschritt"""
+
+    def __init__(self, path: str, workers: int = 4, lease_seconds: float = 60):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='upload-worker')
+        self._stopping = threading.Event()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(upload_jobs)')}
+        for column, definition in (('lease_owner', 'TEXT'), ('lease_until', 'REAL')):
+            if column not in columns:
+                conn.execute(f'ALTER TABLE upload_jobs ADD COLUMN {column} {definition}')
+        self._expire()
+        threading.Thread(target=self._heartbeat, name='upload-heartbeat', daemon=True).start()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def submit(self, fn: Callable[..., Dict], *args, **meta) -> str:
+        """Startet fn(progress, *args) im Hintergrund und gibt sofort die Job-ID zurück"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connection().execute(
+            'INSERT INTO upload_jobs (id, status, meta, created_at, updated_at, lease_owner, lease_until) '
+            "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+            (job_id, json.dumps(meta), now, now, self.owner, now + self.lease_seconds)
+        )
+        self._executor.submit(self._run, job_id, fn, args)
+        return job_id
+
+    def _update(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        self._connection().execute(
+            'UPDATE upload_jobs SET status = ?, result = COALESCE(?, result), error = ?, updated_at = ? WHERE id = ?',
+            (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+        )
+
+    def _expire(self, job_id: Optional[str] = None) -> None:
+        """Jobs mit abgelaufenem Lease können nicht fortgesetzt werden (Inhalt lag nur im Speicher des Besitzers)"""
+        now = time.time()
+        # Datenbanken von vor den Leases: updated_at + lease_seconds als Ablaufzeit
+        query = ("UPDATE upload_jobs SET status = 'failed', error = 'Server neu gestartet', updated_at = ? "
+                 f'WHERE {ACTIVE} AND COALESCE(lease_until, updated_at + ?) < ?')
+        params: tuple = (now, self.lease_seconds, now)
+        if job_id is not None:
+            query, params = query + ' AND id = ?', params + (job_id,)
+        self._connection().execute(query, params)
+
+    def _heartbeat(self) -> None:
+        """Verlängert die Leases der Jobs dieses Prozesses (auch wartende im Thread-Pool)"""
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                self._connection().execute(
+                    f'UPDATE upload_jobs SET lease_until = ? WHERE lease_owner = ? AND {ACTIVE}',
+                    (time.time() + self.lease_seconds, self.owner)
+                )
+            except sqlite3.Error as e:
+                logger.error(f'Upload jobs heartbeat error: {e}')
+
+    def _run(self, job_id: str, fn: Callable[..., Dict], args: tuple) -> None:
+        def progress(status: str, **fields):
+            self._update(job_id, status, result=fields or None)
+
+        try:
+            result = fn(progress, *args)
+            self._update(job_id, 'completed', result=result)
+        except Exception as e:
+            logger.error(f'Upload job {job_id} failed: {e}')
+            self._update(job_id, 'failed', error=str(e))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._expire(job_id)
+        row = self._connection().execute(
+            'SELECT id, status, meta, result, error, created_at, updated_at FROM upload_jobs WHERE id = ?',
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'job_id': row[0],
+            'status': row[1],
+            **json.loads(row[2]),
+            'result': json.loads(row[3]) if row[3] else None,
+            'error': row[4],
+            'created_at': row[5],
+            'updated_at': row[6]
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._stopping.set()
@@ -0,0 +1,102 @@
+"""
+Upstream Gates
+Begrenzt gleichzeitige Aufrufe an OpenAI und Gemini pro Prozess und misst die Warteschlange.
+Optional mit Rate-Limiter (rate_limit.UpstreamLimiter): Token vor jedem Aufruf, Wiederholung bei 429.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+
+class UpstreamBusy(Exception):
+    """Kein freier Slot innerhalb des Timeouts bzw. Upstream-Limit erreicht (retry_after in Sekunden, falls bekannt)"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ProviderGate:
+    """Semaphore pro Provider mit Zählern für In-Flight und wartende Aufrufe"""
+
+    def __init__(self, name: str, limit: int, timeout: float = 30.0, limiter=None):
+        self.name = name
+        self.limit = limit
+        self.timeout = timeout
+        self.limiter = limiter
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.total_calls = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+
+    @contextmanager
+    def slot(self):
+        """Hält einen Upstream-Slot für die Dauer des with-Blocks"""
+        if self.limiter is not None:
+            # Rate-Limit vor dem Slot: wer auf ein Token wartet, blockiert keinen Concurrency-Slot
+            self.limiter.acquire()
+        started = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+        acquired = self._semaphore.acquire(timeout=self.timeout)
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+            else:
+                self.in_flight += 1
+                self.total_calls += 1
+                self.total_wait += time.perf_counter() - started
+        if not acquired:
+            raise UpstreamBusy(f'{self.name} ist ausgelastet, bitte später erneut versuchen')
+        try:
+            yield
+        except Exception as e:
+            if self.limiter is not None:
+                self.limiter.observe(e)
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._semaphore.release()
+
+    def retry_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """Wartezeit vor einem erneuten Versuch nach error, None wenn error kein 429 ist"""
+        return self.limiter.retry_delay(error, attempt) if self.limiter is not None else None
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """fn im Slot ausführen, bei 429 mit Backoff wiederholen (UpstreamBusy wenn die Versuche aufgebraucht sind)"""
+        attempt = 0
+        while True:
+            try:
+                with self.slot():
+                    return fn(*args, **kwargs)
+            except UpstreamBusy:
+                raise
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        rate_limit = self.limiter.stats() if self.limiter is not None else None
+        with self._lock:
+            return {
+                'rate_limit': rate_limit,
+                'limit': self.limit,
+                'in_flight': self.in_flight,
+                'queue_depth': self.waiting,
+                'max_queue_depth': self.max_waiting,
+                'total_calls': self.total_calls,
+                'rejected': self.rejected,
+                'avg_wait_ms': round(self.total_wait / self.total_calls * 1000, 2) if self.total_calls else 0.0
+            }
@@ -0,0 +1,431 @@
+"""
+Workflow Engine
+Workflows als DAG von Schritten (HTTP-Aufruf, Gemini-Prompt, Lead-Routing), gespeichert in SQLite.
+Runs laufen auf einem begrenzten Thread-Pool: jeder Schritt startet, sobald seine Abhängigkeiten fertig sind,
+unabhängige Schritte also parallel. Pro Schritt werden Status, Dauer und Ergebnis bzw. Fehler festgehalten.
+Laufende Runs tragen einen Lease, den der ausführende Prozess per Heartbeat verlängert; erst wenn er abläuft
+(Prozess abgestürzt), gilt der Run als abgebrochen.
+"""
+
+import ipaddress
+import json
+import logging
+import re
+import socket
+import sqlite3
+import string
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Collection, Dict, List, Optional
+from urllib.parse import urlparse
+
+from schema import compile_schema
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workflows (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT,
+    config TEXT NOT NULL,
+    steps TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workflow_runs (
+    id TEXT PRIMARY KEY,
+    workflow_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    input TEXT NOT NULL,
+    steps TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_workflow_runs_workflow ON workflow_runs (workflow_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_workflow_runs_status ON workflow_runs (status);
+"""
+
+STEP_ID_PATTERN = r'^[A-Za-z0-9_-]{1,64}$'
+WORKFLOW_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'name': {'type': 'string', 'minLength': 1, 'maxLength': 200},
+        'type': {'type': ['string', 'null'], 'maxLength': 32},
+        'config': {'type': 'object'},
+        'steps': {
+            'type': 'array',
+            'minItems': 1,
+            'maxItems': 50,
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'id': {'type': 'string', 'pattern': STEP_ID_PATTERN},
+                    'type': {'type': 'string'},
+                    'depends_on': {'type': 'array', 'items': {'type': 'string'}}
+                },
+                'required': ['id', 'type']
+            }
+        }
+    },
+    'required': ['name', 'steps']
+}
+
+NUMBER_PATTERN = re.compile(r'\d+(?:[.,]\d+)*')
+THOUSANDS_PATTERN = re.compile(r'^\d{1,3}(?:[.,]\d{3})+$')
+
+Handler = Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]
+
+
+def check_dag(steps: List[Dict[str, Any]], handlers: Dict[str, Handler]) -> None:
+    """ValueError bei doppelten ids, unbekannten Typen/Abhängigkeiten oder Zyklen"""
+    ids = [step['id'] for step in steps]
+    if len(set(ids)) != len(ids):
+        raise ValueError('Schritt-ids müssen eindeutig sein')
+    for step in steps:
+        if step['type'] not in handlers:
+            raise ValueError(f"Unbekannter Schritt-Typ: {step['type']}")
+        unknown = set(step.get('depends_on', [])) - set(ids)
+        if unknown:
+            raise ValueError(f"{step['id']}: unbekannte Abhängigkeiten {sorted(unknown)}")
+
+    remaining = {step['id']: set(step.get('depends_on', [])) for step in steps}
+    while remaining:
+        ready = [step_id for step_id, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f'Zyklus zwischen den Schritten {sorted(remaining)}')
+        for step_id in ready:
+            del remaining[step_id]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def check_http_target(url: str, allowed_hosts: Collection[str]) -> None:
+    """ValueError, wenn url kein http(s) ist, der Host nicht in allowed_hosts steht (leer = keiner)
+    oder zu einer privaten, Loopback- oder Link-Local-Adresse auflöst"""
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https'):
+        raise ValueError(f'Nur http(s) erlaubt: {url}')
+    host = (parsed.hostname or '').lower()
+    if host not in allowed_hosts:
+        raise ValueError(f'Host nicht erlaubt: {host}')
+    try:
+        infos = socket.getaddrinfo(host, parsed.port or (443 if parsed.scheme == 'https' else 80),
+                                   proto=socket.IPPROTO_TCP)
+    except socket.gaierror as e:
+        raise ValueError(f'Host nicht auflösbar: {host}') from e
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split('%')[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global:
+            raise ValueError(f'Host {host} löst zu einer internen Adresse auf: {address}')
+
+
+def template_values(context: Dict[str, Any]) -> Dict[str, str]:
+    """Variablen für $platzhalter: Eingabefelder, $<schritt> (Text des Ergebnisses) und $<schritt>_<feld>"""
+    values = {key: str(value) for key, value in context['input'].items()}
+    for step_id, output in context['steps'].items():
+        output = output or {}
+        values[step_id] = str(output['text']) if 'text' in output else json.dumps(output, ensure_ascii=False)
+        for key, value in output.items():
+            values[f'{step_id}_{key}'] = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    return values
+
+
+def render_text(text: str, context: Dict[str, Any]) -> str:
+    return string.Template(text).safe_substitute(template_values(context))
+
+
+def _number(value: Any) -> Optional[float]:
+    """Erste Zahl in einem Text, Tausenderpunkte wie in '7.500 €' werden entfernt"""
+    match = NUMBER_PATTERN.search(str(value))
+    if match is None:
+        return None
+    number = match.group(0)
+    if THOUSANDS_PATTERN.match(number):
+        return float(re.sub(r'[.,]', '', number))
+    # Bei '3.000,50' bzw. '3,000.50' ist das letzte Trennzeichen das Dezimalzeichen
+    decimal = max(number.rfind('.'), number.rfind(','))
+    if decimal >= 0:
+        number = re.sub(r'[.,]', '', number[:decimal]) + '.' + number[decimal + 1:]
+    return float(number)
+
+
+def route_lead(step: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+    """Erste passende Regel (equals, contains oder min auf ein Eingabefeld) bestimmt die Route"""
+    lead = context['input']
+    for rule in step.get('rules', []):
+        value = lead.get(rule.get('field'))
+        if value is None:
+            continue
+        if 'equals' in rule and str(value).lower() != str(rule['equals']).lower():
+            continue
+        if 'contains' in rule and str(rule['contains']).lower() not in str(value).lower():
+            continue
+        if 'min' in rule and (_number(value) is None or _number(value) < rule['min']):
+            continue
+        return {'route': rule['route'], 'rule': rule}
+    return {'route': step.get('default', 'standard'), 'rule': None}
+
+
+class _Run:
+    """Zustand eines laufenden Runs; Änderungen nur unter lock"""
+
+    def __init__(self, run_id: str, workflow: Dict[str, Any], run_input: Dict[str, Any]):
+        self.id = run_id
+        self.workflow_id = workflow['id']
+        self.input = run_input
+        self.created_at = time.time()
+        self.steps = {step['id']: step for step in workflow['steps']}
+        self.waiting = {step['id']: set(step.get('depends_on', [])) for step in workflow['steps']}
+        self.state = {step_id: {'status': 'pending', 'started_at': None, 'duration_ms': None,
+                                'output': None, 'error': None} for step_id in self.steps}
+        self.lock = threading.Lock()
+
+    def ready(self) -> List[str]:
+        return [step_id for step_id, deps in self.waiting.items()
+                if not deps and self.state[step_id]['status'] == 'pending']
+
+    def skip_dependents(self, failed: str) -> None:
+        for step_id, step in self.steps.items():
+            if failed in step.get('depends_on', []) and self.state[step_id]['status'] == 'pending':
+                self.state[step_id]['status'] = 'skipped'
+                self.skip_dependents(step_id)
+
+    def done(self) -> bool:
+        return all(state['status'] in ('completed', 'failed', 'skipped') for state in self.state.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {step_id: dict(state) for step_id, state in self.state.items()}
+
+
+class WorkflowEngine:
+    """Workflow-Registry plus Ausführung auf einem Thread-Pool mit workers Threads"""
+
+    def __init__(self, path: str, handlers: Dict[str, Handler], workers: int = 8, lease_seconds: float = 60):
+        self.path = path
+        self.handlers = handlers
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+        self.validate = compile_schema(WORKFLOW_SCHEMA)
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='workflow-step')
+        self._active: Dict[str, _Run] = {}
+        self._lock = threading.Lock()
+        self._stats = {'runs_started': 0, 'runs_completed': 0, 'runs_failed': 0, 'steps_executed': 0}
+        self._stopping = threading.Event()
+
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(workflow_runs)')}
+        for column, definition in (('lease_owner', 'TEXT'), ('lease_until', 'REAL')):
+            if column not in columns:
+                conn.execute(f'ALTER TABLE workflow_runs ADD COLUMN {column} {definition}')
+        self._expire()
+        threading.Thread(target=self._heartbeat, name='workflow-heartbeat', daemon=True).start()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _expire(self) -> None:
+        """Runs mit abgelaufenem Lease sind verloren, ihr Zustand lag nur im Speicher des Besitzers"""
+        now = time.time()
+        # Datenbanken von vor den Leases: created_at + lease_seconds als Ablaufzeit
+        self._connection().execute(
+            "UPDATE workflow_runs SET status = 'failed', error = 'Abgebrochen durch Neustart', finished_at = ? "
+            "WHERE status = 'running' AND COALESCE(lease_until, created_at + ?) < ?",
+            (now, self.lease_seconds, now)
+        )
+
+    def _heartbeat(self) -> None:
+        """Verlängert die Leases der Runs dieses Prozesses"""
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                self._connection().execute(
+                    "UPDATE workflow_runs SET lease_until = ? WHERE lease_owner = ? AND status = 'running'",
+                    (time.time() + self.lease_seconds, self.owner)
+                )
+            except sqlite3.Error as e:
+                logger.error(f'Workflow heartbeat error: {e}')
+
+    def create(self, definition: Dict[str, Any], workflow_id: Optional[str] = None) -> Dict[str, Any]:
+        """Prüft und speichert einen Workflow; mit workflow_id wird ein bestehender überschrieben"""
+        self.validate(definition)
+        check_dag(definition['steps'], self.handlers)
+        workflow = {
+            'id': workflow_id or f'wf_{uuid.uuid4().hex}',
+            'name': definition['name'],
+            'type': definition.get('type'),
+            'config': definition.get('config', {}),
+            'steps': definition['steps'],
+            'status': 'active',
+            'created_at': time.time()
+        }
+        self._connection().execute(
+            'INSERT INTO workflows (id, name, type, config, steps, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (id) DO UPDATE SET name = excluded.name, type = excluded.type, '
+            'config = excluded.config, steps = excluded.steps',
+            (workflow['id'], workflow['name'], workflow['type'], json.dumps(workflow['config']),
+             json.dumps(workflow['steps']), workflow['status'], workflow['created_at'])
+        )
+        return workflow
+
+    def get(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            'SELECT id, name, type, config, steps, status, created_at FROM workflows WHERE id = ?', (workflow_id,)
+        ).fetchone()
+        return self._workflow(row) if row else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(
+            'SELECT id, name, type, config, steps, status, created_at FROM workflows ORDER BY created_at'
+        ).fetchall()
+        return [self._workflow(row) for row in rows]
+
+    @staticmethod
+    def _workflow(row: tuple) -> Dict[str, Any]:
+        return {
+            'id': row[0],
+            'name': row[1],
+            'type': row[2],
+            'config': json.loads(row[3]),
+            'steps': json.loads(row[4]),
+            'status': row[5],
+            'created_at': row[6]
+        }
+
+    def start(self, workflow_id: str, run_input: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Startet einen Run und kehrt sofort zurück; None wenn der Workflow unbekannt ist"""
+        workflow = self.get(workflow_id)
+        if workflow is None:
+            return None
+        run = _Run(f'run_{uuid.uuid4().hex}', workflow, run_input or {})
+        self._connection().execute(
+            'INSERT INTO workflow_runs (id, workflow_id, status, input, steps, created_at, lease_owner, lease_until) '
+            "VALUES (?, ?, 'running', ?, ?, ?, ?, ?)",
+            (run.id, run.workflow_id, json.dumps(run.input), json.dumps(run.snapshot()), run.created_at,
+             self.owner, run.created_at + self.lease_seconds)
+        )
+        with self._lock:
+            self._active[run.id] = run
+            self._stats['runs_started'] += 1
+        with run.lock:
+            ready = self._claim(run, run.ready())
+        for step_id in ready:
+            self._executor.submit(self._execute, run, step_id)
+        return self._run_dict(run, 'running')
+
+    def _claim(self, run: _Run, step_ids: List[str]) -> List[str]:
+        for step_id in step_ids:
+            run.state[step_id]['status'] = 'running'
+            run.state[step_id]['started_at'] = time.time()
+        return step_ids
+
+    def _execute(self, run: _Run, step_id: str) -> None:
+        step = run.steps[step_id]
+        with run.lock:
+            outputs = {dep: run.state[dep]['output'] for dep in step.get('depends_on', [])}
+        started = time.perf_counter()
+        output, error = None, None
+        try:
+            output = self.handlers[step['type']](step, {'input': run.input, 'steps': outputs})
+        except Exception as e:
+            logger.error(f'Workflow {run.workflow_id} run {run.id} step {step_id} failed: {e}')
+            error = str(e)
+        duration = (time.perf_counter() - started) * 1000
+
+        with run.lock:
+            state = run.state[step_id]
+            state.update(status='failed' if error else 'completed', duration_ms=round(duration, 2),
+                         output=output, error=error)
+            if error:
+                run.skip_dependents(step_id)
+            for deps in run.waiting.values():
+                deps.discard(step_id)
+            ready = [] if error else self._claim(run, run.ready())
+            snapshot = run.snapshot()
+            # Unter run.lock geschrieben, damit ein älterer Zwischenstand nie den Endstand überschreibt
+            if run.done():
+                self._finish(run, snapshot)
+            else:
+                # Zwischenstand auch für Status-Abfragen aus anderen Prozessen sichtbar machen
+                self._connection().execute('UPDATE workflow_runs SET steps = ? WHERE id = ?',
+                                           (json.dumps(snapshot), run.id))
+        with self._lock:
+            self._stats['steps_executed'] += 1
+
+        for next_step in ready:
+            self._executor.submit(self._execute, run, next_step)
+
+    def _finish(self, run: _Run, snapshot: Dict[str, Dict[str, Any]]) -> None:
+        failed = [step_id for step_id, state in snapshot.items() if state['status'] == 'failed']
+        status = 'failed' if failed else 'completed'
+        error = f'Fehlgeschlagene Schritte: {", ".join(failed)}' if failed else None
+        self._connection().execute(
+            'UPDATE workflow_runs SET status = ?, steps = ?, error = ?, finished_at = ?, lease_owner = NULL, '
+            'lease_until = NULL WHERE id = ?',
+            (status, json.dumps(snapshot), error, time.time(), run.id)
+        )
+        with self._lock:
+            self._active.pop(run.id, None)
+            self._stats[f'runs_{status}'] += 1
+
+    def _run_dict(self, run: _Run, status: str) -> Dict[str, Any]:
+        with run.lock:
+            steps = run.snapshot()
+        return {'run_id': run.id, 'workflow_id': run.workflow_id, 'status': status, 'input': run.input,
+                'steps': steps, 'error': None, 'created_at': run.created_at, 'finished_at': None}
+
+    def run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Status eines Runs inkl. Schritt-Zeiten; laufende Runs aus dem Speicher, sonst aus SQLite"""
+        with self._lock:
+            run = self._active.get(run_id)
+        if run is not None:
+            return self._run_dict(run, 'running')
+        self._expire()
+        row = self._connection().execute(
+            'SELECT id, workflow_id, status, input, steps, error, created_at, finished_at '
+            'FROM workflow_runs WHERE id = ?', (run_id,)
+        ).fetchone()
+        return self._run_row(row) if row else None
+
+    def runs(self, workflow_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Run-Historie, neueste zuerst"""
+        self._expire()
+        rows = self._connection().execute(
+            'SELECT id, workflow_id, status, input, steps, error, created_at, finished_at '
+            'FROM workflow_runs WHERE workflow_id = ? ORDER BY created_at DESC LIMIT ?', (workflow_id, limit)
+        ).fetchall()
+        return [self._run_row(row) for row in rows]
+
+    @staticmethod
+    def _run_row(row: tuple) -> Dict[str, Any]:
+        return {
+            'run_id': row[0],
+            'workflow_id': row[1],
+            'status': row[2],
+            'input': json.loads(row[3]),
+            'steps': json.loads(row[4]),
+            'error': row[5],
+            'created_at': row[6],
+            'finished_at': row[7]
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, 'active_runs': len(self._active), 'workers': self.workers}
+
+    def close(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+        self._stopping.set()